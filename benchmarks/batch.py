@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Compare simulated frames per second of PhysicsWorld against BatchPhysicsWorld.
+
+Usage: python -m benchmarks.batch [matches ...]
+"""
+
+import sys
+import time
+from src.physics import PhysicsWorld
+from src.batch import BatchPhysicsWorld
+from src.globals import LEVEL_HARD
+
+
+def scalar_fps(matches, ticks):
+    """
+    Measure frames per second stepping one PhysicsWorld per match.
+
+    :param matches: int, Number of matches
+    :param ticks: int, Ticks per match
+    :return: float, Simulated frames per second
+    """
+    worlds = [PhysicsWorld(seed=i, level=LEVEL_HARD) for i in range(matches)]
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for world in worlds:
+            world.step()
+            if world.is_round_over:
+                world.reset_round()
+    return matches * ticks / (time.perf_counter() - start)
+
+
+def batch_fps(matches, ticks):
+    """
+    Measure frames per second stepping all the matches at once.
+
+    :param matches: int, Number of matches
+    :param ticks: int, Ticks per match
+    :return: float, Simulated frames per second
+    """
+    world = BatchPhysicsWorld(matches, seed=0, level=LEVEL_HARD, max_score=10 ** 9)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        world.step()
+    return matches * ticks / (time.perf_counter() - start)
+
+
+def main(args):
+    sizes = [int(arg) for arg in args] or [100, 1000, 10000]
+    print("%8s %14s %14s %9s" % ("matches", "scalar (fps)", "batch (fps)", "speedup"))
+    for matches in sizes:
+        scalar = scalar_fps(min(matches, 1000), max(1, 100000 // matches))
+        batch = batch_fps(matches, 200)
+        print("%8d %14.0f %14.0f %8.1fx" % (matches, scalar, batch, batch / scalar))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
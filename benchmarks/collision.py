@@ -0,0 +1,100 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Compare the closed-form rounded rect/circle collision test against the previous angle sweep.
+
+Usage: python -m benchmarks.collision
+"""
+
+import math
+import timeit
+import itertools
+from src.utils import rounded_rect_collided_with_circle, rounded_rects_collided_with_circles
+
+# Paddle and ball as used in Game._play
+RECT = (30, 175, 50, 50)
+BALL_RADIUS = 13
+
+CASES = {
+    "miss": (300, 200),
+    "straight": (90, 200),
+    "corner": (87, 168),
+    "corner-miss": (88, 161),
+}
+
+
+def sweep_collided_with_circle(rect, radius, circle_pos, circle_radius):
+    """
+    Previous implementation, sweeping 91 angles for each corner.
+
+    :param rect: Rectangle parameters (x, y, width, height)
+    :param radius: Rectangle border radius in percentage: 0 <= radius <= 1
+    :param circle_pos: Circle coordinates (x, y)
+    :param circle_radius: Circle radius
+    :return: Collision coordinates (x, y) / None
+    """
+    rect_x, rect_y, rect_width, rect_height = rect
+    circle_x, circle_y = circle_pos
+
+    rect_corner_diameter = min(rect_width, rect_height) * radius
+    rect_corner_radius = rect_corner_diameter / 2
+
+    if rect_y - circle_radius <= circle_y <= rect_y + rect_height + circle_radius and \
+            rect_x - circle_radius <= circle_x <= rect_x + rect_width + circle_radius:
+        if rect_y + rect_corner_radius <= circle_y <= rect_y + rect_height - rect_corner_radius:
+            if abs(rect_x - circle_x) <= circle_radius:
+                return rect_x, circle_y
+            elif abs(rect_x + rect_width - circle_x) <= circle_radius:
+                return rect_x + rect_width, circle_y
+
+        elif rect_x + rect_corner_radius <= circle_x <= rect_x + rect_width - rect_corner_radius:
+            if abs(rect_y - circle_y) <= circle_radius:
+                return circle_x, rect_y
+            elif abs(rect_y + rect_height - circle_y) <= circle_radius:
+                return circle_x, rect_y + rect_height
+
+        else:
+            for ang in range(91):
+                x = rect_corner_radius * math.cos(math.radians(ang))
+                y = rect_corner_radius * math.sin(math.radians(ang))
+
+                x_coordinates = [rect_x + rect_corner_radius - x, rect_x + rect_width - rect_corner_radius + x]
+                y_coordinates = [rect_y + rect_corner_radius - y, rect_y + rect_height - rect_corner_radius + y]
+                for coordinate in itertools.product(x_coordinates, y_coordinates):
+                    distance = math.sqrt(sum([(a - b) ** 2 for a, b in zip(coordinate, circle_pos)]))
+                    if distance <= circle_radius:
+                        return coordinate
+
+    return None
+
+
+def measure(func, number):
+    """
+    Measure the mean time of a call.
+
+    :param func: Callable without arguments
+    :param number: int, Number of calls per repetition
+    :return: float, Best mean time per call in microseconds
+    """
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    print("%-12s %12s %12s %9s" % ("case", "sweep (us)", "closed (us)", "speedup"))
+    for name, pos in CASES.items():
+        sweep = measure(lambda: sweep_collided_with_circle(RECT, 1, pos, BALL_RADIUS), 2000)
+        closed = measure(lambda: rounded_rect_collided_with_circle(RECT, 1, pos, BALL_RADIUS), 20000)
+        print("%-12s %12.2f %12.2f %8.1fx" % (name, sweep, closed, sweep / closed))
+
+    # Both paddles against the ball, as done every frame
+    rects = [RECT, (1000, 175, 50, 50)]
+    circles = [(pos, BALL_RADIUS) for pos in CASES.values()]
+    single = measure(lambda: [[rounded_rect_collided_with_circle(rect, 1, pos, radius) for rect in rects]
+                              for pos, radius in circles], 5000)
+    batch = measure(lambda: rounded_rects_collided_with_circles(rects, 1, circles), 5000)
+    print("%-12s %12.2f %12.2f %8.1fx" % ("batch", single, batch, single / batch))
+
+
+if __name__ == "__main__":
+    main()
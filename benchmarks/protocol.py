@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Measure encode/decode throughput and size of the LAN packets, binary against JSON encoding.
+
+Usage: python -m benchmarks.protocol
+"""
+
+import timeit
+from src.game import Game
+from src.utils import Packet, ENCODING_BINARY, ENCODING_JSON
+from src.invitation import InvitationPacket
+
+
+def sample_packets():
+    """
+    Build packets with the values of a typical frame.
+
+    :return: list, [(name, packet), ...]
+    """
+    server_data = Game._ServerData()
+    server_data.y_r1 = 175.0
+    server_data.x_r1 = 33.0
+    server_data.x_ball = 612.4242640687119
+    server_data.y_ball = 118.57359312880715
+    server_data.vx_ball = 300.0
+    server_data.vy_ball = -212.13203435596427
+    server_data.time = 81230
+    server_data.round = 3
+
+    client_data = Game._ClientData()
+    client_data.y_r2 = 172.0
+    client_data.x_r2 = 1000.0
+    server_event = Game._ServerEvent(Game._ServerEvent.METHOD_SOUND_BLIP)
+    return [("_ServerData", server_data), ("_ServerEvent", server_event), ("_ClientData", client_data),
+            ("Invitation", InvitationPacket("hussain"))]
+
+
+def measure(func, number=20000):
+    """
+    Measure the number of calls per second.
+
+    :param func: Callable without arguments
+    :param number: int, Number of calls per repetition
+    :return: float, Calls per second
+    """
+    return number / min(timeit.repeat(func, number=number, repeat=5))
+
+
+def main():
+    print("%-12s %-7s %6s %14s %14s" % ("packet", "format", "bytes", "encode (op/s)", "decode (op/s)"))
+    for encoding in (ENCODING_BINARY, ENCODING_JSON):
+        Packet.set_encoding(encoding)
+        for name, packet in sample_packets():
+            data = packet.dumps()
+            target = packet.__class__()
+            print("%-12s %-7s %6d %14.0f %14.0f" % (name, encoding, len(data), measure(packet.dumps),
+                                                    measure(lambda: target.loads(data))))
+    Packet.set_encoding(ENCODING_BINARY)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Measure the bandwidth of the LAN server states during a simulated match, full states against delta compressed
+states, with network latency and packet loss.
+
+Usage: python -m benchmarks.snapshot_bandwidth [loss] [latency_ticks]
+"""
+
+import sys
+import random
+from collections import deque
+from src.game import Game
+from src.physics import PhysicsWorld, MOVE_UP, MOVE_DOWN, EVENT_PLAYER1_SCORED, EVENT_PLAYER2_SCORED
+from src.globals import LEVEL_HARD
+from src.snapshot import DeltaEncoder, DeltaDecoder
+
+FPS = 100
+TICKS = 60 * FPS
+# IPv4 and UDP headers
+UDP_OVERHEAD = 28
+SEQUENCE_SIZE = 4
+
+
+def player_move(world, rng):
+    """
+    Scripted player 1, follows the puck while it is on its side of the board, with some hesitation.
+
+    :param world: PhysicsWorld
+    :param rng: Random
+    :return: enum, Move
+    """
+    paddle, puck = world.paddles[0], world.puck
+    if puck.x > world.width / 2 or rng.random() < 0.3:
+        return None
+    center = paddle.y + paddle.height / 2
+    if puck.y < center - 5:
+        return MOVE_UP
+    if puck.y > center + 5:
+        return MOVE_DOWN
+    return None
+
+
+def simulate(loss, latency):
+    """
+    Simulate a match sending a server state every tick.
+
+    :param loss: float, Probability of losing a datagram, in each direction
+    :param latency: int, One way latency in ticks
+    :return: (int, int, int), Number of states, bytes sent as full states and bytes sent as delta states
+    """
+    rng = random.Random(0)
+    world = PhysicsWorld(seed=0, level=LEVEL_HARD)
+    server_data = Game._ServerData()
+    server_data.round = 0
+    encoder = DeltaEncoder()
+    decoder = DeltaDecoder()
+    in_flight = deque()
+    acks = deque()
+    full_bytes = delta_bytes = 0
+    last_decoded = 0
+
+    for tick in range(1, TICKS + 1):
+        events = world.step((player_move(world, rng), None))
+        if EVENT_PLAYER1_SCORED in events or EVENT_PLAYER2_SCORED in events:
+            server_data.round = (server_data.round + 1) % 256
+        if world.is_round_over:
+            world.reset_round()
+
+        paddle1, puck = world.paddles[0], world.puck
+        server_data.y_r1 = paddle1.y
+        server_data.x_r1 = paddle1.x
+        server_data.x_ball = puck.x
+        server_data.y_ball = puck.y
+        server_data.vx_ball = puck.vx * FPS
+        server_data.vy_ball = puck.vy * FPS
+        server_data.time = tick * 1000 // FPS
+
+        # Acknowledgements come back with the client states
+        while acks and acks[0][0] <= tick:
+            encoder.acknowledge(acks.popleft()[1])
+
+        full_bytes += SEQUENCE_SIZE + len(server_data.dumps())
+        data = encoder.encode(tick, 0, server_data)
+        delta_bytes += len(data)
+        if rng.random() >= loss:
+            in_flight.append((tick + latency, data, server_data.quantized()))
+
+        while in_flight and in_flight[0][0] <= tick:
+            _, data, expected = in_flight.popleft()
+            packet = decoder.decode(data)
+            if packet is None:
+                continue
+            if packet.quantized() != expected:
+                raise AssertionError("Delta decoded state differs from the sent state")
+            last_decoded = DeltaDecoder.header(data)[0]
+        if rng.random() >= loss:
+            acks.append((tick + latency, last_decoded))
+
+    return TICKS, full_bytes, delta_bytes
+
+
+def main(args):
+    loss = float(args[0]) if args else 0.02
+    latency = int(args[1]) if len(args) > 1 else 3
+    states, full_bytes, delta_bytes = simulate(loss, latency)
+    seconds = states / FPS
+    print("%d states at %d Hz, %.0f%% loss, %d ms latency" % (states, FPS, loss * 100, latency * 1000 // FPS))
+    print("%-7s %12s %12s %18s" % ("format", "bytes/state", "bytes/s", "bytes/s (with IP)"))
+    for name, size in (("full", full_bytes), ("delta", delta_bytes)):
+        print("%-7s %12.1f %12.0f %18.0f" % (name, size / states, size / seconds,
+                                            (size + UDP_OVERHEAD * states) / seconds))
+    print("saved   %11.0f%% %11.0f%% %17.0f%%" % (
+        100 - 100 * delta_bytes / full_bytes, 100 - 100 * delta_bytes / full_bytes,
+        100 - 100 * (delta_bytes + UDP_OVERHEAD * states) / (full_bytes + UDP_OVERHEAD * states)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
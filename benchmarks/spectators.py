@@ -0,0 +1,72 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Measure the cost of publishing snapshots to spectators, with half of them never reading.
+
+Usage: python -m benchmarks.spectators [spectators ...]
+"""
+
+import sys
+import time
+import socket
+import threading
+from src.spectator import SpectatorHub, SpectatorPacket
+from src.utils import frame_reader
+
+RATE = 100
+SECONDS = 2
+
+
+def run(spectators):
+    """
+    Publish snapshots at RATE to a number of spectators.
+
+    :param spectators: int, Number of spectators
+    :return: (float, float), Average publish time in microseconds and snapshots received per reading spectator
+    """
+    hub = SpectatorHub(port=0)
+    hub.start()
+    conns = [socket.create_connection(("127.0.0.1", hub.port)) for _ in range(spectators)]
+    received = [0] * spectators
+
+    def read(i):
+        reader = frame_reader(conns[i])
+        while reader.read_frame() is not None:
+            received[i] += 1
+
+    readers = [threading.Thread(target=read, args=(i,), daemon=True) for i in range(0, spectators, 2)]
+    for reader in readers:
+        reader.start()
+    while hub.count < spectators:
+        time.sleep(0.01)
+
+    packet = SpectatorPacket()
+    elapsed = 0
+    ticks = RATE * SECONDS
+    for tick in range(ticks):
+        packet.time = tick * 1000 // RATE
+        packet.x_ball = tick % 1000
+        start = time.perf_counter()
+        hub.publish(packet)
+        elapsed += time.perf_counter() - start
+        time.sleep(1 / RATE)
+
+    hub.stop()
+    hub.join()
+    for conn in conns:
+        conn.close()
+    reading = received[::2]
+    return elapsed / ticks * 1e6, sum(reading) / len(reading) if reading else 0
+
+
+def main(args):
+    sizes = [int(arg) for arg in args] or [1, 16, 64]
+    print("%10s %14s %22s" % ("spectators", "publish (us)", "received (of %d)" % (RATE * SECONDS)))
+    for spectators in sizes:
+        publish, received = run(spectators)
+        print("%10d %14.1f %22.1f" % (spectators, publish, received))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,314 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Benchmark suite of the hot paths of the game loop, run headless. Results are the best mean time per call, in
+microseconds, and can be saved as JSON and compared against a stored baseline: a benchmark slower than the
+baseline by more than its threshold is a regression, and the exit status is 1.
+A fixed pure Python loop is measured with every run, and the baseline is scaled by its speed before comparing, so
+a machine that is slower or busier as a whole is not taken as a regression.
+
+Usage: python -m benchmarks.suite [--filter TEXT] [--output FILE] [--baseline FILE] [--save-baseline]
+"""
+
+import os
+
+# Headless, before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import sys
+import json
+import socket
+import timeit
+import argparse
+import platform
+import itertools
+import threading
+import subprocess
+import pygame
+from src.game import Game
+from src.globals import GAME_FONT, COLOR_GRAY, COLOR_RED_2
+from src.utils import rounded_rect_collided_with_circle, wrap_to_pi, aa_rounded_rect, generate_wrapped_text
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Allowed slowdown against the baseline, as a fraction of the baseline time
+THRESHOLD = 0.25
+REPEAT = 5
+
+
+def bench_collision_hit():
+    """
+    Paddle corner against the puck, as in Game._play.
+    """
+    rect, ball = (30, 175, 50, 50), (87, 168)
+    return lambda: rounded_rect_collided_with_circle(rect, 1, ball, 13)
+
+
+def bench_collision_miss():
+    """
+    Paddle far from the puck, the common case.
+    """
+    rect, ball = (30, 175, 50, 50), (300, 200)
+    return lambda: rounded_rect_collided_with_circle(rect, 1, ball, 13)
+
+
+def bench_wrap_to_pi():
+    """
+    Angles inside and outside [-pi, pi].
+    """
+    angles = itertools.cycle([0.5, 4.0, -4.0, 20.0])
+    return lambda: wrap_to_pi(next(angles))
+
+
+def bench_aa_rounded_rect():
+    """
+    Paddle drawn at moving positions.
+    """
+    surface = pygame.Surface((1080, 400))
+    positions = itertools.cycle([(x, 175, 50, 50) for x in range(0, 1000, 7)])
+    return lambda: aa_rounded_rect(surface, next(positions), COLOR_RED_2, 1)
+
+
+def bench_generate_wrapped_text():
+    """
+    Info screen lines, as shown while inviting.
+    """
+    lines = itertools.cycle(["Waiting for <user%d> response..." % i for i in range(4)])
+    return lambda: generate_wrapped_text(next(lines), GAME_FONT, COLOR_GRAY, 864, 40)
+
+
+def bench_do_graphics():
+    """
+    Whole game frame, including the display update.
+    """
+    game = Game()
+    frames = itertools.cycle([(175 + i % 50, 30, 175 - i % 50, 1000, 100 + i * 7 % 880, 50 + i * 3 % 300)
+                              for i in range(500)])
+    return lambda: game._do_graphics(*next(frames))
+
+
+def _server_data():
+    """
+    Build a _ServerData with the values of a typical frame.
+
+    :return: Game._ServerData
+    """
+    data = Game._ServerData()
+    data.y_r1, data.x_r1 = 175.0, 33.0
+    data.x_ball, data.y_ball = 612.4242640687119, 118.57359312880715
+    data.vx_ball, data.vy_ball = 300.0, -212.13203435596427
+    data.time, data.round = 81230, 3
+    return data
+
+
+def bench_server_data_dumps():
+    """
+    State sent by the LAN server every frame.
+    """
+    return _server_data().dumps
+
+
+def bench_server_data_loads():
+    """
+    State received by the LAN client every frame.
+    """
+    data, target = _server_data().dumps(), Game._ServerData()
+    return lambda: target.loads(data)
+
+
+def bench_client_data_dumps():
+    """
+    Paddle sent by the LAN client every frame.
+    """
+    client_data = Game._ClientData()
+    client_data.y_r2, client_data.x_r2 = 172.0, 1000.0
+    return client_data.dumps
+
+
+def bench_client_data_loads():
+    """
+    Paddle received by the LAN server every frame.
+    """
+    client_data = Game._ClientData()
+    client_data.y_r2, client_data.x_r2 = 172.0, 1000.0
+    data, target = client_data.dumps(), Game._ClientData()
+    return lambda: target.loads(data)
+
+
+def bench_tcp_round_trip():
+    """
+    LAN state sent over loopback TCP and answered by the other side.
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    client = socket.create_connection(server.getsockname())
+    conn, _ = server.accept()
+    server.close()
+    for s in (client, conn):
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def serve():
+        # The LAN server answers every state of the client with its own
+        received, reply = Game._ServerData(), Game._ClientData()
+        while received.receive_from(conn):
+            reply.send_to(conn)
+        conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    server_data, client_data = _server_data(), Game._ClientData()
+
+    def round_trip():
+        server_data.send_to(client)
+        client_data.receive_from(client)
+
+    round_trip.close = client.close
+    return round_trip
+
+
+def bench_startup():
+    """
+    Launch the game until its first frame, it exits there.
+    """
+    command = [sys.executable, "run.py", "--startup-report"]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def startup():
+        subprocess.run(command, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+    startup.number = 1
+    return startup
+
+
+# (name, setup returning the callable to measure, threshold / None for the default one)
+BENCHMARKS = [
+    ("geometry/collision_hit", bench_collision_hit, None),
+    ("geometry/collision_miss", bench_collision_miss, None),
+    ("geometry/wrap_to_pi", bench_wrap_to_pi, None),
+    ("render/aa_rounded_rect", bench_aa_rounded_rect, None),
+    ("render/generate_wrapped_text", bench_generate_wrapped_text, None),
+    ("render/do_graphics", bench_do_graphics, None),
+    ("packet/server_data_dumps", bench_server_data_dumps, None),
+    ("packet/server_data_loads", bench_server_data_loads, None),
+    ("packet/client_data_dumps", bench_client_data_dumps, None),
+    ("packet/client_data_loads", bench_client_data_loads, None),
+    # The network and the process start depend much more on the machine load
+    ("net/tcp_round_trip", bench_tcp_round_trip, 1.0),
+    ("startup/first_frame", bench_startup, 1.0),
+]
+
+
+def calibration():
+    """
+    Reference workload the results are scaled by.
+
+    :return: int, Result
+    """
+    total = 0
+    for i in range(200):
+        total += i * i
+    return total
+
+
+def measure(func):
+    """
+    Measure the mean time of a call, with enough calls per repetition to last at least 0.2 seconds.
+    Callables with a number attribute are called that many times instead.
+
+    :param func: Callable without arguments
+    :return: float, Best mean time per call in microseconds
+    """
+    timer = timeit.Timer(func)
+    number = getattr(func, "number", None) or timer.autorange()[0]
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number * 1e6
+
+
+def run(pattern=""):
+    """
+    Run the benchmarks whose name contains a pattern.
+
+    :param pattern: str, Pattern
+    :return: (dict, float), Best mean time per call in microseconds by benchmark, and of the calibration
+    """
+    pygame.init()
+    reference = measure(calibration)
+    results = {}
+    for name, setup, _ in BENCHMARKS:
+        if pattern not in name:
+            continue
+        func = setup()
+        try:
+            results[name] = measure(func)
+        finally:
+            if hasattr(func, "close"):
+                func.close()
+    # Measured again, as the machine speed may change while running
+    return results, (reference + measure(calibration)) / 2
+
+
+def compare(document, baseline, threshold=THRESHOLD):
+    """
+    Compare results against a baseline, scaled by the calibration of both.
+
+    :param document: dict, Current results document
+    :param baseline: dict, Baseline document
+    :param threshold: float, Threshold of the benchmarks using the default one
+    :return: list, [(name, time, scaled baseline time / None, ratio / None, is_regression), ...]
+    """
+    thresholds = {name: value or threshold for name, _, value in BENCHMARKS}
+    references = baseline.get("results", {})
+    scale = document["calibration"] / baseline["calibration"] if "calibration" in baseline else 1
+    rows = []
+    for name, value in document["results"].items():
+        reference = references[name] * scale if name in references else None
+        ratio = value / reference if reference else None
+        rows.append((name, value, reference, ratio, ratio is not None and ratio > 1 + thresholds[name]))
+    return rows
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark suite of the game hot paths.")
+    parser.add_argument("--filter", default="", help="only run the benchmarks whose name contains this text")
+    parser.add_argument("--output", help="save the results as JSON to this file, - for standard output")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="allowed slowdown of the CPU bound benchmarks, as a fraction of the baseline")
+    args = parser.parse_args(argv)
+    if args.save_baseline and args.filter:
+        parser.error("the whole suite must be run to save a baseline")
+
+    results, reference = run(args.filter)
+    document = {"python": platform.python_version(), "machine": platform.machine(), "unit": "us",
+                "calibration": reference, "results": results}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as fd:
+            baseline = json.load(fd)
+
+    rows = compare(document, baseline, args.threshold)
+    print("%-30s %12s %12s %8s" % ("benchmark", "time (us)", "base (us)", "ratio"), file=sys.stderr)
+    for name, value, reference, ratio, is_regression in rows:
+        print("%-30s %12.3f %12s %8s %s" % (name, value, "%.3f" % reference if reference else "-",
+                                            "%.2f" % ratio if ratio else "-", "REGRESSION" if is_regression else ""),
+              file=sys.stderr)
+
+    if args.output == "-":
+        json.dump(document, sys.stdout, indent=2)
+        print()
+    elif args.output:
+        with open(args.output, "w") as fd:
+            json.dump(document, fd, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as fd:
+            json.dump(document, fd, indent=2, sort_keys=True)
+            fd.write("\n")
+
+    return 1 if any(row[-1] for row in rows) and not args.save_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,19 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import argparse
+from src.globals import LOBBY_PORT
+from src.lobby import LobbyServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Air Hockey lobby directory, an alternative to broadcast discovery.")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=LOBBY_PORT, help="port to listen on")
+    args = parser.parse_args()
+
+    LobbyServer(args.host, args.port).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,48 @@
 #!/usr/bin/python
 # -*- coding: UTF-8 -*-
 
-from src.game import Game
+import os
+import sys
+import json
+import argparse
+from src.startup import StartupProfiler
 
 
 def main():
+    profiler = StartupProfiler()
+    parser = argparse.ArgumentParser(description="Air Hockey.")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print the imports and the time until the first frame, and exit")
+    parser.add_argument("--json", action="store_true", help="print the startup report as JSON")
+    args = parser.parse_args()
+    if args.json:
+        # Keep the output parseable
+        os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+
+    # The game is imported here, so its imports are recorded
+    profiler.install()
+    from src.game import Game
+    profiler.phase("imports")
     game = Game()
+    profiler.phase("game")
+    profiler.uninstall()
+
+    if args.startup_report:
+        def on_first_frame():
+            import pygame
+            profiler.phase("first frame")
+            if args.json:
+                json.dump({"phases": dict(profiler.phases), "assets": game.assets.timings,
+                           "imports": [{"module": name, "self": own, "cumulative": cumulative}
+                                       for name, own, cumulative in profiler.imports]}, sys.stdout, indent=2)
+                print()
+            else:
+                print(profiler.report())
+                print()
+                print(game.assets.report())
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+        game.set_first_frame_handler(on_first_frame)
     game.play()
 
 
@@ -0,0 +1,25 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import argparse
+from src.globals import SERVER_PORT
+from src.physics import BASE_TICK_RATE
+from src.server import GameServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dedicated Air Hockey server hosting many matches.")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT,
+                        help="front port, workers listen on the following ports")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, the number of CPUs by default")
+    parser.add_argument("--tick-rate", type=int, default=BASE_TICK_RATE, help="physics ticks per second")
+    parser.add_argument("--send-rate", type=int, default=60, help="states sent per second")
+    args = parser.parse_args()
+
+    server = GameServer(args.host, args.port, args.workers, args.tick_rate, args.send_rate)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import os
+import time
+import pygame
+import threading
+
+__all__ = [
+    "AssetManager",
+]
+
+
+class _Preloader(threading.Thread):
+    """
+    Threaded loader of the assets expected to be used soon.
+    """
+
+    def __init__(self, assets, sounds):
+        """
+        :param assets: AssetManager, Manager to load the assets with
+        :param sounds: list, Names of the sounds to load
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.__is_running = False
+        self.__assets = assets
+        self.__sounds = sounds
+
+    def run(self):
+        self.__is_running = True
+        for name in self.__sounds:
+            if not self.__is_running:
+                break
+            self.__assets.sound(name)
+
+    def stop(self):
+        """
+        Stops the thread.
+
+        :return: None
+        """
+        self.__is_running = False
+
+
+class AssetManager:
+    """
+    Game assets, loaded on first use or preloaded in background, so nothing is loaded before it is needed.
+    Images are converted to the display format once loaded, and music is streamed from disk by pygame.mixer.music
+    instead of being decoded into memory. The time spent loading every asset is kept.
+    """
+
+    def __init__(self, root="resources"):
+        """
+        :param root: str, Assets directory, with the images and sounds subdirectories
+        """
+        self.__root = root
+        self.__sounds = {}
+        self.__images = {}
+        self.__timings = {}
+        self.__lock = threading.Lock()
+        self.__preloader = None
+
+    def _path(self, kind, name, extension):
+        """
+        Get the path of an asset.
+
+        :param kind: str, Assets subdirectory
+        :param name: str, Asset name
+        :param extension: str, File extension
+        :return: str, Path
+        """
+        return os.path.join(self.__root, kind, name + extension)
+
+    def sound(self, name):
+        """
+        Get a sound, loading it if it is the first use. If the sound is being preloaded, wait for it.
+
+        :param name: str, Sound name, i.e., file name in the sounds directory without extension
+        :return: pygame.mixer.Sound, Sound
+        """
+        sound = self.__sounds.get(name)
+        if sound is None:
+            with self.__lock:
+                sound = self.__sounds.get(name)
+                if sound is None:
+                    start = time.perf_counter()
+                    sound = pygame.mixer.Sound(self._path("sounds", name, ".wav"))
+                    self.__timings["sounds/%s" % name] = time.perf_counter() - start
+                    self.__sounds[name] = sound
+        return sound
+
+    def image(self, name, alpha=True):
+        """
+        Get an image converted to the display format, loading it if it is the first use.
+        The display mode must be set.
+
+        :param name: str, Image name, i.e., file name in the images directory without extension
+        :param alpha: bool, Keep the transparency
+        :return: pygame.Surface, Image
+        """
+        image = self.__images.get(name)
+        if image is None:
+            start = time.perf_counter()
+            # noinspection PyUnresolvedReferences
+            image = pygame.image.load(self._path("images", name, ".png"))
+            image = image.convert_alpha() if alpha else image.convert()
+            self.__timings["images/%s" % name] = time.perf_counter() - start
+            self.__images[name] = image
+        return image
+
+    def play_music(self, name, loops=0):
+        """
+        Stream a long sound from disk, only a small buffer is kept in memory.
+
+        :param name: str, Sound name, i.e., file name in the sounds directory without extension
+        :param loops: int, Times the music is repeated, -1 to repeat forever
+        :return: None
+        """
+        start = time.perf_counter()
+        pygame.mixer.music.load(self._path("sounds", name, ".wav"))
+        pygame.mixer.music.play(loops)
+        self.__timings["music/%s" % name] = time.perf_counter() - start
+
+    def preload(self, sounds):
+        """
+        Load sounds in background.
+
+        :param sounds: list, Names of the sounds
+        :return: None
+        """
+        self.__preloader = _Preloader(self, sounds)
+        self.__preloader.start()
+
+    def stop(self):
+        """
+        Stop loading in background.
+
+        :return: None
+        """
+        if self.__preloader is not None:
+            self.__preloader.stop()
+            self.__preloader.join()
+            self.__preloader = None
+
+    @property
+    def timings(self):
+        """
+        Get the time spent loading every asset, in loading order.
+
+        :return: dict, Seconds by asset as "kind/name"
+        """
+        return dict(self.__timings)
+
+    def report(self):
+        """
+        Get a report of the time spent loading every asset.
+
+        :return: str, One line per asset
+        """
+        return "\n".join("%-20s %8.1f ms" % (asset, seconds * 1000) for asset, seconds in self.timings.items())
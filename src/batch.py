@@ -0,0 +1,315 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import math
+import numpy as np
+from .physics import MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT
+from .globals import MIN_WIDTH, MIN_HEIGHT, LEVEL_EASY, LEVEL_MEDIUM, LEVEL_HARD, LEVEL_IMPOSSIBLE
+
+__all__ = [
+    "NO_GOAL",
+    "PLAYER1_SCORED",
+    "PLAYER2_SCORED",
+    "BatchPhysicsWorld",
+]
+
+# Goal results returned by step
+NO_GOAL = 0
+PLAYER1_SCORED = 1
+PLAYER2_SCORED = 2
+
+
+def _wrap_to_pi(angle):
+    """
+    Vectorized wrap_to_pi.
+
+    :param angle: ndarray, Angles in rads
+    :return: ndarray, Wrapped angles
+    """
+    return np.remainder(angle + math.pi, 2 * math.pi) - math.pi
+
+
+class BatchPhysicsWorld:
+    """
+    N concurrent matches simulated at once. State is kept as struct-of-arrays, so every tick is a fixed
+    number of vectorized operations no matter how many matches are running. Follows the same rules as
+    PhysicsWorld.
+    """
+
+    def __init__(self, n, width=MIN_WIDTH, height=MIN_HEIGHT, seed=None, level=None, max_score=5,
+                 auto_reset=True):
+        """
+        :param n: int, Number of matches
+        :param width: int, Board width
+        :param height: int, Board height
+        :param seed: Seed for the random generator, None for a random seed
+        :param level: enum, PC level controlling player 2 in every match, None if player 2 is not the PC
+        :param max_score: int, Score to win a match
+        :param auto_reset: bool, Start a new round as soon as a goal is scored
+        """
+        self.n = n
+        self.width = width
+        self.height = height
+        self.level = level
+        self.max_score = max_score
+        self.auto_reset = auto_reset
+        self.rand = np.random.default_rng(seed)
+
+        # Same constants as PhysicsWorld
+        self.paddle_speed = 3
+        self.paddle_hard_speed_offset = 1
+        self.pc_move_offset = 20
+        self.paddle_width = 50
+        self.paddle_height = 50
+        self.puck_radius = int(min(height, width) / 30)
+        self.puck_start_speed = 3
+        self.puck_speed_step = 0.2
+        self.puck_max_speed = 10
+        self.max_puck_angle = math.radians(60)
+        self.max_collision_angle = math.radians(60)
+        self.collision_coefficient = self.max_collision_angle / math.pow(self.paddle_height / 2.0, 3)
+
+        # Paddles
+        self.paddle1_x = np.empty(n)
+        self.paddle1_y = np.empty(n)
+        self.paddle2_x = np.empty(n)
+        self.paddle2_y = np.empty(n)
+
+        # Puck
+        self.puck_x = np.empty(n)
+        self.puck_y = np.empty(n)
+        self.puck_vx = np.empty(n)
+        self.puck_vy = np.empty(n)
+        self.puck_speed = np.empty(n)
+
+        # Flags and scores
+        self.has_collided = np.zeros(n, dtype=bool)
+        self.has_collided_with_top_bottom = np.zeros(n, dtype=bool)
+        self.min_distance_ratio = np.zeros(n)
+        self.is_round_over = np.zeros(n, dtype=bool)
+        self.score = np.zeros((n, 2), dtype=np.int32)
+        self.is_match_over = np.zeros(n, dtype=bool)
+
+        self.reset_round(np.ones(n, dtype=bool))
+
+    @property
+    def is_over(self):
+        """
+        Get which matches have finished, i.e., one of the players reached the max score.
+
+        :return: ndarray, bool mask
+        """
+        return self.is_match_over
+
+    def reset_round(self, mask):
+        """
+        Place paddles and puck at their start positions and throw the puck in a random diagonal.
+
+        :param mask: ndarray, bool mask of the matches to reset
+        :return: None
+        """
+        count = int(np.count_nonzero(mask))
+        if not count:
+            return
+        self.paddle1_x[mask] = 30
+        self.paddle1_y[mask] = (self.height - self.paddle_height) / 2
+        self.paddle2_x[mask] = self.width - 80
+        self.paddle2_y[mask] = (self.height - self.paddle_height) / 2
+
+        angle = math.pi / 4 + self.rand.integers(0, 4, count) * math.pi / 2
+        self.puck_x[mask] = int(self.width / 2)
+        self.puck_y[mask] = int(self.height / 2)
+        self.puck_speed[mask] = self.puck_start_speed
+        self.puck_vx[mask] = np.cos(angle) * self.puck_start_speed
+        self.puck_vy[mask] = np.sin(angle) * self.puck_start_speed
+        self.min_distance_ratio[mask] = 0
+        self.is_round_over[mask] = False
+
+    def _move_paddles(self, x, y, player, moves, speed, active):
+        """
+        Apply moves to one side paddles where allowed, in place. Paddles are stopped at the walls and the middle line.
+
+        :param x: ndarray, Paddles x coordinates
+        :param y: ndarray, Paddles y coordinates
+        :param player: int, Player 1 or 2
+        :param moves: ndarray, Moves (0 for no move)
+        :param speed: float/ndarray, Pixels to move
+        :param active: ndarray, bool mask of matches allowed to move
+        :return: None
+        """
+        half = self.width / 2
+        if player == 2:
+            min_x, max_x = half, self.width - self.paddle_width
+        else:
+            min_x, max_x = 0, half - self.paddle_width
+        max_y = self.height - self.paddle_height
+        active = active & (0 < self.puck_x) & (self.puck_x < self.width)
+        up = active & (moves == MOVE_UP) & (y > 0)
+        down = active & (moves == MOVE_DOWN) & (y < max_y)
+        left = active & (moves == MOVE_LEFT) & (x > min_x)
+        right = active & (moves == MOVE_RIGHT) & (x < max_x)
+        y[:] = np.where(up, np.maximum(y - speed, 0), y)
+        y[:] = np.where(down, np.minimum(y + speed, max_y), y)
+        x[:] = np.where(left, np.maximum(x - speed, min_x), x)
+        x[:] = np.where(right, np.minimum(x + speed, max_x), x)
+
+    def _pc_moves(self):
+        """
+        Get the PC (player 2) moves for the current level.
+
+        :return: ndarray, Moves
+        """
+        moving_right = self.puck_vx > 0
+        if self.level == LEVEL_IMPOSSIBLE:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                y = np.round((self.paddle2_x - self.puck_x) * self.puck_vy / self.puck_vx + self.puck_y)
+            # Unfold the bounces on the top and bottom walls
+            y = np.where(moving_right, y, self.height / 2)
+            folds = np.floor_divide(y, self.height)
+            folds = np.where(np.remainder(y, self.height) == 0, folds - (y > 0), folds)
+            y = y - folds * self.height
+            y_desired = np.where(np.remainder(folds, 2) == 1, self.height - y, y)
+            follow = np.ones(self.n, dtype=bool)
+        else:
+            y_desired = self.puck_y
+            if self.level == LEVEL_HARD:
+                follow = np.ones(self.n, dtype=bool)
+            elif self.level == LEVEL_MEDIUM:
+                follow = moving_right
+            else:
+                follow = moving_right & (self.puck_x / self.width >= self.min_distance_ratio)
+
+        moves = np.zeros(self.n, dtype=np.int8)
+        down = follow & (y_desired > self.paddle2_y + (self.paddle_height + self.pc_move_offset) / 2)
+        up = follow & ~down & (y_desired < self.paddle2_y + (self.paddle_height - self.pc_move_offset) / 2)
+        moves[down] = MOVE_DOWN
+        moves[up] = MOVE_UP
+        return moves
+
+    def _contact_y(self, paddle_x, paddle_y):
+        """
+        Vectorized rounded rect (radius 1) and puck collision test. The exact test only runs on the
+        matches whose puck is inside the paddle bounding box, which are usually a few.
+
+        :param paddle_x: ndarray, Paddles x coordinates
+        :param paddle_y: ndarray, Paddles y coordinates
+        :return: (ndarray, ndarray), bool mask of collisions and contact y coordinates of the collisions
+        """
+        radius = self.puck_radius
+        collided = np.zeros(self.n, dtype=bool)
+        near = np.flatnonzero((paddle_x - radius <= self.puck_x) &
+                              (self.puck_x <= paddle_x + self.paddle_width + radius) &
+                              (paddle_y - radius <= self.puck_y) &
+                              (self.puck_y <= paddle_y + self.paddle_height + radius))
+        if not near.size:
+            return collided, None
+
+        puck_x = self.puck_x[near]
+        puck_y = self.puck_y[near]
+        corner_radius = min(self.paddle_width, self.paddle_height) / 2
+        left = paddle_x[near] + corner_radius
+        right = paddle_x[near] + self.paddle_width - corner_radius
+        top = paddle_y[near] + corner_radius
+        bottom = paddle_y[near] + self.paddle_height - corner_radius
+
+        core_x = np.minimum(np.maximum(puck_x, left), right)
+        core_y = np.minimum(np.maximum(puck_y, top), bottom)
+        dx = puck_x - core_x
+        dy = puck_y - core_y
+        distance = np.sqrt(dx * dx + dy * dy)
+        collided[near] = distance <= corner_radius + radius
+
+        # Inside the core the puck is pushed out through the nearest face
+        nearest = np.argmin(np.stack((puck_x - left, right - puck_x, puck_y - top, bottom - puck_y)), axis=0)
+        inside_y = np.where(nearest == 2, top - corner_radius,
+                            np.where(nearest == 3, bottom + corner_radius, puck_y))
+        contact_y = np.zeros(self.n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            contact_y[near] = np.where(distance > 0, core_y + dy / distance * corner_radius, inside_y)
+        return collided, contact_y
+
+    def step(self, moves1=None, moves2=None):
+        """
+        Advance every match by one tick.
+
+        :param moves1: ndarray, Player 1 moves (0 for no move), None if no player 1 moves
+        :param moves2: ndarray, Player 2 moves, ignored if PC is playing
+        :return: ndarray, Goal result of each match: NO_GOAL, PLAYER1_SCORED or PLAYER2_SCORED
+        """
+        active = ~(self.is_round_over | self.is_match_over)
+
+        # Paddles
+        if moves1 is not None:
+            self._move_paddles(self.paddle1_x, self.paddle1_y, 1, moves1, self.paddle_speed, active)
+        if self.level is not None:
+            speed = self.paddle_speed + (self.paddle_hard_speed_offset if self.level == LEVEL_HARD else 0)
+            self._move_paddles(self.paddle2_x, self.paddle2_y, 2, self._pc_moves(), speed, active)
+        elif moves2 is not None:
+            self._move_paddles(self.paddle2_x, self.paddle2_y, 2, moves2, self.paddle_speed, active)
+
+        # Top and bottom walls
+        radius = self.puck_radius
+        outside = (self.puck_y <= radius) | (self.puck_y >= self.height - radius)
+        bounce = active & outside & ~self.has_collided_with_top_bottom
+        self.puck_vy[bounce] = -self.puck_vy[bounce]
+        self.has_collided_with_top_bottom = np.where(active, outside, self.has_collided_with_top_bottom)
+
+        # Paddles
+        collided1, contact1 = self._contact_y(self.paddle1_x, self.paddle1_y)
+        collided2, contact2 = self._contact_y(self.paddle2_x, self.paddle2_y)
+        collided = active & (collided1 | collided2)
+        hit = collided & ~self.has_collided
+        if hit.any():
+            self.puck_speed = np.where(hit & (self.puck_speed < self.puck_max_speed),
+                                       self.puck_speed + self.puck_speed_step, self.puck_speed)
+            if self.level == LEVEL_EASY:
+                ratio = hit & (self.puck_vx <= 0)
+                self.min_distance_ratio[ratio] = self.rand.uniform(0, 0.7, int(np.count_nonzero(ratio)))
+
+            angle = math.pi - np.arctan2(self.puck_vy, self.puck_vx)
+            max_angle = self.max_puck_angle
+
+            # Deflection rule, the further from the paddle center, the bigger the deflection
+            first = collided1
+            if contact1 is None:
+                offset = contact2 - self.paddle2_y
+            elif contact2 is None:
+                offset = contact1 - self.paddle1_y
+            else:
+                offset = np.where(first, contact1 - self.paddle1_y, contact2 - self.paddle2_y)
+            offset -= self.paddle_height / 2
+            offset = offset ** 3 * self.collision_coefficient
+            angle = np.where(first, angle + offset, angle - offset)
+            wrapped = _wrap_to_pi(angle)
+            angle1 = np.where(wrapped < -max_angle, -max_angle, np.where(wrapped > max_angle, max_angle, angle))
+            angle2 = np.where((0 < wrapped) & (wrapped < math.pi - max_angle), math.pi - max_angle,
+                              np.where((max_angle - math.pi < wrapped) & (wrapped < 0), max_angle - math.pi,
+                                       angle))
+            angle = np.where(first, angle1, angle2)
+            self.puck_vx = np.where(hit, np.cos(angle) * self.puck_speed, self.puck_vx)
+            self.puck_vy = np.where(hit, np.sin(angle) * self.puck_speed, self.puck_vy)
+        # Clear collision flag only if there is no risk of a new collision in the same place
+        clear = active & ~collided & (self.paddle1_x + self.paddle_width + radius < self.puck_x) & \
+            (self.puck_x < self.paddle2_x - radius)
+        self.has_collided = (self.has_collided | hit) & ~clear
+
+        # Move or score
+        inside = (-radius <= self.puck_x) & (self.puck_x <= self.width + radius)
+        moving = active & inside
+        self.puck_x += moving * self.puck_vx
+        self.puck_y += moving * self.puck_vy
+
+        scored = active & ~inside
+        player1 = scored & (self.puck_vx > 0)
+        player2 = scored & ~player1
+        goals = np.zeros(self.n, dtype=np.int8)
+        if scored.any():
+            self.score[:, 0] += player1
+            self.score[:, 1] += player2
+            self.is_round_over |= scored
+            self.is_match_over |= scored & (np.maximum(self.score[:, 0], self.score[:, 1]) >= self.max_score)
+            goals[player1] = PLAYER1_SCORED
+            goals[player2] = PLAYER2_SCORED
+            if self.auto_reset:
+                self.reset_round(scored & ~self.is_match_over)
+        return goals
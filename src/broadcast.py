@@ -2,77 +2,194 @@
 # -*- coding: UTF-8 -*-
 
 import time
+import struct
 import socket
 import threading
-from .utils import get_local_ip
-from .globals import BROADCAST_PORT, BROADCAST_BUFFER_SIZE, BROADCAST_IDENTIFIER, BROADCAST_TIMEOUT
+from .interfaces import local_interfaces
+from .globals import BROADCAST_PORT, BROADCAST_BUFFER_SIZE, BROADCAST_IDENTIFIER, BROADCAST_TIMEOUT, \
+    BROADCAST_PROTOCOL_VERSION, TCP_PORT, SPECTATOR_PORT
 
 __all__ = [
+    "Beacon",
     "GetBroadcast",
     "DoBroadcast",
 ]
 
+# Identifier, protocol version, port, spectator port, matches, spectators and load, followed by the username
+_BEACON_HEADER = struct.Struct("!%dsBHHBBB" % len(BROADCAST_IDENTIFIER))
+# Load is sent in steps, so small variations do not change the beacon
+_LOAD_STEP = 10
+
+
+class Beacon:
+    """
+    Host status announced to the LAN. Hosts are ranked by it, idle and less loaded hosts first.
+    """
+
+    __slots__ = ("username", "port", "spectator_port", "matches", "spectators", "load")
+
+    def __init__(self, username="", port=TCP_PORT, spectator_port=SPECTATOR_PORT, matches=0, spectators=0, load=0):
+        """
+        :param username: str, Username
+        :param port: int, Port invitations are accepted on
+        :param spectator_port: int, Port spectators connect to, 0 if not accepting spectators
+        :param matches: int, Matches being played
+        :param spectators: int, Spectators connected
+        :param load: int, Percentage of the frame time the host is busy
+        """
+        self.username = username
+        self.port = port
+        self.spectator_port = spectator_port
+        self.matches = min(matches, 255)
+        self.spectators = min(spectators, 255)
+        self.load = min(max(int(round(load / _LOAD_STEP)) * _LOAD_STEP, 0), 100)
+
+    def __eq__(self, other):
+        return isinstance(other, Beacon) and self.key() == other.key()
+
+    def key(self):
+        """
+        Get the key hosts are ranked by: idle hosts first, then the less loaded and the less watched.
+
+        :return: tuple, Key
+        """
+        return self.matches, self.load, self.spectators, self.username, self.port, self.spectator_port
+
+    def dumps(self):
+        """
+        Encode the beacon.
+
+        :return: bytes, Beacon data
+        """
+        return _BEACON_HEADER.pack(BROADCAST_IDENTIFIER.encode("utf-8"), BROADCAST_PROTOCOL_VERSION, self.port,
+                                   self.spectator_port, self.matches, self.spectators, self.load) + \
+            self.username.encode("utf-8")
+
+    @classmethod
+    def loads(cls, data):
+        """
+        Decode a beacon. Beacons of other applications or protocol versions are ignored.
+
+        :param data: bytes, Beacon data
+        :return: Beacon / None if not valid
+        """
+        if len(data) < _BEACON_HEADER.size:
+            return None
+        identifier, version, port, spectator_port, matches, spectators, load = _BEACON_HEADER.unpack_from(data)
+        if identifier != BROADCAST_IDENTIFIER.encode("utf-8") or version != BROADCAST_PROTOCOL_VERSION:
+            return None
+        try:
+            username = data[_BEACON_HEADER.size:].decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        return cls(username, port, spectator_port, matches, spectators, load)
+
 
 class GetBroadcast(threading.Thread):
     """
-    Threaded broadcast packet listener
+    Threaded broadcast packet listener. Peers are kept in a table indexed by (ip, username) with the time they
+    were last seen and their last beacon, and expire when they stop broadcasting for ttl seconds. Every change of
+    the table is published at once, ranked by the beacons, with a version number so consumers only rebuild their
+    views when something changed.
     """
 
-    def __init__(self):
+    def __init__(self, ttl=2 * BROADCAST_TIMEOUT + 1):
+        """
+        :param ttl: float, Seconds a peer is kept since its last broadcast
+        """
         threading.Thread.__init__(self)
         self.daemon = True
         self.__is_running = False
-        self.__ip = [get_local_ip(), "127.0.0.1"]
+        self.__ttl = ttl
+        self.__peers = {}
+        self.__beacons = {}
+        self.__next_expiry = None
         self.__data = []
+        self.__version = 0
 
     def run(self):
         self.__is_running = True
-        overall_timeout = 2 * BROADCAST_TIMEOUT + 1
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.bind(("", BROADCAST_PORT))
-        s.settimeout(overall_timeout)
+        s.settimeout(0.5)
 
         while self.__is_running:
-            data = []
-            start_time = time.time()
-            while time.time() - start_time < overall_timeout:
-                try:
-                    _data, (ip, _) = s.recvfrom(BROADCAST_BUFFER_SIZE)
-                except socket.timeout:
-                    continue
-                username = self.__parse_data(_data)
-                if username is not None:
-                    user = (username, (username, ip))
-                    if ip not in self.__ip and user not in data:
-                        data.append(user)
-
-            if self.__data != data:
-                self.__data = list(data)
+            try:
+                _data, (ip, _) = s.recvfrom(BROADCAST_BUFFER_SIZE)
+            except socket.timeout:
+                pass
+            else:
+                beacon = Beacon.loads(_data)
+                if beacon is not None and not local_interfaces.is_local(ip):
+                    self._seen((ip, beacon.username), beacon, time.monotonic())
+            self._expire(time.monotonic())
 
         s.close()
 
-    @staticmethod
-    def __parse_data(data):
+    def _seen(self, peer, beacon, now):
+        """
+        Register a broadcast from a peer, publishing the table if the peer is new or its beacon changed.
+
+        :param peer: (str, str), Peer ip address and username
+        :param beacon: Beacon, Peer beacon
+        :param now: float, Current time
+        :return: None
+        """
+        is_changed = self.__beacons.get(peer) != beacon
+        self.__peers[peer] = now
+        self.__beacons[peer] = beacon
+        if self.__next_expiry is None:
+            self.__next_expiry = now + self.__ttl
+        if is_changed:
+            self._publish()
+
+    def _expire(self, now):
+        """
+        Remove the peers not seen for ttl seconds, publishing the table if any was removed.
+        The table is only scanned when the oldest peer may have expired.
+
+        :param now: float, Current time
+        :return: None
+        """
+        if self.__next_expiry is None or now < self.__next_expiry:
+            return
+        deadline = now - self.__ttl
+        expired = [peer for peer, last_seen in self.__peers.items() if last_seen <= deadline]
+        for peer in expired:
+            del self.__peers[peer]
+            del self.__beacons[peer]
+        self.__next_expiry = min(self.__peers.values()) + self.__ttl if self.__peers else None
+        if expired:
+            self._publish()
+
+    def _publish(self):
         """
-        Parse data from packet.
+        Publish the peer table to the consumers.
 
-        :param data: bytes, Data as bytes.
-        :return: str, Username from packet
+        :return: None
         """
-        data = data.decode("utf-8")
-        if data.startswith("%s," % BROADCAST_IDENTIFIER):
-            return data.split(",")[1]
-        return None
+        self.__data = sorted(((ip, beacon) for (ip, _), beacon in self.__beacons.items()),
+                             key=lambda host: (host[1].key(), host[0]))
+        self.__version += 1
 
     @property
     def data(self):
         """
-        Get gathered data in format of [(username, (username, ip)), ...]
+        Get gathered data in format of [(ip, beacon), ...], idle and less loaded hosts first
 
         :return: list, Gathered data
         """
         return self.__data
 
+    @property
+    def version(self):
+        """
+        Get the version of the gathered data, increased on every change.
+
+        :return: int, Version
+        """
+        return self.__version
+
     def stop(self):
         """
         Stops the thread.
@@ -84,7 +201,7 @@ class GetBroadcast(threading.Thread):
 
 class DoBroadcast(threading.Thread):
     """
-    Threaded broadcast packet sender
+    Threaded broadcast packet sender, announcing the current beacon of the parent
     """
 
     def __init__(self, parent):
@@ -98,20 +215,10 @@ class DoBroadcast(threading.Thread):
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         while self.__is_running:
-            data = self.__construct_data(self.__parent.username)
+            data = self.__parent.beacon.dumps()
             s.sendto(data, ("255.255.255.255", BROADCAST_PORT))
             time.sleep(BROADCAST_TIMEOUT)
 
-    @staticmethod
-    def __construct_data(username):
-        """
-        Constructs packet with the provided username
-
-        :param username: str, Username
-        :return: bytes, Packet
-        """
-        return bytes("%s,%s" % (BROADCAST_IDENTIFIER, username), "utf-8")
-
     def stop(self):
         """
         Stops the thread.
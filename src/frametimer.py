@@ -0,0 +1,158 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import csv
+import json
+import time
+import pygame
+from array import array
+from .globals import COLOR_BLACK, COLOR_WHITE, PHASE_NAMES, FRAME_TIMER_SIZE
+from .utils import get_font
+
+__all__ = [
+    "FrameTimer",
+]
+
+# Percentiles shown by the overlay, and seconds between overlay updates
+_PERCENTILES = (50, 95, 99)
+_OVERLAY_INTERVAL = 0.5
+_OVERLAY_LINE_HEIGHT = 16
+
+
+class FrameTimer:
+    """
+    Per-phase frame timer. The time between two marks is added to the phase of the second mark, and at the end of
+    every frame the phase times are stored in a ring buffer of the last frames, one array per phase.
+    While disabled, marking returns at once, so the game loops can keep their marks.
+    """
+
+    def __init__(self, size=FRAME_TIMER_SIZE):
+        """
+        :param size: int, Frames kept
+        """
+        self.enabled = False
+        self.__size = size
+        self.__samples = [array("d", [0.0]) * size for _ in PHASE_NAMES]
+        self.__current = [0.0] * len(PHASE_NAMES)
+        self.__index = 0
+        self.__count = 0
+        self.__last = time.perf_counter()
+        self.__overlay = None
+        self.__overlay_time = 0
+
+    def restart(self):
+        """
+        Start timing from now, discarding the time since the last mark, e.g., after a pause.
+
+        :return: None
+        """
+        self.__last = time.perf_counter()
+        self.__current = [0.0] * len(PHASE_NAMES)
+
+    def mark(self, phase):
+        """
+        Add the time since the last mark to a phase of the current frame.
+
+        :param phase: int, Phase, one of the PHASE_* constants
+        :return: None
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.__current[phase] += now - self.__last
+        self.__last = now
+
+    def end_frame(self):
+        """
+        Store the current frame in the ring buffer.
+
+        :return: None
+        """
+        if not self.enabled:
+            return
+        index = self.__index
+        for samples, value in zip(self.__samples, self.__current):
+            samples[index] = value
+        self.__current = [0.0] * len(PHASE_NAMES)
+        self.__index = (index + 1) % self.__size
+        self.__count = min(self.__count + 1, self.__size)
+
+    @property
+    def count(self):
+        """
+        Get the number of frames stored.
+
+        :return: int, Frames
+        """
+        return self.__count
+
+    def frames(self):
+        """
+        Get the stored frames, oldest first.
+
+        :return: list, Phase times in seconds of every frame, in the order of PHASE_NAMES
+        """
+        start = (self.__index - self.__count) % self.__size
+        indexes = [(start + i) % self.__size for i in range(self.__count)]
+        return [tuple(samples[i] for samples in self.__samples) for i in indexes]
+
+    def percentiles(self, percentiles=_PERCENTILES):
+        """
+        Get the percentiles of the phase times and of the whole frame time.
+
+        :param percentiles: tuple, Percentiles
+        :return: dict, Seconds of every percentile by phase name, and "frame"
+        """
+        frames = self.frames()
+        columns = list(zip(*frames)) if frames else [() for _ in PHASE_NAMES]
+        columns.append([sum(frame) for frame in frames])
+        result = {}
+        for name, values in zip(PHASE_NAMES + ("frame",), columns):
+            values = sorted(values)
+            result[name] = [values[min(len(values) - 1, len(values) * p // 100)] if values else 0.0
+                            for p in percentiles]
+        return result
+
+    def overlay(self):
+        """
+        Get a surface showing the percentiles of every phase, in milliseconds. It is only rendered again every
+        _OVERLAY_INTERVAL seconds, and has always the same size.
+
+        :return: Surface, Overlay
+        """
+        now = time.perf_counter()
+        if self.__overlay is not None and now - self.__overlay_time < _OVERLAY_INTERVAL:
+            return self.__overlay
+        font = get_font(None, _OVERLAY_LINE_HEIGHT + 2)
+        lines = ["%-9s" % "ms" + "".join("%7s" % ("p%d" % p) for p in _PERCENTILES)]
+        for name, values in self.percentiles().items():
+            lines.append("%-9s" % name + "".join("%7.2f" % (value * 1000) for value in values))
+        if self.__overlay is None:
+            self.__overlay = pygame.Surface((12 * _OVERLAY_LINE_HEIGHT, (len(lines) + 1) * _OVERLAY_LINE_HEIGHT))
+        self.__overlay.fill(COLOR_BLACK)
+        for i, line in enumerate(lines):
+            # Columns are aligned with one render per cell, the default font is not monospaced
+            for j, cell in enumerate([line[:9]] + [line[9 + 7 * k:16 + 7 * k] for k in range(len(_PERCENTILES))]):
+                text = font.render(cell.strip(), True, COLOR_WHITE)
+                x = 4 if j == 0 else 4 + 3 * _OVERLAY_LINE_HEIGHT * j + 2 * _OVERLAY_LINE_HEIGHT - text.get_width()
+                self.__overlay.blit(text, (x, (i + 0.5) * _OVERLAY_LINE_HEIGHT))
+        self.__overlay_time = now
+        return self.__overlay
+
+    def dump(self, path):
+        """
+        Save the stored frames, in milliseconds, as CSV or as JSON if the path ends with ".json".
+
+        :param path: str, File path
+        :return: None
+        """
+        frames = [[value * 1000 for value in frame] for frame in self.frames()]
+        with open(path, "w", newline="") as fd:
+            if path.endswith(".json"):
+                json.dump({"unit": "ms", "phases": PHASE_NAMES, "frames": frames,
+                           "percentiles": {name: [value * 1000 for value in values]
+                                           for name, values in self.percentiles().items()}}, fd)
+            else:
+                writer = csv.writer(fd)
+                writer.writerow(PHASE_NAMES)
+                writer.writerows(frames)
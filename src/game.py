@@ -2,51 +2,59 @@
 # -*- coding: UTF-8 -*-
 
 import os
-import math
 import time
 import json
 import pygame
-import socket
 from .utils import *
 from .globals import *
-from .broadcast import *
-from .invitation import *
-from pygame import gfxdraw
-from random import SystemRandom
+from .physics import *
+from .renderer import *
+from .interpolation import *
+from .assets import AssetManager
+from .frametimer import FrameTimer
+# The networking modules are imported where they are used, so they are not loaded before the first frame
 
 # pygameMenu
 import pygameMenu
 from pygameMenu.locals import *
 
-rand = SystemRandom()
-
 
 class Game:
-    def __init__(self, width=MIN_WIDTH, height=MIN_HEIGHT, fps=100):
+    def __init__(self, width=MIN_WIDTH, height=MIN_HEIGHT, fps=100, tick_rate=BASE_TICK_RATE, send_rate=100):
         """
-        Game class.
+        Game class. The simulation runs at a fixed tick rate, independent of the frame rate, so slow machines
+        only render less frames, and LAN states are sent at their own rate.
 
         :param width: int, Width desired.
         :param height: int, Height desired.
         :param fps: int, Frames per second desired.
+        :param tick_rate: int, Physics ticks per second.
+        :param send_rate: int, LAN states sent per second.
         """
         self.__width = width if width >= MIN_WIDTH else MIN_WIDTH
         self.__height = height if height >= MIN_HEIGHT else MIN_HEIGHT
         self.__is_running = True
         self.__level = LEVEL_EASY
-        self.__pc_move_offset = 20
-        self.__score = [0, 0]
-        self.__max_score = 5
-        self.__fps = fps
+        self.__match = MatchState(max_score=5)
         self.__username_max_len = 10
         self.__settings = {"username": "user"}
         self._read_settings()
+        self.__fps = self.__settings.get("fps", fps)
+        self.__tick_rate = self.__settings.get("tick_rate", tick_rate)
+        self.__send_rate = self.__settings.get("send_rate", send_rate)
+        Packet.set_encoding(self.__settings.get("packet_encoding", ENCODING_BINARY))
 
         # Socket server
         self.__server = None
         self.__client = None
         self.__client_username = None
         self.__lan_mode = MODE_LAN_SERVER
+        self.__net = None
+        self.__spectators = None
+        self.__spectator_data = None
+        self.__match_start = 0
+        self.__snapshots = SnapshotBuffer(delay=0.1)
+        self.__first_frame_handler = None
 
         # Grid
         self.__grid_width = int(min(self.__height, self.__width) / 8)
@@ -54,23 +62,17 @@ class Game:
         self.__grid_x_offset = int(((self.__width % self.__grid_width) + self.__grid_width) / 2)
         self.__grid_y_offset = int(((self.__height % self.__grid_width) + self.__grid_width) / 2)
 
-        # Rectangles
-        self.__r_max_speed = 3
-        self.__r_hard_speed_offset = 1
-        self.__height_r = 50
-        self.__width_r = 50
-
-        # Ball
-        self.__ball_radius = int(min(self.__height, self.__width) / 30)
-        self.__ball_start_speed = 3
-        self.__ball_speed_step = 0.2
-        self.__ball_max_speed = 10
-        self.__has_collided = False
-        self.__has_collided_with_top_bottom = False
+        # Physics
+        self.__world = PhysicsWorld(self.__width, self.__height, match=self.__match, tick_rate=self.__tick_rate)
+        self.__width_r = self.__world.paddles[0].width
+        self.__height_r = self.__world.paddles[0].height
+        self.__ball_radius = self.__world.puck.radius
 
-        self.__max_ball_angle = math.radians(60)
-        self.__max_collision_angle = math.radians(60)
-        self.__collision_coefficient = self.__max_collision_angle / math.pow(self.__height_r / 2.0, 3)
+        # Frame timing, recorded if set in the settings or while its overlay is shown with [F3]
+        self.__frame_timer = FrameTimer()
+        self.__frame_timer.enabled = bool(self.__settings.get("frame_timing", False))
+        self.__world.timer = self.__frame_timer
+        self.__show_frame_timing = False
 
         # Init pygame
         pygame.mixer.pre_init(44100, -16, 2, 2048)
@@ -79,18 +81,18 @@ class Game:
 
         self.__screen = pygame.display.set_mode((self.__width, self.__height))
         pygame.mouse.set_visible(False)
-        # noinspection PyUnresolvedReferences
-        icon = pygame.image.load("resources/images/logo.png")
-        pygame.display.set_icon(icon)
+        self.__assets = AssetManager()
+        pygame.display.set_icon(self.__assets.image("logo"))
         pygame.display.set_caption("Air Hokey")
         self.__clock = pygame.time.Clock()
 
-        # Sounds
-        self.__sound_blip = pygame.mixer.Sound("resources/sounds/blip.wav")
-        self.__sound_lose = pygame.mixer.Sound("resources/sounds/lose.wav")
-        self.__sound_main = pygame.mixer.Sound("resources/sounds/main.wav")
-        self.__sound_scored = pygame.mixer.Sound("resources/sounds/scored.wav")
-        self.__sound_wall = pygame.mixer.Sound("resources/sounds/wall.wav")
+        # Sprites
+        self.__sprite_r1 = rounded_rect_sprite((self.__width_r, self.__height_r), COLOR_RED_2, 1)
+        self.__sprite_r2 = rounded_rect_sprite((self.__width_r, self.__height_r), COLOR_YELLOW, 1)
+        self.__renderer = BoardRenderer(self.__screen, self.__sprite_r1, self.__sprite_r2, self.__ball_radius)
+
+        # Sounds, loaded in background while the menus are shown
+        self.__assets.preload(["wall", "blip", "scored", "lose"])
 
     def _read_settings(self):
         """
@@ -118,7 +120,70 @@ class Game:
 
     def _start_menu(self):
         """
-        Draw the main menu. This is the start point of the game.
+        Draw the main menu. This is the start point of the game. The other menus are only built when opened.
+
+        :return: bool, Execution OK
+        """
+        menu = pygameMenu.Menu(
+            self.__screen,
+            window_width = self.__width,
+            window_height = self.__height,
+            menu_width = self.__width,
+            menu_height	= self.__height,
+            font=GAME_FONT,
+            title="Main Menu",
+            menu_color_title=COLOR_BLACK,
+            menu_color=COLOR_NEV,
+            dopause=False
+        )
+
+        menu.add_option("Single Player", self._single_player_menu)
+        menu.add_option("2 Players", self._keep_playing, MODE_2_PLAYERS)
+        menu.add_option("2 Players (LAN)", self._lan_menu)
+        menu.add_option("2 Players (Server)", self._play_on_server)
+        menu.add_option("About", self._about_menu)
+        menu.add_option("Exit", self._quit)
+
+        while self.__is_running:
+            # Application events
+            events = pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    self._quit()
+                    return False
+
+            self.__screen.fill(COLOR_LIGHT_GRAY)
+            menu.mainloop(events)
+            self.__clock.tick(self.__fps)
+            if self.__first_frame_handler is not None:
+                handler, self.__first_frame_handler = self.__first_frame_handler, None
+                handler()
+
+    def _submenu(self, menu):
+        """
+        Run a menu until it is closed, with [Backspace] or its own options.
+
+        :param menu: pygameMenu.Menu, Menu
+        :return: bool, Execution OK
+        """
+        while self.__is_running and menu.is_enabled():
+            # Application events
+            events = pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    self._quit()
+                    return False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_BACKSPACE:
+                    menu.disable()
+
+            self.__screen.fill(COLOR_LIGHT_GRAY)
+            menu.mainloop(events)
+            self.__clock.tick(self.__fps)
+        return True
+
+    def _single_player_menu(self):
+        """
+        Single player menu.
 
         :return: bool, Execution OK
         """
@@ -142,8 +207,15 @@ class Game:
                                                        ("Impossible", LEVEL_IMPOSSIBLE)],
                                         onreturn=None,
                                         onchange=self.set_difficulty)
-        single_player_menu.add_option("Return to main menu", PYGAME_MENU_BACK)
+        single_player_menu.add_option("Return to main menu", single_player_menu.disable)
+        return self._submenu(single_player_menu)
 
+    def _about_menu(self):
+        """
+        About menu.
+
+        :return: bool, Execution OK
+        """
         about_menu = pygameMenu.TextMenu(
             self.__screen,
             window_width = self.__width,
@@ -160,38 +232,8 @@ class Game:
         for line in ABOUT:
             about_menu.add_line(line)
         about_menu.add_line(TEXT_NEWLINE)
-        about_menu.add_option("Return to menu", PYGAME_MENU_BACK)
-
-        menu = pygameMenu.Menu(
-            self.__screen,
-            window_width = self.__width,
-            window_height = self.__height,
-            menu_width = self.__width,
-            menu_height	= self.__height,
-            font=GAME_FONT,
-            title="Main Menu",
-            menu_color_title=COLOR_BLACK,
-            menu_color=COLOR_NEV,
-            dopause=False
-        )
-
-        menu.add_option("Single Player", single_player_menu)
-        menu.add_option("2 Players", self._keep_playing, MODE_2_PLAYERS)
-        menu.add_option("2 Players (LAN)", self._lan_menu)
-        menu.add_option("About", about_menu)
-        menu.add_option("Exit", self._quit)
-
-        while self.__is_running:
-            # Application events
-            events = pygame.event.get()
-            for event in events:
-                if event.type == pygame.QUIT:
-                    self._quit()
-                    return False
-
-            self.__screen.fill(COLOR_LIGHT_GRAY)
-            menu.mainloop(events)
-            self.__clock.tick(self.__fps)
+        about_menu.add_option("Return to menu", about_menu.disable)
+        return self._submenu(about_menu)
 
     def _edit__username_menu(self):
         """
@@ -297,10 +339,11 @@ class Game:
 
         :return: None
         """
+        import socket
         if self.__server is None:
             self.__server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.__server.bind(("0.0.0.0", TCP_PORT))
-            self.__server.listen(1)
+            self.__server.listen(MAX_INVITATIONS)
 
     def _close_server(self):
         """
@@ -312,50 +355,96 @@ class Game:
             self.__server.close()
             self.__server = None
 
-    def _invite_user(self, user, on_execution_start, on_execution_end):
+    def _invite_users(self, users, on_execution_start, on_execution_end):
         """
-        Custom menu to be shown while an invitiation request is being made.
+        Custom menu to be shown while invitation requests are being made. All the users are invited at once and the
+        match is played with the first one accepting, the other invitations are cancelled. The screen shows the
+        progress until then, and [Esc] cancels all the invitations.
 
-        :param user: (str, str), User parameters, i.e., username and ip address.
+        :param users: list, Users parameters, i.e., username, ip address and port.
         :param on_execution_start: Handle to be run before execution starts.
         :param on_execution_end:  Handle to be run after execution ends.
         :return: bool, Execution OK/Invitation Accepted
         """
-        if user is None:
+        from .invitation import SendInvitations
+        users = [user for user in users if user is not None]
+        if not users:
+            return False
+
+        invitations = SendInvitations(self.username, users)
+        invitations.start()
+        progress = None
+        while invitations.is_alive():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    invitations.stop()
+                    invitations.join()
+                    self._quit()
+                    return False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    invitations.stop()
+
+            # Do graphical part, only when the progress changes
+            if progress != (invitations.pending, invitations.refused):
+                progress = invitations.pending, invitations.refused
+                if len(users) == 1:
+                    line1 = "Waiting for <%s> response..." % users[0][0]
+                else:
+                    line1 = "Waiting for %d of %d players..." % (invitations.pending, len(users))
+                self._info_screen(line1, "Press [Esc] to cancel")
+            self.__clock.tick(self.__fps)
+        invitations.join()
+
+        if invitations.accepted is None:
             return False
+        client, self.__client_username = invitations.accepted
+        client.settimeout(TIMEOUT)
+        self.__client = client
+        on_execution_start()
+        self._keep_playing_lan(MODE_LAN_CLIENT)
+        on_execution_end()
+        self.__client = self.__client_username = None
+        client.close()
+        return True
 
-        # Do graphical part
-        username, ip = user
+    def _watch_user(self, user, on_execution_start, on_execution_end):
+        """
+        Watch the match a user is playing as a spectator.
 
-        self._info_screen("Waiting for <%s> response..." % username, "We are almost there!")
+        :param user: (str, str, int), User parameters, i.e., username, ip address and spectator port.
+        :param on_execution_start: Handle to be run before execution starts.
+        :param on_execution_end:  Handle to be run after execution ends.
+        :return: bool, Execution OK
+        """
+        import socket
+        if user is None:
+            return False
 
-        # Connect with server
-        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client.settimeout(INVITATION_TIMEOUT)
-        client.connect((ip, TCP_PORT))
+        username, ip, port = user
         try:
-            InvitationPacket(self.username).send_to(client)
-            packet = InvitationAcceptedPacket()
-            status = packet.receive_from(client)
-        except (socket.timeout, ConnectionAbortedError):
-            pass
-        else:
-            if status:
-                client.settimeout(TIMEOUT)
-                self.__client_username = packet.username
-                self.__client = client
-                on_execution_start()
-                self._keep_playing_lan(MODE_LAN_CLIENT)
-                on_execution_end()
-                self.__client = self.__client_username = None
-        client.close()
+            conn = socket.create_connection((ip, port), INVITATION_TIMEOUT)
+        except OSError:
+            self._info_screen("<%s> is not playing" % username, "Try again later!")
+            pygame.time.wait(2000)
+            return False
+
+        conn.settimeout(TIMEOUT)
+        on_execution_start()
+        status = self._keep_watching(conn)
+        on_execution_end()
+        conn.close()
+        return status
 
     def _lan_menu(self):
         """
         2 Players (Lan) menu. While on this menu, the application is sending/listening for invitation packets.
+        Idle hosts can be invited and hosts playing a match can be watched, the less loaded ones first. The host
+        keeps announcing itself while playing a match started from this menu.
 
         :return: bool, Execution OK
         """
+        from .invitation import GetConnection, InvitationAcceptedPacket
+        from .lobby import LobbyClient
         lan_menu = pygameMenu.Menu(
             self.__screen,
             window_width = self.__width,
@@ -372,26 +461,23 @@ class Game:
         # Start server
         self._start_server()
 
-        # Do broadcast
-        do_broadcast = DoBroadcast(self)
-        do_broadcast.start()
-
-        # Get broadcasts
-        get_broadcast = GetBroadcast()
-        get_broadcast.start()
+        # Discover users through the lobby, or broadcast
+        discovery = self._start_discovery(self.__settings.get("lobby"))
+        get_broadcast = discovery[-1]
 
         # Get connection
         get_connection = GetConnection(self.__server)
         get_connection.start()
 
         def stop_threads():
-            do_broadcast.stop()
+            # The host keeps broadcasting during the match, so it can be watched
             get_broadcast.stop()
             get_connection.stop()
 
         def join_threads():
-            do_broadcast.join()
-            get_broadcast.join()
+            for thread in discovery:
+                thread.stop()
+                thread.join()
             get_connection.join()
 
         def stop_and_join_threads():
@@ -404,9 +490,16 @@ class Game:
             self._close_server()
 
         no_users = [("no users", None)]
-        elements = no_users
-        selector_id = lan_menu.add_selector("Play with", elements, onchange=None,
-                                            onreturn=lambda user: self._invite_user(user, on_user_accept, join_threads))
+        no_matches = [("no matches", None)]
+        version = get_broadcast.version
+        idle_users = []
+        selector_id = lan_menu.add_selector("Play with", no_users, onchange=None,
+                                            onreturn=lambda user: self._invite_users([user], on_user_accept,
+                                                                                     join_threads))
+        lan_menu.add_option("Play with anyone", lambda: self._invite_users(idle_users, on_user_accept, join_threads))
+        watch_selector_id = lan_menu.add_selector("Watch", no_matches, onchange=None,
+                                                  onreturn=lambda user: self._watch_user(user, on_user_accept,
+                                                                                         join_threads))
         lan_menu.add_option("Edit username", self._edit__username_menu)
         lan_menu.add_option("Return to main menu", lan_menu.disable)
 
@@ -422,32 +515,42 @@ class Game:
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_BACKSPACE:
                     lan_menu.disable()
 
-            if get_broadcast.data:
-                _elements = get_broadcast.data
-            else:
-                _elements = no_users
-
-            if _elements != elements:
-                elements = list(_elements)
-                lan_menu.update_selector(selector_id, elements)
+            if isinstance(get_broadcast, LobbyClient) and get_broadcast.error is not None:
+                print("Lobby is not available, using broadcast -", get_broadcast.error)
+                get_broadcast.join()
+                discovery = self._start_discovery(None)
+                get_broadcast = discovery[-1]
+                version = None
+
+            if get_broadcast.version != version:
+                version = get_broadcast.version
+                hosts = get_broadcast.data
+                idle_users[:] = [(beacon.username, ip, beacon.port) for ip, beacon in hosts if not beacon.matches]
+                lan_menu.update_selector(selector_id, [
+                    ("%s (%d%%)" % (beacon.username, beacon.load), (beacon.username, ip, beacon.port))
+                    for ip, beacon in hosts if not beacon.matches] or no_users)
+                lan_menu.update_selector(watch_selector_id, [
+                    ("%s (%d watching)" % (beacon.username, beacon.spectators),
+                     (beacon.username, ip, beacon.spectator_port))
+                    for ip, beacon in hosts if beacon.spectator_port] or no_matches)
 
             self.__screen.fill(COLOR_LIGHT_GRAY)
             lan_menu.mainloop(events)
             self.__clock.tick(self.__fps)
 
-            # Check for invitations
-            if get_connection.has_connection:
-                if lan_menu.is_enabled() and self._invitation_request_menu(get_connection.username):
-                    self.__client = get_connection.connection
-                    self.__client_username = get_connection.username
+            # Check for invitations, one at a time
+            invitation = get_connection.next_invitation()
+            if invitation is not None:
+                connection, username = invitation
+                if lan_menu.is_enabled() and self._invitation_request_menu(username):
                     try:
-                        InvitationAcceptedPacket(self.username).send_to(self.__client)
-                    except (socket.timeout, ConnectionAbortedError):
-                        self.__client = self.__client_username = None
-                        get_connection.refuse_connection()
+                        InvitationAcceptedPacket(self.username).send_to(connection)
+                    except OSError:
+                        connection.close()
                     else:
+                        self.__client = connection
+                        self.__client_username = username
                         self.__client.settimeout(TIMEOUT)
-                        get_connection.accept_connection()
                         lan_menu.disable()
                         stop_threads()
                         self._keep_playing_lan(MODE_LAN_SERVER)
@@ -457,12 +560,37 @@ class Game:
                         self._close_server()
                         return True
                 else:
-                    get_connection.refuse_connection()
+                    connection.close()
 
         stop_and_join_threads()
         self._close_server()
         return True
 
+    def _start_discovery(self, lobby):
+        """
+        Start the threads discovering the users in the LAN.
+
+        :param lobby: str, Lobby address as "host" or "host:port", None to use broadcast
+        :return: list, Started threads, the last one gathering the users
+        """
+        from .broadcast import GetBroadcast, DoBroadcast
+        from .lobby import LobbyClient
+        if lobby:
+            host, _, port = lobby.partition(":")
+            try:
+                lobby_client = LobbyClient(self, (host, int(port or LOBBY_PORT)))
+            except ValueError as e:
+                print("Invalid lobby address -", e)
+            else:
+                lobby_client.start()
+                return [lobby_client]
+
+        do_broadcast = DoBroadcast(self)
+        do_broadcast.start()
+        get_broadcast = GetBroadcast()
+        get_broadcast.start()
+        return [do_broadcast, get_broadcast]
+
     def _score_screen(self, screen_type):
         """
         Draw a specific score screen. Multiple screen types are allowed:
@@ -486,29 +614,30 @@ class Game:
             label = "Press [P] or [pause] to continue"
         elif screen_type == SCORE_SCREEN_SCORED:
             label = "Nice one!"
-            if self.__max_score in self.__score:
+            if self.__match.is_over:
                 title = "You win!"
-            self.__sound_scored.play()
+            self.__assets.sound("scored").play()
         elif screen_type == SCORE_SCREEN_LOSE:
             label = "Bad luck... Don't give up!"
-            if self.__max_score in self.__score:
+            if self.__match.is_over:
                 title = "You lose!"
-            self.__sound_lose.play()
+            self.__assets.sound("lose").play()
         elif screen_type == SCORE_SCREEN_PLAYER1_SCORED:
             label = "Player 1 scored!"
-            if self.__max_score in self.__score:
+            if self.__match.is_over:
                 title = "Player 1 win!"
-            self.__sound_scored.play()
+            self.__assets.sound("scored").play()
         else:
             label = "Player 2 scored!"
-            if self.__max_score in self.__score:
+            if self.__match.is_over:
                 title = "Player 2 win!"
-            self.__sound_scored.play()
+            self.__assets.sound("scored").play()
 
+        self.__renderer.invalidate()
         aa_rounded_rect(self.__screen, (x, y, width, height), COLOR_GRAY, 0.1)
 
         text1, width1, height1 = generate_wrapped_text(title, GAME_FONT, COLOR_SILVER, inner_width, height / 4)
-        text2, width2, height2 = generate_wrapped_text("%s - %s" % (self.__score[0], self.__score[1]), GAME_FONT,
+        text2, width2, height2 = generate_wrapped_text("%s - %s" % tuple(self.__match.score), GAME_FONT,
                                                        COLOR_SILVER, inner_width, height / 3)
         text3, width3, height3 = generate_wrapped_text(label, GAME_FONT, COLOR_SILVER, inner_width, height / 6)
 
@@ -533,137 +662,86 @@ class Game:
             passed_time += 1
             self.__clock.tick(self.__fps)
 
-    def _can_move_up(self, y_rectangle, x_ball):
-        """
-        Checks if the board can move up, ie, has not passed through the wall.
-
-        :param y_rectangle: int, y coordinate of the board.
-        :param x_ball: int, x coordinate of the ball.
-        :return: bool, Can move up
-        """
-        return y_rectangle > 0 and 0 < x_ball < self.__width
-
-    def _can_move_down(self, y_rectangle, x_ball):
-        """
-        Checks if the board can move down, ie, has not passed through the wall.
-
-        :param y_rectangle: int, y coordinate of the board.
-        :param x_ball: int, x coordinate of the ball.
-        :return: bool, Can move down
-        """
-        return y_rectangle + self.__height_r < self.__height and 0 < x_ball < self.__width
-
-    def _can_move_left(self, x_rectangle, x_ball, player):
-        """
-        Checks if the board can move left, ie, has not passed through the wall.
-        :param x_rectangle: int, x coordinate of the board.
-        :param x_ball: int, x coordinate of the ball.
-        :return: bool, Can move left
-        """
-        if(player == 2):
-            return x_rectangle >= self.__width / 2 and 0 < x_ball < self.__width
-        else:
-            return x_rectangle <= self.__width / 2 and x_rectangle >= 3 and 0 < x_ball < self.__width
-
-    def _can_move_right(self, x_rectangle, x_ball, player):
-        """
-        Checks if the board can move right, ie, has not passed through the wall.
-        :param x_rectangle: int, x coordinate of the board.
-        :param x_ball: int, x coordinate of the ball.
-        :return: bool, Can move right
-        """
-        if(player == 2):
-            return x_rectangle >= (self.__width / 2) - 2 and x_rectangle <= self.__width -51 and 0 < x_ball < self.__width
-        else:
-            return x_rectangle <= (self.__width / 2) - 50 and 0 < x_ball < self.__width
-
     @staticmethod
-    def _is_right_direction(ball_angle):
-        """
-        Check if the ball is moving from left to right.
-
-        :param ball_angle: float, Ball angle in rads
-        :return: bool, Has right direction
-        """
-        return -math.pi / 2 < wrap_to_pi(ball_angle) < math.pi / 2
-
-    def _collided_with_top_bottom(self, y_ball):
-        """
-        Check if the ball collided with the top or bottom part of the wall.
-
-        :param y_ball: y coordinate of the ball
-        :return: bool, Has collided
-        """
-        return not (self.__ball_radius < y_ball < self.__height - self.__ball_radius)
+    def _get_move(pressed, up, down, left, right):
+        """
+        Get the paddle move from the pressed keys.
+
+        :param pressed: Pressed keys as returned by pygame.key.get_pressed
+        :param up: Key to move up
+        :param down: Key to move down
+        :param left: Key to move left
+        :param right: Key to move right
+        :return: enum, Paddle move or None
+        """
+        if pressed[up]:
+            return MOVE_UP
+        elif pressed[down]:
+            return MOVE_DOWN
+        elif pressed[left]:
+            return MOVE_LEFT
+        elif pressed[right]:
+            return MOVE_RIGHT
+        return None
 
     class _ServerData(Packet):
         """
-        ServerData packet.
+        ServerData packet, the state sent by the server every frame.
         """
 
+        packet_type = 3
+        fields = (("time", "I"), ("round", "B"), ("y_r1", COORDINATE), ("x_r1", COORDINATE),
+                  ("x_ball", COORDINATE), ("y_ball", COORDINATE), ("vx_ball", COORDINATE), ("vy_ball", COORDINATE))
+
         def __init__(self):
-            self.__methods = []
+            self.time = 0
+            self.round = 0
             self.y_r1 = 0
             self.x_r1 = 0
             self.x_ball = 0
             self.y_ball = 0
+            self.vx_ball = 0
+            self.vy_ball = 0
 
-        def do_sound_wall(self):
-            """
-            Registers sound_wall method to be run.
-
-            :return: None
-            """
-            self.__methods.append(("sound_wall", ()))
-
-        def do_sound_blip(self):
-            """
-            Registers sound_blip method to be run.
-
-            :return: None
-            """
-            self.__methods.append(("sound_blip", ()))
-
-        def do_score_screen(self, screen_type):
-            """
-            Registers score_screen method to be run.
-
-            :param screen_type: Type of the screen as in _score_screen function.
-            :return: None
-            """
-            self.__methods.append(("score_screen", (screen_type,)))
-
-        def do_update_score(self, has_scored):
-            """
-            Registers update_score method to be run.
+    class _ServerEvent(Packet):
+        """
+        ServerEvent packet, a method to be run by the client.
+        """
 
-            :param has_scored: Has scorded flag as in _update_score function.
-            :return: None
-            """
-            self.__methods.append(("update_score", (has_scored,)))
+        packet_type = 5
+        fields = (("method", "B"), ("argument", "B"))
 
-        def handle_methods(self, **kwargs):
-            """
-            Execute all registered methods.
+        METHOD_SOUND_WALL = 0
+        METHOD_SOUND_BLIP = 1
+        METHOD_SCORE_SCREEN = 2
+        METHOD_UPDATE_SCORE = 3
+        _METHODS = ("sound_wall", "sound_blip", "score_screen", "update_score")
+        _NO_ARGUMENT = 255
 
-            :return: None
-            """
-            for method, args in self.__methods:
-                kwargs[method](*args)
+        def __init__(self, method=METHOD_SOUND_WALL, argument=None):
+            self.method = method
+            self.argument = self._NO_ARGUMENT if argument is None else int(argument)
 
-        def clear(self):
+        def handle(self, **kwargs):
             """
-            Clear all registered methods.
+            Execute the method.
 
             :return: None
             """
-            self.__methods = []
+            method = kwargs[self._METHODS[self.method]]
+            if self.argument == self._NO_ARGUMENT:
+                method()
+            else:
+                method(self.argument)
 
     class _ClientData(Packet):
         """
         ClientData packet.
         """
 
+        packet_type = 4
+        fields = (("y_r2", COORDINATE), ("x_r2", COORDINATE))
+
         def __init__(self):
             self.y_r2 = 0
             self.x_r2 = 0
@@ -678,20 +756,21 @@ class Game:
         :param mode: enum, Mode of game.
         :return: bool, Execution OK.
         """
-        y_r1 = (self.__height - self.__height_r) / 2
-        y_r2 = y_r1
-
-        x_r1 = 30
-        x_r2 = self.__width - 80
+        world = self.__world
+        world.level = self.__level if mode == MODE_SINGLE_PLAYER else None
+        world.reset_round()
+        self.__renderer.invalidate()
+        paddle1, paddle2 = world.paddles
+        puck = world.puck
 
-        x_ball = int(self.__width / 2)
-        y_ball = int(self.__height / 2)
-        ball_angle = rand.choice([(math.pi / 4) + (i * math.pi / 2) for i in range(4)])
-        ball_speed = self.__ball_start_speed
-
-        min_distance_ratio = 0
         server_data = self._ServerData()
-        client_data = self._ClientData()
+        tick_time = 1 / self.__tick_rate
+        send_interval = 1 / self.__send_rate
+        accumulator = 0
+        last_time = next_send = time.perf_counter()
+        previous = current = self._positions()
+        timer = self.__frame_timer
+        timer.restart()
 
         while True:
             # Gat all events
@@ -700,178 +779,125 @@ class Game:
                     self._quit()
                     return False
                 elif event.type == pygame.KEYDOWN:
-                    if not mode == MODE_LAN_SERVER:
+                    if event.key == pygame.K_F3:
+                        self._toggle_frame_timing()
+                    elif not mode == MODE_LAN_SERVER:
                         if event.key == pygame.K_ESCAPE:
                             return False
                         elif event.key == pygame.K_p or event.key == pygame.K_PAUSE:
                             # Check if user quit
                             if not self._score_screen(SCORE_SCREEN_PAUSE):
                                 return False
+                            # The pause is not simulated
+                            last_time = time.perf_counter()
+                            timer.restart()
 
             # Get all pressed keys
             pressed = pygame.key.get_pressed()
 
             if mode == MODE_2_PLAYERS:
-                if pressed[pygame.K_w] and self._can_move_up(y_r1, x_ball):
-                    y_r1 -= self.__r_max_speed
-                elif pressed[pygame.K_s] and self._can_move_down(y_r1, x_ball):
-                    y_r1 += self.__r_max_speed
-                elif pressed[pygame.K_a] and self._can_move_left(x_r1, x_ball, 1):
-                    x_r1 -= self.__r_max_speed
-                elif pressed[pygame.K_d] and self._can_move_right(x_r1, x_ball, 1):
-                    x_r1 += self.__r_max_speed
-
-                if pressed[pygame.K_UP] and self._can_move_up(y_r2, x_ball):
-                    y_r2 -= self.__r_max_speed
-                elif pressed[pygame.K_DOWN] and self._can_move_down(y_r2, x_ball):
-                    y_r2 += self.__r_max_speed
-                elif pressed[pygame.K_LEFT] and self._can_move_left(x_r2, x_ball, 2):
-                    x_r2 -= self.__r_max_speed
-                elif pressed[pygame.K_RIGHT] and self._can_move_right(x_r2, x_ball, 2):
-                    x_r2 += self.__r_max_speed
+                inputs = (self._get_move(pressed, pygame.K_w, pygame.K_s, pygame.K_a, pygame.K_d),
+                          self._get_move(pressed, pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT))
             else:
-                if pressed[pygame.K_UP] and self._can_move_up(y_r1, x_ball):
-                    y_r1 -= self.__r_max_speed
-                elif pressed[pygame.K_DOWN] and self._can_move_down(y_r1, x_ball):
-                    y_r1 += self.__r_max_speed
-                elif pressed[pygame.K_LEFT] and self._can_move_left(x_r1, x_ball, 1):
-                    x_r1 -= self.__r_max_speed
-                elif pressed[pygame.K_RIGHT] and self._can_move_right(x_r1, x_ball, 1):
-                    x_r1 += self.__r_max_speed
-
-            # PC move
-            if mode == MODE_SINGLE_PLAYER:
-                y_desired = None
-                if self.__level == LEVEL_IMPOSSIBLE:
-                    if self._is_right_direction(ball_angle):
-                        d = (x_r2 - x_ball) / math.cos(ball_angle)
-                        y_desired = round(d * math.sin(ball_angle) + y_ball)
-                        i = 0
-                        while y_desired > self.__height:
-                            y_desired -= self.__height
-                            i += 1
-                        while y_desired < 0:
-                            y_desired += self.__height
-                            i += 1
-                        if i % 2:
-                            y_desired = self.__height - y_desired
-                    else:
-                        y_desired = self.__height / 2
-
-                elif self.__level == LEVEL_HARD or (self._is_right_direction(ball_angle) and (
-                        self.__level == LEVEL_MEDIUM or x_ball / self.__width >= min_distance_ratio)):
-                    y_desired = y_ball
-
-                if y_desired is not None:
-                    if y_desired > y_r2 + (self.__height_r + self.__pc_move_offset) / 2 and \
-                            self._can_move_down(y_r2, x_ball):
-                        y_r2 += self.__r_max_speed
-                        if self.__level == LEVEL_HARD:
-                            y_r2 += self.__r_hard_speed_offset
-                    elif y_desired < y_r2 + (self.__height_r - self.__pc_move_offset) / 2 and \
-                            self._can_move_up(y_r2, x_ball):
-                        y_r2 -= self.__r_max_speed
-                        if self.__level == LEVEL_HARD:
-                            y_r2 -= self.__r_hard_speed_offset
-            elif mode == MODE_LAN_SERVER:
+                inputs = (self._get_move(pressed, pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT), None)
+            timer.mark(PHASE_INPUT)
+
+            if mode == MODE_LAN_SERVER:
                 # Get data from client
-                if not client_data.receive_from(self.__client):
+                if not self.__net.is_connected:
                     return False
-                y_r2 = client_data.y_r2
-                x_r2 = client_data.x_r2
-                # Update data to send to client
-                server_data.y_r1 = y_r1
-                server_data.x_r1 = x_r1
-                server_data.x_ball = x_ball
-                server_data.y_ball = y_ball
-
-            # Check collisions
-            if self._collided_with_top_bottom(y_ball):
-                if not self.__has_collided_with_top_bottom:
-                    # Play sound
-                    self.__sound_wall.play()
-                    if MODE_LAN_SERVER:
-                        server_data.do_sound_wall()
-                    # Update ball angle
-                    ball_angle = -ball_angle
-                    self.__has_collided_with_top_bottom = True
-            elif self.__has_collided_with_top_bottom:
-                self.__has_collided_with_top_bottom = False
-
-            collision1 = rounded_rect_collided_with_circle((x_r1, y_r1, self.__width_r, self.__height_r),
-                                                           1, (x_ball, y_ball), self.__ball_radius)
-
-            collision2 = rounded_rect_collided_with_circle((x_r2, y_r2, self.__width_r, self.__height_r),
-                                                           1, (x_ball, y_ball), self.__ball_radius)
-
-            if collision1 is not None or collision2 is not None:
-                if not self.__has_collided:
-                    # Play sound
-                    self.__sound_blip.play()
-                    if MODE_LAN_SERVER:
-                        server_data.do_sound_blip()
-                    # Change ball speed
-                    if ball_speed < self.__ball_max_speed:
-                        ball_speed += self.__ball_speed_step
-                    # For easy level, generate distance ratio for computer to follow the ball
-                    if self.__level == LEVEL_EASY and not self._is_right_direction(ball_angle):
-                        min_distance_ratio = rand.uniform(0, 0.7)
-                        # min_distance_ratio = random.triangular(0, 0.7)
-                    # Change ball angle
-                    ball_angle = math.pi - ball_angle
-
-                    if collision1 is not None:
-                        ball_angle += math.pow(collision1[1] - y_r1 - self.__height_r / 2, 3) * self.__collision_coefficient
-                        if wrap_to_pi(ball_angle) < -self.__max_ball_angle:
-                            ball_angle = -self.__max_ball_angle
-                        elif wrap_to_pi(ball_angle) > self.__max_ball_angle:
-                            ball_angle = self.__max_ball_angle
+                client_data = self.__net.latest
+                if client_data is not None:
+                    paddle2.y = client_data.y_r2
+                    paddle2.x = client_data.x_r2
+                timer.mark(PHASE_NETWORK)
+
+            # Run the ticks due since last frame
+            now = time.perf_counter()
+            accumulator += min(now - last_time, MAX_FRAME_TIME)
+            last_time = now
+            has_scored = None
+            while accumulator >= tick_time and has_scored is None:
+                accumulator -= tick_time
+                previous = current
+                for event in world.step(inputs):
+                    if event == EVENT_WALL:
+                        self.__assets.sound("wall").play()
+                        if mode == MODE_LAN_SERVER:
+                            self.__net.send_event(self._ServerEvent(self._ServerEvent.METHOD_SOUND_WALL))
+                    elif event == EVENT_PADDLE:
+                        self.__assets.sound("blip").play()
+                        if mode == MODE_LAN_SERVER:
+                            self.__net.send_event(self._ServerEvent(self._ServerEvent.METHOD_SOUND_BLIP))
                     else:
-                        ball_angle -= math.pow(collision2[1] - y_r2 - self.__height_r / 2, 3) * self.__collision_coefficient
-                        if 0 < wrap_to_pi(ball_angle) < math.pi - self.__max_ball_angle:
-                            ball_angle = math.pi - self.__max_ball_angle
-                        elif self.__max_ball_angle - math.pi < wrap_to_pi(ball_angle) < 0:
-                            ball_angle = self.__max_ball_angle - math.pi
-                    # Set collision flag
-                    self.__has_collided = True
-            elif self.__has_collided and \
-                    x_r1 + self.__width_r + self.__ball_radius < x_ball < x_r2 - self.__ball_radius:
-                # Clear collision flag only if there is no risk of a new collision in the same place
-                self.__has_collided = False
-
-            if -self.__ball_radius <= x_ball <= self.__width + self.__ball_radius:
-                # Move ball
-                x_ball += math.cos(ball_angle) * ball_speed
-                y_ball += math.sin(ball_angle) * ball_speed
-            else:
-                # Update score
-                has_scored = self._is_right_direction(ball_angle)
-                self._update_score(has_scored)
+                        has_scored = event == EVENT_PLAYER1_SCORED
+                current = self._positions()
+
+            if has_scored is not None:
                 if mode == MODE_2_PLAYERS:
                     screen_type = SCORE_SCREEN_PLAYER1_SCORED if has_scored else SCORE_SCREEN_PLAYER2_SCORED
                 else:
                     screen_type = SCORE_SCREEN_SCORED if has_scored else SCORE_SCREEN_LOSE
                     if mode == MODE_LAN_SERVER:
-                        server_data.do_update_score(has_scored)
-                        server_data.do_score_screen(SCORE_SCREEN_LOSE if has_scored else SCORE_SCREEN_SCORED)
-                        # Send server data
-                        client_data.x_r1 = 30
-                        client_data.x_r2 = self.__width - 80
-                        x_r1 = 30
-                        x_r2 = self.__width - 80
-
-                        server_data.send_to(self.__client)
+                        self.__net.send_event(self._ServerEvent(self._ServerEvent.METHOD_UPDATE_SCORE, has_scored))
+                        self.__net.send_event(self._ServerEvent(self._ServerEvent.METHOD_SCORE_SCREEN,
+                                                                SCORE_SCREEN_LOSE if has_scored else SCORE_SCREEN_SCORED))
+                        self._publish_snapshot(now - accumulator)
                 self._score_screen(screen_type)
                 return True
 
-            if mode == MODE_LAN_SERVER:
-                # Send server data
-                server_data.send_to(self.__client)
-                server_data.clear()
-
-            # Do graphic part
-            self._do_graphics(y_r1, x_r1, y_r2, x_r2, x_ball, y_ball)
+            if mode == MODE_LAN_SERVER and now >= next_send:
+                # Update and send data to client
+                next_send = max(next_send + send_interval, now)
+                server_data.y_r1 = paddle1.y
+                server_data.x_r1 = paddle1.x
+                server_data.x_ball = puck.x
+                server_data.y_ball = puck.y
+                server_data.vx_ball = puck.vx * self.__tick_rate
+                server_data.vy_ball = puck.vy * self.__tick_rate
+                server_data.time = int((now - accumulator - self.__match_start) * 1000)
+                server_data.round = sum(self.__match.score) % 256
+                self.__net.send_state(server_data)
+                self._publish_snapshot(now - accumulator)
+                timer.mark(PHASE_NETWORK)
+
+            # Do graphic part, interpolated between the last two ticks
+            ratio = accumulator / tick_time
+            self._do_graphics(*(a + (b - a) * ratio for a, b in zip(previous, current)))
+            timer.mark(PHASE_GRAPHICS)
             self.__clock.tick(self.__fps)
+            timer.mark(PHASE_WAIT)
+            timer.end_frame()
+
+    def _publish_snapshot(self, now):
+        """
+        Send the world state to the spectators, if any.
+
+        :param now: float, Time of the state as given by time.perf_counter
+        :return: None
+        """
+        if self.__spectators is None or not self.__spectators.count:
+            return
+        paddle1, paddle2 = self.__world.paddles
+        puck = self.__world.puck
+        data = self.__spectator_data
+        data.time = int((now - self.__match_start) * 1000)
+        data.round = sum(self.__match.score) % 256
+        data.score1, data.score2 = self.__match.score
+        data.y_r1, data.x_r1, data.y_r2, data.x_r2 = paddle1.y, paddle1.x, paddle2.y, paddle2.x
+        data.x_ball, data.y_ball = puck.x, puck.y
+        data.vx_ball, data.vy_ball = puck.vx * self.__tick_rate, puck.vy * self.__tick_rate
+        self.__spectators.publish(data)
+
+    def _positions(self):
+        """
+        Get the positions of the world entities, in the order taken by _do_graphics.
+
+        :return: tuple, (y_r1, x_r1, y_r2, x_r2, x_ball, y_ball)
+        """
+        paddle1, paddle2 = self.__world.paddles
+        puck = self.__world.puck
+        return paddle1.y, paddle1.x, paddle2.y, paddle2.x, puck.x, puck.y
 
     def _do_graphics(self, y_r1, x_r1, y_r2, x_r2, x_ball, y_ball):
         """
@@ -885,20 +911,19 @@ class Game:
         :param y_ball: y coordinate of the ball
         :return: None
         """
-        self.__screen.fill(COLOR_NEV)
+        self.__renderer.draw(y_r1, x_r1, y_r2, x_r2, x_ball, y_ball,
+                             self.__frame_timer.overlay() if self.__show_frame_timing else None)
 
-        #creating board elements
-        pygame.draw.circle(self.__screen, (249, 249, 255), (int(self.__width / 2), int(self.__height / 2)), 110, 1)
-        pygame.draw.circle(self.__screen, (249, 249, 255), (-55 , int(self.__height / 2)), 110, 1)
-        pygame.draw.circle(self.__screen, (249, 249, 255), (int(self.__width + 55) , int(self.__height / 2)), 110, 1)
-
-        aa_rounded_rect(self.__screen, (x_r1, y_r1, self.__width_r, self.__height_r), COLOR_RED_2, 1)
-        aa_rounded_rect(self.__screen, (x_r2, y_r2, self.__width_r, self.__height_r), COLOR_YELLOW, 1)
-        #gfxdraw.aacircle(self.__screen, round(x_ball), round(y_ball), self.__ball_radius, COLOR_WHITE)
-        gfxdraw.filled_circle(self.__screen, round(x_ball), round(y_ball), self.__ball_radius, COLOR_WHITE)
-        pygame.draw.line(self.__screen, COLOR_WHITE, (self.__width / 2, 0), (self.__width / 2, self.__height))
+    def _toggle_frame_timing(self):
+        """
+        Show or hide the frame timing overlay. Frames are recorded while it is shown.
 
-        pygame.display.flip()
+        :return: None
+        """
+        self.__show_frame_timing = not self.__show_frame_timing
+        self.__frame_timer.enabled = self.__show_frame_timing or bool(self.__settings.get("frame_timing", False))
+        self.__frame_timer.restart()
+        self.__renderer.invalidate()
 
     def _keep_playing_client(self):
         """
@@ -906,12 +931,24 @@ class Game:
 
         :return: bool, Execution OK
         """
-        server_data = self._ServerData()
         client_data = self._ClientData()
 
-        client_data.y_r2 = (self.__height - self.__height_r) / 2
-        client_data.x_r2 = self.__width - 80
+        # The world is only used to apply the paddle moving rules
+        world = self.__world
+        world.level = None
+        world.reset_round()
+        paddle = world.paddles[1]
         self._reset_score()
+        self.__renderer.invalidate()
+        snapshots = self.__snapshots
+        snapshots.clear()
+        server_data = None
+        tick_time = 1 / self.__tick_rate
+        send_interval = 1 / self.__send_rate
+        accumulator = 0
+        last_time = next_send = time.perf_counter()
+        timer = self.__frame_timer
+        timer.restart()
 
         while True:
             # Gat all events
@@ -919,32 +956,69 @@ class Game:
                 if event.type == pygame.QUIT:
                     self._quit()
                     return False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self._toggle_frame_timing()
+            timer.mark(PHASE_INPUT)
+            if not self.__net.is_connected:
+                return False
+
+            latest = self.__net.latest_with_time
+            if latest is None:
+                timer.mark(PHASE_NETWORK)
+                self.__clock.tick(self.__fps)
+                timer.mark(PHASE_WAIT)
+                timer.end_frame()
+                continue
+            if latest[0] is not server_data:
+                server_data, receive_time = latest
+                snapshots.push(server_data.time / 1000, server_data.round,
+                               (server_data.y_r1, server_data.x_r1, server_data.x_ball, server_data.y_ball),
+                               (server_data.vx_ball, server_data.vy_ball), receive_time)
+            timer.mark(PHASE_NETWORK)
+
             # Get all pressed keys
             pressed = pygame.key.get_pressed()
-            if pressed[pygame.K_UP] and self._can_move_up(client_data.y_r2, server_data.x_ball):
-                client_data.y_r2 -= self.__r_max_speed
-            elif pressed[pygame.K_DOWN] and self._can_move_down(client_data.y_r2, server_data.x_ball):
-                client_data.y_r2 += self.__r_max_speed
-            elif pressed[pygame.K_LEFT] and self._can_move_left(client_data.x_r2, server_data.x_ball, 2):
-                client_data.x_r2 -= self.__r_max_speed
-            elif pressed[pygame.K_RIGHT] and self._can_move_right(client_data.x_r2, server_data.x_ball, 2):
-                client_data.x_r2 += self.__r_max_speed
+            move = self._get_move(pressed, pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT)
+            world.puck.x = server_data.x_ball
+            timer.mark(PHASE_INPUT)
+
+            # Move the paddle as many ticks as due since last frame
+            now = time.perf_counter()
+            accumulator += min(now - last_time, MAX_FRAME_TIME)
+            last_time = now
+            while accumulator >= tick_time:
+                accumulator -= tick_time
+                world.move_paddle(paddle, move)
+            client_data.y_r2 = paddle.y
+            client_data.x_r2 = paddle.x
+            timer.mark(PHASE_PADDLES)
 
             # Send data to server
-            client_data.send_to(self.__client)
-            # Receive data from server
-            if not server_data.receive_from(self.__client):
-                return False
-
-            server_data.handle_methods(
-                sound_wall=self.__sound_wall.play,
-                sound_blip=self.__sound_blip.play,
-                score_screen=self._score_screen,
-                update_score=self._update_score,
-            )
-
-            # Do graphic part
-            self._do_graphics(server_data.y_r1, server_data.x_r1, client_data.y_r2, client_data.x_r2, server_data.x_ball, server_data.y_ball)
+            if now >= next_send:
+                next_send = max(next_send + send_interval, now)
+                self.__net.send_state(client_data)
+
+            for event in self.__net.events():
+                event.handle(
+                    sound_wall=self.__assets.sound("wall").play,
+                    sound_blip=self.__assets.sound("blip").play,
+                    score_screen=self._score_screen,
+                    update_score=self._update_score,
+                )
+                if event.method == self._ServerEvent.METHOD_SCORE_SCREEN:
+                    # The score screen is neither simulated nor timed
+                    last_time = time.perf_counter()
+                    accumulator = 0
+                    timer.restart()
+            timer.mark(PHASE_NETWORK)
+
+            # Do graphic part, remote entities are interpolated
+            y_r1, x_r1, x_ball, y_ball = snapshots.sample(now)
+            self._do_graphics(y_r1, x_r1, client_data.y_r2, client_data.x_r2, x_ball, y_ball)
+            timer.mark(PHASE_GRAPHICS)
+            self.__clock.tick(self.__fps)
+            timer.mark(PHASE_WAIT)
+            timer.end_frame()
 
     def _keep_playing(self, mode):
         """
@@ -954,7 +1028,7 @@ class Game:
         :return: bool, Execution OK.
         """
         self._reset_score()
-        while self.__score[0] < self.__max_score and self.__score[1] < self.__max_score and self.__is_running:
+        while not self.__match.is_over and self.__is_running:
             if not self._play(mode):
                 return False
         return True
@@ -967,13 +1041,226 @@ class Game:
         :param mode: Mode of the game
         :return: None
         """
+        from .network import NetworkEngine
+        from .spectator import SpectatorHub, SpectatorPacket
+        self.__net = NetworkEngine(self.__client, self._ClientData if mode == MODE_LAN_SERVER else self._ServerData)
+        self.__net.start()
+        if mode == MODE_LAN_SERVER:
+            try:
+                self.__spectators = SpectatorHub()
+            except OSError as e:
+                print("Spectators are disabled -", e)
+            else:
+                self.__spectator_data = SpectatorPacket()
+                self.__spectators.start()
+        self.__match_start = time.perf_counter()
         try:
             if mode == MODE_LAN_SERVER:
                 self._keep_playing(MODE_LAN_SERVER)
             else:
                 self._keep_playing_client()
-        except (socket.timeout, ConnectionAbortedError, ConnectionResetError):
-            print("Something failed with the client/server..")
+        finally:
+            if self.__spectators is not None:
+                self.__spectators.stop()
+                self.__spectators.join()
+                self.__spectators = None
+            self.__net.stop()
+            self.__net.join()
+            if self.__net.error is not None:
+                print("Something failed with the client/server..", self.__net.error)
+            self.__net = None
+
+    def _play_on_server(self):
+        """
+        Join a room of the dedicated server set in the settings, as "host" or "host:port", and play its match.
+        The room is also taken from the settings, any room waiting for a player if not set.
+
+        :return: bool, Execution OK
+        """
+        import socket
+        from .network import NetworkEngine
+        from .server import JoinPacket, RoomPacket
+        from .spectator import SpectatorPacket
+        host, _, port = self.__settings.get("server", "127.0.0.1").partition(":")
+        join = JoinPacket(self.username, self.__settings.get("server_room", ""))
+        self._info_screen("Connecting to %s..." % host, "Press [Esc] to cancel once in the room")
+        try:
+            with socket.create_connection((host, int(port or SERVER_PORT)), INVITATION_TIMEOUT) as conn:
+                join.send_to(conn)
+                room = RoomPacket()
+                if not room.receive_from(conn):
+                    raise ConnectionResetError("No room assigned")
+            if not room.port:
+                self._info_screen("Room <%s> is full" % room.room, "Try another room!")
+                pygame.time.wait(2000)
+                return False
+            conn = socket.create_connection((host, room.port), INVITATION_TIMEOUT)
+        except (OSError, ValueError) as e:
+            print("Could not join the server -", e)
+            self._info_screen("Server %s is not available" % host, "Try again later!")
+            pygame.time.wait(2000)
+            return False
+
+        try:
+            join.room = room.room
+            join.send_to(conn)
+            conn.settimeout(TIMEOUT)
+            self._info_screen("Waiting for an opponent in <%s>..." % room.room, "Press [Esc] to leave")
+            self.__net = NetworkEngine(conn, SpectatorPacket, use_udp=False)
+            self.__net.start()
+            try:
+                return self._keep_playing_server()
+            finally:
+                self.__net.stop()
+                self.__net.join()
+                self.__net = None
+        finally:
+            conn.close()
+
+    def _keep_playing_server(self):
+        """
+        Play a dedicated server match. The own paddle is moved locally and sent to the server, while the rest of
+        the board is interpolated from the server states.
+
+        :return: bool, Execution OK
+        """
+        from .server import SlotPacket, PaddlePacket
+        world = self.__world
+        world.level = None
+        world.reset_round()
+        self._reset_score()
+        self.__renderer.invalidate()
+        snapshots = self.__snapshots
+        snapshots.clear()
+        snapshot = None
+        slot = None
+        paddle_data = PaddlePacket()
+        tick_time = 1 / self.__tick_rate
+        send_interval = 1 / self.__send_rate
+        accumulator = 0
+        last_time = next_send = time.perf_counter()
+
+        while True:
+            # Gat all events
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self._quit()
+                    return False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    return True
+            if not self.__net.is_connected:
+                return True
+
+            for event in self.__net.events():
+                if isinstance(event, SlotPacket):
+                    slot = event.slot
+            latest = self.__net.latest_with_time
+            if slot is None or latest is None:
+                last_time = time.perf_counter()
+                self.__clock.tick(self.__fps)
+                continue
+            paddle = world.paddles[slot - 1]
+
+            if latest[0] is not snapshot:
+                is_first = snapshot is None
+                snapshot, receive_time = latest
+                score = [snapshot.score1, snapshot.score2]
+                if score != self.__match.score:
+                    has_scored = (score[0] > self.__match.score[0]) == (slot == 1)
+                    self.__match.score = score
+                    if not is_first:
+                        self._score_screen(SCORE_SCREEN_SCORED if has_scored else SCORE_SCREEN_LOSE)
+                        snapshots.clear()
+                        world.reset_round()
+                        last_time = time.perf_counter()
+                        continue
+                snapshots.push(snapshot.time / 1000, snapshot.round,
+                               (snapshot.y_r1, snapshot.x_r1, snapshot.y_r2, snapshot.x_r2, snapshot.x_ball,
+                                snapshot.y_ball), (snapshot.vx_ball, snapshot.vy_ball), receive_time)
+                world.puck.x = snapshot.x_ball
+
+            # Move the paddle as many ticks as due since last frame
+            pressed = pygame.key.get_pressed()
+            move = self._get_move(pressed, pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT)
+            now = time.perf_counter()
+            accumulator += min(now - last_time, MAX_FRAME_TIME)
+            last_time = now
+            while accumulator >= tick_time:
+                accumulator -= tick_time
+                world.move_paddle(paddle, move)
+
+            if now >= next_send:
+                next_send = max(next_send + send_interval, now)
+                paddle_data.y, paddle_data.x = paddle.y, paddle.x
+                self.__net.send_state(paddle_data)
+
+            # Do graphic part, the own paddle is drawn where it is locally
+            positions = list(snapshots.sample(now))
+            positions[2 * slot - 2:2 * slot] = paddle.y, paddle.x
+            self._do_graphics(*positions)
+            self.__clock.tick(self.__fps)
+
+    def _keep_watching(self, conn):
+        """
+        Watch a LAN match until it ends or the spectator leaves.
+
+        :param conn: Socket connection to the server spectator port
+        :return: bool, Execution OK
+        """
+        from .network import NetworkEngine
+        from .spectator import SpectatorPacket
+        self.__net = NetworkEngine(conn, SpectatorPacket, use_udp=False)
+        self.__net.start()
+        try:
+            return self._keep_watching_client()
+        finally:
+            self.__net.stop()
+            self.__net.join()
+            self.__net = None
+
+    def _keep_watching_client(self):
+        """
+        Render the received match snapshots.
+
+        :return: bool, Execution OK
+        """
+        self._reset_score()
+        self.__renderer.invalidate()
+        snapshots = self.__snapshots
+        snapshots.clear()
+        snapshot = None
+
+        while True:
+            # Gat all events
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self._quit()
+                    return False
+                elif event.type == pygame.KEYDOWN and event.key in (pygame.K_ESCAPE, pygame.K_BACKSPACE):
+                    return True
+            if not self.__net.is_connected:
+                return True
+
+            latest = self.__net.latest_with_time
+            if latest is not None and latest[0] is not snapshot:
+                is_first = snapshot is None
+                snapshot, receive_time = latest
+                score = [snapshot.score1, snapshot.score2]
+                if score != self.__match.score:
+                    has_scored = score[0] > self.__match.score[0]
+                    self.__match.score = score
+                    if not is_first:
+                        self._score_screen(SCORE_SCREEN_PLAYER1_SCORED if has_scored else SCORE_SCREEN_PLAYER2_SCORED)
+                        snapshots.clear()
+                        continue
+                snapshots.push(snapshot.time / 1000, snapshot.round,
+                               (snapshot.y_r1, snapshot.x_r1, snapshot.y_r2, snapshot.x_r2, snapshot.x_ball,
+                                snapshot.y_ball), (snapshot.vx_ball, snapshot.vy_ball), receive_time)
+
+            positions = snapshots.sample(time.perf_counter())
+            if positions is not None:
+                self._do_graphics(*positions)
+            self.__clock.tick(self.__fps)
 
     def _reset_score(self):
         """
@@ -981,7 +1268,7 @@ class Game:
 
         :return: None
         """
-        self.__score = [0, 0]
+        self.__match.reset()
 
     def _update_score(self, has_scored):
         """
@@ -990,7 +1277,7 @@ class Game:
         :param has_scored: bool, Flag indicating player one has scored
         :return: None
         """
-        self.__score[0 if has_scored else 1] += 1
+        self.__match.update(has_scored)
 
     def _quit(self):
         """
@@ -999,6 +1286,14 @@ class Game:
         :return: None
         """
         self.__is_running = False
+        self.__assets.stop()
+        if self.__frame_timer.count:
+            # Saved as JSON if the path ends with .json
+            path = self.__settings.get("frame_timing_dump", "frame_timing.csv")
+            try:
+                self.__frame_timer.dump(path)
+            except OSError as e:
+                print("Error saving frame timing -", e)
         pygame.quit()
         self._save_settings()
 
@@ -1011,15 +1306,76 @@ class Game:
         """
         return self.__settings["username"]
 
+    @property
+    def assets(self):
+        """
+        Get the game assets, with the time spent loading them.
+
+        :return: AssetManager, Assets
+        """
+        return self.__assets
+
+    @property
+    def beacon(self):
+        """
+        Get the status announced to the LAN. The load is the part of the last frame spent working instead of
+        waiting for the next one.
+
+        :return: Beacon, Status
+        """
+        from .broadcast import Beacon
+        spectators = self.__spectators
+        load = 100 * self.__clock.get_rawtime() / max(self.__clock.get_time(), 1)
+        return Beacon(self.username, TCP_PORT, SPECTATOR_PORT if spectators is not None else 0,
+                      int(self.__net is not None), spectators.count if spectators is not None else 0, load)
+
     def set_fps(self, fps):
         """
-        Set game frames per second.
+        Set game frames per second. The game speed does not depend on it.
 
         :param fps: int, Frames per second
         :return: None
         """
         self.__fps = fps
 
+    def set_tick_rate(self, tick_rate):
+        """
+        Set physics ticks per second. Higher rates give more accurate collisions at the same game speed.
+
+        :param tick_rate: int, Ticks per second
+        :return: None
+        """
+        self.__tick_rate = tick_rate
+        self.__world.set_tick_rate(tick_rate)
+
+    def set_send_rate(self, send_rate):
+        """
+        Set LAN states sent per second.
+
+        :param send_rate: int, States per second
+        :return: None
+        """
+        self.__send_rate = send_rate
+
+    def set_interpolation_delay(self, delay):
+        """
+        Set how far in the past the LAN client renders the server snapshots.
+        Bigger delays absorb more network jitter.
+
+        :param delay: float, Delay in seconds
+        :return: None
+        """
+        self.__snapshots.delay = delay
+
+    def set_first_frame_handler(self, handler):
+        """
+        Set a function called once the first frame of the main menu is shown, i.e., when the game is interactive.
+
+        :param handler: function, Handler without arguments
+        :return: None
+        """
+        self.__first_frame_handler = handler
+
     def set_difficulty(self, difficulty):
         """
         Set game difficulty. Allowed values: LEVEL_EASY, LEVEL_MEDIUM, LEVEL_HARD, LEVEL_IMPOSSIBLE
@@ -1039,6 +1395,6 @@ class Game:
         """
         if not self.__is_running:
             raise AssertionError("Game can only be started once")
-        self.__sound_main.play()
+        self.__assets.play_music("main")
         while self.__is_running:
             self._start_menu()
@@ -0,0 +1,141 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import math
+
+__all__ = [
+    "rounded_rect_collided_with_circle",
+    "rounded_rect_circle_contact",
+    "rounded_rects_collided_with_circles",
+    "wrap_to_pi",
+]
+
+
+def _rounded_rect_core(rect, radius):
+    """
+    Get the inner core of a rounded rect, i.e., the rectangle whose points are at exactly
+    the corner radius from the rounded rect border.
+
+    :param rect: Rectangle parameters (x, y, width, height)
+    :param radius: Rectangle border radius in percentage: 0 <= radius <= 1
+    :return: (left, top, right, bottom, corner radius)
+    """
+    rect_x, rect_y, rect_width, rect_height = rect
+    rect_corner_radius = min(rect_width, rect_height) * radius / 2
+    return (rect_x + rect_corner_radius, rect_y + rect_corner_radius,
+            rect_x + rect_width - rect_corner_radius, rect_y + rect_height - rect_corner_radius,
+            rect_corner_radius)
+
+
+def _core_contact(core, circle_x, circle_y, circle_radius):
+    """
+    Compute the contact between a circle and a rounded rect given by its core.
+
+    :param core: Rounded rect core as returned by _rounded_rect_core
+    :param circle_x: float, Circle x coordinate
+    :param circle_y: float, Circle y coordinate
+    :param circle_radius: float, Circle radius
+    :return: ((x, y), (normal_x, normal_y)) / None
+    """
+    left, top, right, bottom, corner_radius = core
+    reach = corner_radius + circle_radius
+    if not (left - reach <= circle_x <= right + reach and top - reach <= circle_y <= bottom + reach):
+        return None
+
+    # Closest point of the core to the circle center
+    core_x = left if circle_x < left else right if circle_x > right else circle_x
+    core_y = top if circle_y < top else bottom if circle_y > bottom else circle_y
+    dx = circle_x - core_x
+    dy = circle_y - core_y
+    distance_sq = dx * dx + dy * dy
+    if distance_sq > reach * reach:
+        return None
+
+    if distance_sq > 0:
+        distance = math.sqrt(distance_sq)
+        normal_x = dx / distance
+        normal_y = dy / distance
+        return (core_x + normal_x * corner_radius, core_y + normal_y * corner_radius), (normal_x, normal_y)
+
+    # Circle center is inside the core, push it out through the nearest face
+    faces = ((circle_x - left, -1, 0), (right - circle_x, 1, 0), (circle_y - top, 0, -1), (bottom - circle_y, 0, 1))
+    _, normal_x, normal_y = min(faces, key=lambda face: face[0])
+    if normal_x:
+        contact = (left - corner_radius if normal_x < 0 else right + corner_radius), circle_y
+    else:
+        contact = circle_x, (top - corner_radius if normal_y < 0 else bottom + corner_radius)
+    return contact, (normal_x, normal_y)
+
+
+def rounded_rect_circle_contact(rect, radius, circle_pos, circle_radius):
+    """
+    Check if a circle has collided with a rounded rect, in constant time.
+    If so, returns the contact point on the rounded rect border and the unit normal
+    pointing from the rect towards the circle, otherwise returns None.
+
+    :param rect: Rectangle parameters (x, y, width, height)
+    :param radius: Rectangle border radius in percentage: 0 <= radius <= 1
+    :param circle_pos: Circle coordinates (x, y)
+    :param circle_radius: Circle radius
+    :return: ((x, y), (normal_x, normal_y)) / None
+    """
+    rect_x, rect_y, rect_width, rect_height = rect
+    circle_x, circle_y = circle_pos
+    if not (rect_x - circle_radius <= circle_x <= rect_x + rect_width + circle_radius and
+            rect_y - circle_radius <= circle_y <= rect_y + rect_height + circle_radius):
+        return None
+    return _core_contact(_rounded_rect_core(rect, radius), circle_x, circle_y, circle_radius)
+
+
+def rounded_rect_collided_with_circle(rect, radius, circle_pos, circle_radius):
+    """
+    Check if a circle has collided with a rounded rect.
+    If so, returns collision coordinates, otherwise returns None.
+
+    :param rect: Rectangle parameters (x, y, width, height)
+    :param radius: Rectangle border radius in percentage: 0 <= radius <= 1
+    :param circle_pos: Circle coordinates (x, y)
+    :param circle_radius: Circle radius
+    :return: Collision coordinates (x, y) / None
+    """
+    contact = rounded_rect_circle_contact(rect, radius, circle_pos, circle_radius)
+    return None if contact is None else contact[0]
+
+
+def rounded_rects_collided_with_circles(rects, radius, circles):
+    """
+    Check many circles against many rounded rects in one call.
+    Rect cores are computed once, so the cost per pair is a handful of float operations.
+
+    :param rects: list, Rectangles parameters [(x, y, width, height), ...]
+    :param radius: Rectangles border radius in percentage: 0 <= radius <= 1
+    :param circles: list, Circles [((x, y), radius), ...]
+    :return: list, Contacts as in rounded_rect_circle_contact, indexed as [circle][rect]
+    """
+    cores = [_rounded_rect_core(rect, radius) for rect in rects]
+    contacts = []
+    for (circle_x, circle_y), circle_radius in circles:
+        row = []
+        for core in cores:
+            left, top, right, bottom, corner_radius = core
+            reach = corner_radius + circle_radius
+            if left - reach <= circle_x <= right + reach and top - reach <= circle_y <= bottom + reach:
+                row.append(_core_contact(core, circle_x, circle_y, circle_radius))
+            else:
+                row.append(None)
+        contacts.append(row)
+    return contacts
+
+
+def wrap_to_pi(angle):
+    """
+    Wrap the given angle to pi: -pi <= angle <= pi.
+
+    :param angle: float, Angle to wrap in rads
+    :return: float, Wrapped angle
+    """
+    while angle > math.pi:
+        angle -= 2 * math.pi
+    while angle < -math.pi:
+        angle += 2 * math.pi
+    return angle
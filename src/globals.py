@@ -42,16 +42,51 @@ COLOR_NEV = (5, 95, 135)
 COLOR_YELLOW = (255, 246, 0)
 COLOR_ORANGE = (255, 85, 7)
 
+# Game loop settings, longer frames are simulated as MAX_FRAME_TIME to avoid falling behind forever
+MAX_FRAME_TIME = 0.25
+# Seconds the score screen is shown between rounds
+ROUND_PAUSE = 5
+
+# Frame timing phases, in loop order. Paddles include the PC player, physics the collisions and the puck move
+PHASE_INPUT = 0
+PHASE_NETWORK = 1
+PHASE_PADDLES = 2
+PHASE_PHYSICS = 3
+PHASE_GRAPHICS = 4
+PHASE_WAIT = 5
+PHASE_NAMES = ("input", "network", "paddles", "physics", "graphics", "wait")
+# Frames kept by the frame timer
+FRAME_TIMER_SIZE = 600
+
 # TCP Sockets settings
 TCP_PORT = 1010
 TIMEOUT = 30
 INVITATION_TIMEOUT = 10
+# Seconds a UDP channel may go without datagrams once announced, states are sent over TCP afterwards
+UDP_GRACE = 2
+# Invitations waiting for the user to answer, more inviters are refused
+MAX_INVITATIONS = 8
+
+# Spectator settings
+SPECTATOR_PORT = 1011
+MAX_SPECTATORS = 64
+
+# Lobby directory settings
+LOBBY_PORT = 1030
+
+# Dedicated server settings, workers listen on the following ports
+SERVER_PORT = 1020
+
+# Seconds the local interface addresses are cached
+INTERFACES_REFRESH = 5
 
 # Broadcast settings
 BROADCAST_TIMEOUT = 2
 BROADCAST_PORT = 12345
 BROADCAST_BUFFER_SIZE = 64
 BROADCAST_IDENTIFIER = "air-hockey"
+# Increased on incompatible changes of the beacons or the game packets, hosts of other versions are not listed
+BROADCAST_PROTOCOL_VERSION = 1
 
 # Settings file
 SETTINGS = "settings.json"
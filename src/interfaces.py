@@ -0,0 +1,125 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import time
+import socket
+import struct
+from .globals import INTERFACES_REFRESH
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+__all__ = [
+    "LocalInterfaces",
+    "local_interfaces",
+]
+
+# ioctl request getting the IPv4 address of an interface, and the offset of the address in the reply
+_SIOCGIFADDR = 0x8915
+_IFREQ = struct.Struct("256s")
+_IFREQ_ADDRESS_OFFSET = 20
+
+
+def _interface_addresses():
+    """
+    Get the IPv4 addresses of the network interfaces, asking the kernel for every interface.
+    No name resolution nor external route is used.
+
+    :return: list, Addresses (empty if the platform can not enumerate its interfaces)
+    """
+    if fcntl is None or not hasattr(socket, "if_nameindex"):
+        return []
+    addresses = []
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for _, name in socket.if_nameindex():
+            try:
+                reply = fcntl.ioctl(s.fileno(), _SIOCGIFADDR, _IFREQ.pack(name[:15].encode("utf-8")))
+            except OSError:
+                # Interface without IPv4 address, or down
+                continue
+            addresses.append(socket.inet_ntoa(reply[_IFREQ_ADDRESS_OFFSET:_IFREQ_ADDRESS_OFFSET + 4]))
+    except OSError:
+        pass
+    finally:
+        s.close()
+    return addresses
+
+
+def _host_addresses():
+    """
+    Get the IPv4 addresses the host name resolves to, for platforms without interface enumeration.
+
+    :return: list, Addresses
+    """
+    try:
+        return [info[4][0] for info in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET)]
+    except OSError:
+        return []
+
+
+class LocalInterfaces:
+    """
+    Cached set of the IPv4 addresses of this machine, on every interface. The addresses are enumerated on first
+    use and again every refresh seconds, so interfaces coming up or changing their address are noticed, and checking
+    if an address is local is a set lookup.
+    """
+
+    def __init__(self, refresh=INTERFACES_REFRESH):
+        """
+        :param refresh: float, Seconds the addresses are cached
+        """
+        self.__refresh = refresh
+        self.__addresses = frozenset()
+        self.__primary = "127.0.0.1"
+        self.__expiry = None
+
+    def refresh(self):
+        """
+        Enumerate the addresses again.
+
+        :return: None
+        """
+        addresses = _interface_addresses() or _host_addresses()
+        external = [address for address in addresses if not address.startswith("127.")]
+        # Swapped at once, the consumers run in other threads
+        self.__primary = external[0] if external else "127.0.0.1"
+        self.__addresses = frozenset(addresses) | {"127.0.0.1"}
+        self.__expiry = time.monotonic() + self.__refresh
+
+    @property
+    def addresses(self):
+        """
+        Get the local addresses, enumerating them if the cache expired.
+
+        :return: frozenset, Addresses
+        """
+        if self.__expiry is None or time.monotonic() >= self.__expiry:
+            self.refresh()
+        return self.__addresses
+
+    @property
+    def primary(self):
+        """
+        Get the address shown to the user, the first one not in the loopback network.
+
+        :return: str, Address
+        """
+        if self.__expiry is None or time.monotonic() >= self.__expiry:
+            self.refresh()
+        return self.__primary
+
+    def is_local(self, ip):
+        """
+        Check if an address belongs to this machine, including the whole loopback network.
+
+        :param ip: str, IPv4 address
+        :return: bool, Is local
+        """
+        return ip in self.addresses or ip.startswith("127.")
+
+
+# Shared by all the listeners
+local_interfaces = LocalInterfaces()
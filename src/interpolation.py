@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+from collections import deque
+
+__all__ = [
+    "SnapshotBuffer",
+]
+
+
+class SnapshotBuffer:
+    """
+    Jitter buffer for remote snapshots. Snapshots are stamped with the server time, and the buffer renders
+    them a fixed delay in the past, interpolating between the two snapshots around the render time. When
+    snapshots run late, the puck is extrapolated from its velocity for a limited time.
+
+    A snapshot is (server_time, segment, values, velocity), where values are the positions ending with the puck
+    position, e.g., (y_r1, x_r1, x_ball, y_ball), velocity is the puck velocity (vx, vy) in pixels per second and
+    segment identifies a continuous motion, i.e., snapshots of different segments (rounds) are never interpolated.
+    """
+
+    def __init__(self, delay=0.1, size=32, max_extrapolation=0.2):
+        """
+        :param delay: float, Seconds in the past snapshots are rendered
+        :param size: int, Maximum number of buffered snapshots
+        :param max_extrapolation: float, Maximum seconds the puck is extrapolated beyond the newest snapshot
+        """
+        self.delay = delay
+        self.max_extrapolation = max_extrapolation
+        self.__snapshots = deque(maxlen=size)
+        self.__offsets = deque(maxlen=size)
+        self.__offset = None
+
+    def clear(self):
+        """
+        Remove all buffered snapshots.
+
+        :return: None
+        """
+        self.__snapshots.clear()
+        self.__offsets.clear()
+        self.__offset = None
+
+    def push(self, server_time, segment, values, velocity, receive_time):
+        """
+        Add a snapshot. Snapshots older than the newest one are ignored.
+
+        :param server_time: float, Server time of the snapshot in seconds
+        :param segment: int, Motion segment of the snapshot
+        :param values: tuple, Positions
+        :param velocity: (float, float), Puck velocity in pixels per second
+        :param receive_time: float, Local time the snapshot was received in seconds
+        :return: None
+        """
+        if self.__snapshots and server_time <= self.__snapshots[-1][0]:
+            return
+        self.__snapshots.append((server_time, segment, values, velocity))
+
+        # The smallest recent offset is the one with the least network delay
+        self.__offsets.append(receive_time - server_time)
+        self.__offset = min(self.__offsets)
+
+    def sample(self, now):
+        """
+        Get the positions to render at a local time.
+
+        :param now: float, Local time in seconds
+        :return: tuple, Positions / None if there are no snapshots
+        """
+        if not self.__snapshots:
+            return None
+        render_time = now - self.delay - self.__offset
+
+        newest = self.__snapshots[-1]
+        if render_time >= newest[0]:
+            # Late snapshots, extrapolate the puck
+            elapsed = min(render_time - newest[0], self.max_extrapolation)
+            *others, x_ball, y_ball = newest[2]
+            vx, vy = newest[3]
+            return (*others, x_ball + vx * elapsed, y_ball + vy * elapsed)
+
+        older = None
+        for snapshot in reversed(self.__snapshots):
+            if snapshot[0] <= render_time:
+                older = snapshot
+                break
+            newer = snapshot
+        if older is None:
+            return newer[2]
+        if older[1] != newer[1]:
+            return older[2]
+
+        ratio = (render_time - older[0]) / (newer[0] - older[0])
+        return tuple(a + (b - a) * ratio for a, b in zip(older[2], newer[2]))
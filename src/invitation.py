@@ -2,15 +2,20 @@
 # -*- coding: UTF-8 -*-
 
 import time
+import errno
+import queue
 import socket
+import selectors
 import threading
-from .globals import TCP_PORT, INVITATION_TIMEOUT
-from .utils import get_local_ip, Packet
+from .globals import INVITATION_TIMEOUT, MAX_INVITATIONS
+from .interfaces import local_interfaces
+from .utils import Packet, STRING, frame_reader, UnknownPacket, InvalidData
 
 __all__ = [
     "InvitationPacket",
     "InvitationAcceptedPacket",
     "GetConnection",
+    "SendInvitations",
 ]
 
 
@@ -19,6 +24,9 @@ class InvitationPacket(Packet):
     Packet sent on invitation request.
     """
 
+    packet_type = 1
+    fields = (("username", STRING),)
+
     def __init__(self, username=""):
         self.username = username
 
@@ -28,95 +36,352 @@ class InvitationAcceptedPacket(InvitationPacket):
     Packet sent on invitation accepted.
     """
 
+    packet_type = 2
+
 
 class GetConnection(threading.Thread):
     """
-    Threaded listener to wait for an invitation request.
+    Threaded listener to wait for invitation requests. Connections are multiplexed with a selector, so many
+    handshakes run at once, each with its own deadline. Completed invitations are queued for the UI, which takes
+    them one at a time; when the queue is full new inviters are refused at once instead of waiting.
     """
 
-    def __init__(self, server):
+    def __init__(self, server, max_invitations=MAX_INVITATIONS):
+        """
+        :param server: Listening socket
+        :param max_invitations: int, Invitations queued for the UI
+        """
         threading.Thread.__init__(self)
         self.daemon = True
         self.__is_running = False
         self.__server = server
-        self.__connection = None
-        self.__username = None
-        self.__ip = [get_local_ip(), "127.0.0.1"]
+        self.__invitations = queue.Queue(max_invitations)
+        self.__selector = selectors.DefaultSelector()
+        # Written to wake up the selector on stop
+        self.__wakeup_r, self.__wakeup_w = socket.socketpair()
+        self.__deadlines = {}
 
     def run(self):
         self.__is_running = True
+        # The server socket belongs to the caller, its blocking mode is restored when leaving
+        server_timeout = self.__server.gettimeout()
+        self.__server.setblocking(False)
+        self.__wakeup_r.setblocking(False)
+        self.__selector.register(self.__server, selectors.EVENT_READ)
+        self.__selector.register(self.__wakeup_r, selectors.EVENT_READ)
         packet = InvitationPacket()
-        while self.__is_running:
-            connection, (ip, _) = self.__server.accept()
-            if ip not in self.__ip:
-                connection.settimeout(INVITATION_TIMEOUT)
-                try:
-                    if not packet.receive_from(connection):
-                        connection.close()
-                        continue
-                except (socket.timeout, ConnectionAbortedError):
-                    continue
-
-                self.__connection = connection
-                self.__username = packet.username
-                while self.__is_running and self.__connection is not None:
-                    time.sleep(0.1)
-            else:
+        try:
+            while self.__is_running:
+                timeout = max(min(self.__deadlines.values()) - time.monotonic(), 0) if self.__deadlines else None
+                for key, _ in self.__selector.select(timeout):
+                    if key.fileobj is self.__server:
+                        self._accept()
+                    elif key.fileobj is self.__wakeup_r:
+                        self.__is_running = False
+                    else:
+                        self._handshake(key.fileobj, packet)
+                self._expire(time.monotonic())
+        finally:
+            for connection in list(self.__deadlines):
+                self._close(connection)
+            self.__selector.close()
+            self.__wakeup_r.close()
+            self.__wakeup_w.close()
+            self._clear()
+            try:
+                self.__server.settimeout(server_timeout)
+            except OSError:
+                # Server closed
+                pass
+
+    def _accept(self):
+        """
+        Accept the pending connections, starting their handshakes.
+
+        :return: None
+        """
+        while True:
+            try:
+                connection, (ip, _) = self.__server.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # Server closed
+                self.__is_running = False
+                return
+            if local_interfaces.is_local(ip) or self.__invitations.full():
                 connection.close()
+                continue
+            connection.setblocking(False)
+            self.__selector.register(connection, selectors.EVENT_READ)
+            self.__deadlines[connection] = time.monotonic() + INVITATION_TIMEOUT
 
-    @property
-    def connection(self):
+    def _handshake(self, connection, packet):
         """
-        Get current connection.
+        Read from a connection in handshake, queuing the invitation once it is complete.
 
-        :return: socket connection
+        :param connection: Socket connection
+        :param packet: InvitationPacket, Packet to load the data to
+        :return: None
         """
-        return self.__connection
+        try:
+            frames = frame_reader(connection).read_available()
+            if frames is None:
+                self._close(connection)
+                return
+            if not frames:
+                return
+            packet.loads(frames[0])
+        except (OSError, UnknownPacket, InvalidData):
+            self._close(connection)
+            return
+        self.__selector.unregister(connection)
+        del self.__deadlines[connection]
+        connection.settimeout(INVITATION_TIMEOUT)
+        try:
+            self.__invitations.put_nowait((connection, packet.username, time.monotonic()))
+        except queue.Full:
+            connection.close()
 
-    @property
-    def username(self):
+    def _expire(self, now):
         """
-        Get current connection username.
+        Close the connections whose handshake did not complete in time.
 
-        :return: str, Username
+        :param now: float, Current time
+        :return: None
         """
-        return self.__username
+        for connection, deadline in list(self.__deadlines.items()):
+            if deadline <= now:
+                self._close(connection)
 
-    @property
-    def has_connection(self):
+    def _close(self, connection):
         """
-        Check if there is an active connectio
+        Close a connection in handshake.
 
-        :return: bool, Has connection
+        :param connection: Socket connection
+        :return: None
         """
-        return self.__connection is not None
+        self.__selector.unregister(connection)
+        del self.__deadlines[connection]
+        connection.close()
 
-    def refuse_connection(self):
+    def _clear(self):
         """
-        Refuse the current active connection.
+        Refuse all the queued invitations.
 
         :return: None
         """
-        if self.__connection is not None:
-            self.__connection.close()
-            self.__connection = None
-            self.__username = None
+        while True:
+            try:
+                connection, _, _ = self.__invitations.get_nowait()
+            except queue.Empty:
+                return
+            connection.close()
+
+    def next_invitation(self):
+        """
+        Get the next invitation, without waiting. Invitations older than INVITATION_TIMEOUT are refused, as the
+        inviter gave up on them. The taken connection is owned by the caller, who accepts or closes it.
+
+        :return: (socket, str), Connection and username / None if there is no invitation
+        """
+        while True:
+            try:
+                connection, username, received = self.__invitations.get_nowait()
+            except queue.Empty:
+                return None
+            if time.monotonic() - received < INVITATION_TIMEOUT:
+                return connection, username
+            connection.close()
 
-    def accept_connection(self):
+    def stop(self):
         """
-        Accept the current connection and stop the listener.
+        Stop the listener. The queued invitations are refused.
 
         :return: None
         """
-        if self.__is_running and self.__connection is not None:
+        self.__is_running = False
+        try:
+            self.__wakeup_w.send(b"\0")
+        except OSError:
+            # Already stopped
+            pass
+
+
+class SendInvitations(threading.Thread):
+    """
+    Threaded invitation sender. Several users are invited at once, with non-blocking connections multiplexed by a
+    selector; the first one accepting wins and the other invitations are cancelled. The progress can be read while
+    it runs, and the thread ends when an invitation is accepted, all are refused, the timeout expires or it is
+    stopped.
+    """
+
+    def __init__(self, username, users, timeout=INVITATION_TIMEOUT):
+        """
+        :param username: str, Username sent in the invitations
+        :param users: list, Users to invite as (username, ip address, port)
+        :param timeout: float, Seconds to wait for an answer
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.__is_running = False
+        self.__username = username
+        self.__users = users
+        self.__timeout = timeout
+        self.__selector = selectors.DefaultSelector()
+        # Written to wake up the selector on stop
+        self.__wakeup_r, self.__wakeup_w = socket.socketpair()
+        self.__pending = {}
+        self.__refused = 0
+        self.__accepted = None
+
+    def run(self):
+        self.__is_running = True
+        deadline = time.monotonic() + self.__timeout
+        self.__wakeup_r.setblocking(False)
+        self.__selector.register(self.__wakeup_r, selectors.EVENT_READ)
+        frame = InvitationPacket(self.__username).frame()
+        for user in self.__users:
+            self._connect(user, frame)
+        packet = InvitationAcceptedPacket()
+        try:
+            while self.__is_running and self.__pending:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                for key, events in self.__selector.select(timeout):
+                    if key.fileobj is self.__wakeup_r:
+                        self.__is_running = False
+                    elif events & selectors.EVENT_WRITE:
+                        self._send(key.fileobj)
+                    else:
+                        self._receive(key.fileobj, packet)
+                    if self.__accepted is not None:
+                        self.__is_running = False
+                        break
+        finally:
+            # Cancel the invitations not answered yet
+            for connection in list(self.__pending):
+                self._close(connection, is_refused=False)
+            self.__selector.close()
+            self.__wakeup_r.close()
+            self.__wakeup_w.close()
             self.__is_running = False
 
+    def _connect(self, user, frame):
+        """
+        Start connecting to a user.
+
+        :param user: (str, str, int), Username, ip address and port
+        :param frame: bytes, Invitation frame to send once connected
+        :return: None
+        """
+        _, ip, port = user
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connection.setblocking(False)
+        error = connection.connect_ex((ip, port))
+        if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            connection.close()
+            self.__refused += 1
+            return
+        self.__selector.register(connection, selectors.EVENT_WRITE)
+        self.__pending[connection] = memoryview(frame)
+
+    def _send(self, connection):
+        """
+        Send the rest of the invitation to a connecting user, waiting for the answer once sent.
+
+        :param connection: Socket connection
+        :return: None
+        """
+        try:
+            error = connection.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error:
+                raise ConnectionRefusedError(error, "Connection failed")
+            data = self.__pending[connection]
+            data = self.__pending[connection] = data[connection.send(data):]
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._close(connection)
+            return
+        if not data:
+            self.__selector.modify(connection, selectors.EVENT_READ)
+
+    def _receive(self, connection, packet):
+        """
+        Read the answer of a user. Any answer other than an acceptance is a refusal.
+
+        :param connection: Socket connection
+        :param packet: InvitationAcceptedPacket, Packet to load the data to
+        :return: None
+        """
+        try:
+            frames = frame_reader(connection).read_available()
+            if frames is None:
+                self._close(connection)
+                return
+            if not frames:
+                return
+            packet.loads(frames[0])
+        except (OSError, UnknownPacket, InvalidData):
+            self._close(connection)
+            return
+        self.__selector.unregister(connection)
+        del self.__pending[connection]
+        connection.settimeout(INVITATION_TIMEOUT)
+        self.__accepted = connection, packet.username
+
+    def _close(self, connection, is_refused=True):
+        """
+        Close a pending invitation.
+
+        :param connection: Socket connection
+        :param is_refused: bool, Count it as refused
+        :return: None
+        """
+        self.__selector.unregister(connection)
+        del self.__pending[connection]
+        connection.close()
+        if is_refused:
+            self.__refused += 1
+
+    @property
+    def pending(self):
+        """
+        Get the number of invitations waiting for an answer.
+
+        :return: int, Pending invitations
+        """
+        return len(self.__pending)
+
+    @property
+    def refused(self):
+        """
+        Get the number of invitations refused or failed.
+
+        :return: int, Refused invitations
+        """
+        return self.__refused
+
+    @property
+    def accepted(self):
+        """
+        Get the accepted invitation, owned by the caller once the thread ended.
+
+        :return: (socket, str), Connection and username of the user / None
+        """
+        return self.__accepted
+
     def stop(self):
         """
-        Stop the listener.
+        Cancel the invitations.
 
         :return: None
         """
-        if self.__is_running:
-            self.__is_running = False
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect(("127.0.0.1", TCP_PORT))
+        self.__is_running = False
+        try:
+            self.__wakeup_w.send(b"\0")
+        except OSError:
+            # Already stopped
+            pass
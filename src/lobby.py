@@ -0,0 +1,279 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import time
+import socket
+import asyncio
+import threading
+from .globals import LOBBY_PORT, BROADCAST_TIMEOUT
+from .broadcast import Beacon
+from .interfaces import local_interfaces
+from .utils import frame_reader, read_packet, Packet, STRING, UnknownPacket, InvalidData
+
+__all__ = [
+    "LobbyJoinPacket",
+    "LobbyPeerPacket",
+    "LobbyServer",
+    "LobbyClient",
+]
+
+# Bytes queued to a subscriber above which it is disconnected, it gets the whole table again on reconnection
+_WRITE_BUFFER_LIMIT = 65536
+
+
+class LobbyJoinPacket(Packet):
+    """
+    Packet sent by a host to register in the lobby and subscribe to its changes. It is resent every
+    BROADCAST_TIMEOUT seconds as keepalive, and to change the username.
+    """
+
+    packet_type = 12
+    fields = (("username", STRING),)
+
+    def __init__(self, username=""):
+        self.username = username
+
+
+class LobbyPeerPacket(Packet):
+    """
+    Packet sent by the lobby to its subscribers when a host is added or removed. On subscription, the current
+    hosts are sent as additions.
+    """
+
+    packet_type = 13
+    fields = (("version", "I"), ("is_added", "B"), ("ip", STRING), ("username", STRING))
+
+    def __init__(self, version=0, is_added=True, ip="", username=""):
+        self.version = version
+        self.is_added = is_added
+        self.ip = ip
+        self.username = username
+
+
+class LobbyServer:
+    """
+    Lobby directory service. Hosts keep a TCP connection to the lobby, which is both their registration and
+    their subscription: on connection they get the current hosts, and then only the changes. Discovery traffic of
+    a host therefore depends on how often hosts come and go, not on how many there are.
+    Hosts are removed when their connection is closed or silent for ttl seconds.
+    """
+
+    def __init__(self, host="0.0.0.0", port=LOBBY_PORT, ttl=2 * BROADCAST_TIMEOUT + 1):
+        """
+        :param host: str, Address to listen on
+        :param port: int, Port to listen on
+        :param ttl: float, Seconds a silent host is kept
+        """
+        self.__host = host
+        self.__port = port
+        self.__ttl = ttl
+        self.__hosts = {}
+        self.__subscribers = set()
+        self.__version = 0
+
+    def _publish(self, is_added, peer):
+        """
+        Send a change to all the subscribers. The packet is encoded once.
+
+        :param is_added: bool, Host was added or removed
+        :param peer: (str, str), Host ip address and username
+        :return: None
+        """
+        self.__version += 1
+        frame = LobbyPeerPacket(self.__version, is_added, *peer).frame()
+        for writer in list(self.__subscribers):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > _WRITE_BUFFER_LIMIT:
+                self.__subscribers.discard(writer)
+                writer.close()
+            else:
+                writer.write(frame)
+
+    def _register(self, peer, writer):
+        """
+        Register a host, replacing the one registered with the same connection.
+
+        :param peer: (str, str), Host ip address and username
+        :param writer: StreamWriter, Host connection
+        :return: None
+        """
+        old = self.__hosts.get(writer)
+        if old == peer:
+            return
+        if old is not None:
+            self._publish(False, old)
+        self.__hosts[writer] = peer
+        self._publish(True, peer)
+
+    async def _handle(self, reader, writer):
+        """
+        Serve a host connection.
+
+        :param reader: StreamReader
+        :param writer: StreamWriter
+        :return: None
+        """
+        ip = writer.get_extra_info("peername")[0]
+        try:
+            while True:
+                packet = await read_packet(reader, self.__ttl)
+                if not isinstance(packet, LobbyJoinPacket):
+                    continue
+                if writer not in self.__subscribers:
+                    # Current hosts first, then the changes
+                    for peer in self.__hosts.values():
+                        writer.write(LobbyPeerPacket(self.__version, True, *peer).frame())
+                    self.__subscribers.add(writer)
+                self._register((ip, packet.username), writer)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, OSError, UnknownPacket, InvalidData):
+            pass
+        finally:
+            self.__subscribers.discard(writer)
+            peer = self.__hosts.pop(writer, None)
+            if peer is not None:
+                self._publish(False, peer)
+            writer.close()
+
+    async def _serve(self):
+        """
+        Serve forever.
+
+        :return: None
+        """
+        server = await asyncio.start_server(self._handle, self.__host, self.__port)
+        async with server:
+            await server.serve_forever()
+
+    def serve_forever(self):
+        """
+        Serve until interrupted.
+
+        :return: None
+        """
+        try:
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            pass
+
+
+class LobbyClient(threading.Thread):
+    """
+    Threaded lobby subscriber, registering the host and keeping the table of the other hosts. It has the same
+    interface as GetBroadcast. The lobby does not carry the host status, so the hosts get beacons of idle hosts
+    without a spectator port: they can be invited but not watched. A host leaves the lobby when it starts a match.
+    If the lobby can not be reached or the connection is lost, the thread ends with an error, so the broadcast
+    discovery can be used instead.
+    """
+
+    def __init__(self, parent, address):
+        """
+        :param parent: Object with the username property
+        :param address: (str, int), Lobby address
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.__is_running = False
+        self.__parent = parent
+        self.__address = address
+        self.__conn = None
+        self.__peers = set()
+        self.__data = []
+        self.__version = 0
+        self.__error = None
+
+    def run(self):
+        self.__is_running = True
+        try:
+            self.__conn = socket.create_connection(self.__address, BROADCAST_TIMEOUT)
+            reader = frame_reader(self.__conn)
+            packet = LobbyPeerPacket()
+            keepalive = 0
+            while self.__is_running:
+                if time.monotonic() - keepalive >= BROADCAST_TIMEOUT:
+                    LobbyJoinPacket(self.__parent.username).send_to(self.__conn)
+                    keepalive = time.monotonic()
+                try:
+                    # All the changes received at once are applied before publishing
+                    frames = reader.read_frames()
+                except socket.timeout:
+                    continue
+                if not frames:
+                    if self.__is_running:
+                        raise ConnectionResetError("Connection closed by the lobby")
+                    break
+                for frame in frames:
+                    packet.loads(frame)
+                    self._apply(packet)
+                self._publish()
+        except (OSError, UnknownPacket, InvalidData) as e:
+            if self.__is_running:
+                self.__error = e
+        finally:
+            self.__is_running = False
+            if self.__conn is not None:
+                self.__conn.close()
+
+    def _apply(self, packet):
+        """
+        Apply a change to the table.
+
+        :param packet: LobbyPeerPacket
+        :return: None
+        """
+        if local_interfaces.is_local(packet.ip):
+            return
+        if packet.is_added:
+            self.__peers.add((packet.ip, packet.username))
+        else:
+            self.__peers.discard((packet.ip, packet.username))
+
+    def _publish(self):
+        """
+        Publish the table to the consumers.
+
+        :return: None
+        """
+        data = [(ip, Beacon(username, spectator_port=0))
+                for ip, username in sorted(self.__peers, key=lambda peer: (peer[1], peer[0]))]
+        if data != self.__data:
+            self.__data = data
+            self.__version += 1
+
+    @property
+    def data(self):
+        """
+        Get gathered data in format of [(ip, beacon), ...], sorted by username
+
+        :return: list, Gathered data
+        """
+        return self.__data
+
+    @property
+    def version(self):
+        """
+        Get the version of the gathered data, increased on every change.
+
+        :return: int, Version
+        """
+        return self.__version
+
+    @property
+    def error(self):
+        """
+        Get the error that stopped the subscription, if any.
+
+        :return: Exception / None
+        """
+        return self.__error
+
+    def stop(self):
+        """
+        Stops the thread.
+
+        :return: None
+        """
+        self.__is_running = False
+        if self.__conn is not None:
+            try:
+                self.__conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
@@ -0,0 +1,365 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import copy
+import time
+import queue
+import socket
+import struct
+import selectors
+import threading
+from .globals import TIMEOUT, UDP_GRACE
+from .utils import frame_reader, frame_data, decode_packet, Packet, UnknownPacket, InvalidData
+from .snapshot import DeltaEncoder, DeltaDecoder, DELTA_SEQUENCE_MODULO
+
+__all__ = [
+    "ChannelPacket",
+    "NetworkEngine",
+]
+
+_SEQUENCE = struct.Struct("!I")
+_SEQUENCE_MODULO = 2 ** 32
+_DATAGRAM_SIZE = 1024
+
+
+def _is_newer(sequence, other, modulo):
+    """
+    Compare sequence numbers, allowing them to wrap around.
+
+    :param sequence: int, Sequence number
+    :param other: int, Sequence number
+    :param modulo: int, Sequence numbers modulo
+    :return: bool, sequence is newer than other
+    """
+    return 0 < (sequence - other) % modulo < modulo // 2
+
+
+class ChannelPacket(Packet):
+    """
+    Packet sent over the TCP connection to tell the peer where to send UDP snapshots. Port 0 tells the peer to
+    send them over TCP.
+    """
+
+    packet_type = 6
+    fields = (("port", "H"),)
+
+    def __init__(self, port=0):
+        self.port = port
+
+
+class NetworkEngine(threading.Thread):
+    """
+    Threaded connection service. Keeps the socket read and written in the background, so the game loop never
+    waits for the network. Received state packets are kept in a latest-state mailbox and any other packet is
+    queued as an event. Sent state packets replace the previous unsent one, while events are always sent.
+
+    Events go over the TCP connection. States go over a UDP channel as sequenced datagrams once the peer has
+    told its UDP port, so a lost state never delays the next ones; stale and out of order states are dropped.
+    Until then, or if UDP is disabled, states go over TCP too. If no state datagram arrives within udp_grace
+    seconds after the peer told its UDP port, e.g., because the LAN drops UDP, the channel is given up and the
+    peer is told to do the same, so states go over TCP both ways.
+
+    With delta compression, UDP states only carry the fields that changed since the last state the peer
+    acknowledged. Acknowledgements are piggybacked on the states sent back by the peer.
+    """
+
+    def __init__(self, conn, state_type, timeout=TIMEOUT, use_udp=True, delta=True, udp_grace=UDP_GRACE):
+        """
+        :param conn: Socket connection
+        :param state_type: Packet class of the received state packets
+        :param timeout: float, Seconds without receiving data before giving up the connection
+        :param use_udp: bool, Open a UDP channel for states
+        :param delta: bool, Delta compress the UDP states, both peers must agree and states must have fixed fields only
+        :param udp_grace: float, Seconds to wait for the first state datagram before sending states over TCP
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.__is_running = False
+        self.__conn = conn
+        self.__state_type = state_type
+        self.__timeout = timeout
+        self.__reader = frame_reader(conn)
+        self.__selector = selectors.DefaultSelector()
+        self.__wake_r, self.__wake_w = socket.socketpair()
+        self.__lock = threading.Lock()
+        self.__outgoing = bytearray()
+        self.__pending_state = None
+        self.__latest = None
+        self.__events = queue.Queue()
+        self.__error = None
+        self.__is_closed = False
+
+        # UDP channel
+        self.__udp = None
+        self.__udp_peer = None
+        self.__udp_grace = udp_grace
+        self.__udp_deadline = None
+        self.__send_sequence = 0
+        self.__receive_sequence = None
+        self.__acknowledged = None
+        self.__sequence_modulo = DELTA_SEQUENCE_MODULO if delta else _SEQUENCE_MODULO
+        self.__encoder = DeltaEncoder() if delta else None
+        self.__decoder = DeltaDecoder() if delta else None
+        if use_udp:
+            self.__udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.__udp.bind((conn.getsockname()[0], 0))
+            self.__udp.setblocking(False)
+
+    def run(self):
+        self.__is_running = True
+        self.__conn.setblocking(False)
+        self.__wake_r.setblocking(False)
+        self.__selector.register(self.__conn, selectors.EVENT_READ)
+        self.__selector.register(self.__wake_r, selectors.EVENT_READ)
+        if self.__udp is not None:
+            self.__selector.register(self.__udp, selectors.EVENT_READ)
+            self.send_event(ChannelPacket(self.__udp.getsockname()[1]))
+        last_receive = time.time()
+        try:
+            while self.__is_running:
+                for key, mask in self.__selector.select(0.1):
+                    if key.fileobj is self.__wake_r:
+                        try:
+                            self.__wake_r.recv(512)
+                        except BlockingIOError:
+                            pass
+                    elif key.fileobj is self.__udp:
+                        self._receive_datagrams()
+                        last_receive = time.time()
+                    elif mask & selectors.EVENT_READ:
+                        self._receive()
+                        last_receive = time.time()
+                if self.__udp_deadline is not None and time.time() > self.__udp_deadline:
+                    self._check_channel()
+                self._flush()
+                if time.time() - last_receive > self.__timeout:
+                    raise socket.timeout("No data received in %s seconds" % self.__timeout)
+            # Send what is left before leaving
+            self._flush()
+        except (OSError, UnknownPacket, InvalidData) as e:
+            self.__error = e
+        finally:
+            self.__is_running = False
+            self.__is_closed = True
+            self.__selector.close()
+            self.__wake_r.close()
+            self.__wake_w.close()
+            if self.__udp is not None:
+                self.__udp.close()
+
+    def _receive(self):
+        """
+        Read and dispatch all the received packets.
+
+        :return: None
+        """
+        frames = self.__reader.read_available()
+        if frames is None:
+            raise ConnectionResetError("Connection closed by peer")
+        for frame in frames:
+            packet = decode_packet(frame)
+            if type(packet) is self.__state_type:
+                self.__latest = packet, time.perf_counter()
+            elif isinstance(packet, ChannelPacket):
+                if self.__udp is None or not packet.port:
+                    # UDP is disabled here, or the peer gets no datagrams
+                    self.__udp_peer = self.__udp_deadline = None
+                    if packet.port:
+                        self.send_event(ChannelPacket(0))
+                else:
+                    self.__udp_peer = (self.__conn.getpeername()[0], packet.port)
+                    self.__udp_deadline = time.time() + self.__udp_grace
+            else:
+                self.__events.put(packet)
+
+    def _check_channel(self):
+        """
+        Give up the UDP channel if no state datagram arrived in the grace period, telling the peer.
+
+        :return: None
+        """
+        self.__udp_deadline = None
+        if self.__receive_sequence is None:
+            self.__udp_peer = None
+            self.send_event(ChannelPacket(0))
+
+    def _receive_datagrams(self):
+        """
+        Read all the queued state datagrams, keeping only the newest state.
+
+        :return: None
+        """
+        while True:
+            try:
+                data, address = self.__udp.recvfrom(_DATAGRAM_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except ConnectionResetError:
+                # ICMP port unreachable reported on some platforms, the peer may not be listening yet
+                continue
+            if self.__udp_peer is None or address[0] != self.__udp_peer[0]:
+                continue
+            try:
+                if self.__decoder is not None:
+                    sequence, ack = self.__decoder.header(data)
+                else:
+                    sequence, = _SEQUENCE.unpack_from(data)
+            except (struct.error, InvalidData):
+                continue
+            if self.__receive_sequence is not None and \
+                    not _is_newer(sequence, self.__receive_sequence, self.__sequence_modulo):
+                # Stale or duplicated
+                continue
+            try:
+                if self.__decoder is not None:
+                    if self.__acknowledged is None or _is_newer(ack, self.__acknowledged, self.__sequence_modulo):
+                        self.__acknowledged = ack
+                        self.__encoder.acknowledge(ack)
+                    packet = self.__decoder.decode(data)
+                else:
+                    packet = decode_packet(memoryview(data)[_SEQUENCE.size:])
+            except (UnknownPacket, InvalidData):
+                continue
+            if type(packet) is self.__state_type:
+                self.__receive_sequence = sequence
+                self.__latest = packet, time.perf_counter()
+
+    def _flush(self):
+        """
+        Send as much queued data as the socket accepts without blocking.
+
+        :return: None
+        """
+        with self.__lock:
+            if self.__pending_state is not None:
+                if self.__udp_peer is not None:
+                    self._send_datagram(self.__pending_state)
+                else:
+                    self.__outgoing += frame_data(self.__pending_state.dumps())
+                self.__pending_state = None
+            if not self.__outgoing:
+                return
+            try:
+                sent = self.__conn.send(self.__outgoing)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            del self.__outgoing[:sent]
+            pending = bool(self.__outgoing)
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+        if self.__selector.get_key(self.__conn).events != events:
+            self.__selector.modify(self.__conn, events)
+
+    def _send_datagram(self, packet):
+        """
+        Send a state as a sequenced datagram. Datagrams that can not be sent are dropped.
+
+        :param packet: Packet, State packet
+        :return: None
+        """
+        self.__send_sequence = self.__send_sequence % (self.__sequence_modulo - 1) + 1
+        if self.__encoder is not None:
+            data = self.__encoder.encode(self.__send_sequence, self.__receive_sequence or 0, packet)
+        else:
+            data = _SEQUENCE.pack(self.__send_sequence) + packet.dumps()
+        try:
+            self.__udp.sendto(data, self.__udp_peer)
+        except OSError:
+            pass
+
+    def _queue(self, packet, is_state):
+        """
+        Encode a packet and hand it to the service thread.
+
+        :param packet: Packet to send
+        :param is_state: bool, Packet replaces the previous unsent state
+        :return: None
+        """
+        with self.__lock:
+            if is_state:
+                # Encoded by the service thread, the caller may keep changing the packet
+                self.__pending_state = copy.copy(packet)
+            else:
+                self.__outgoing += packet.frame()
+        try:
+            self.__wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def send_state(self, packet):
+        """
+        Send a state packet. If the previous state was not sent yet, it is replaced.
+
+        :param packet: Packet to send
+        :return: None
+        """
+        self._queue(packet, True)
+
+    def send_event(self, packet):
+        """
+        Send an event packet. Events are always sent, in order.
+
+        :param packet: Packet to send
+        :return: None
+        """
+        self._queue(packet, False)
+
+    @property
+    def latest(self):
+        """
+        Get the latest received state packet.
+
+        :return: Packet / None if no state was received yet
+        """
+        return self.__latest[0] if self.__latest is not None else None
+
+    @property
+    def latest_with_time(self):
+        """
+        Get the latest received state packet with the time it was received, as given by time.perf_counter.
+
+        :return: (Packet, float) / None if no state was received yet
+        """
+        return self.__latest
+
+    def events(self):
+        """
+        Get all the received event packets, in order, since last call.
+
+        :return: list, Packets
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.__events.get_nowait())
+            except queue.Empty:
+                return events
+
+    @property
+    def error(self):
+        """
+        Get the error that stopped the service, if any.
+
+        :return: Exception / None
+        """
+        return self.__error
+
+    @property
+    def is_connected(self):
+        """
+        Check if the connection is still being serviced, i.e., the service was not stopped and had no errors.
+
+        :return: bool, Is connected
+        """
+        return not self.__is_closed
+
+    def stop(self):
+        """
+        Stops the thread after trying to send the queued data.
+
+        :return: None
+        """
+        self.__is_running = False
+        try:
+            self.__wake_w.send(b"\0")
+        except OSError:
+            pass
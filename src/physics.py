@@ -0,0 +1,390 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import math
+import random
+from .geometry import rounded_rect_collided_with_circle, wrap_to_pi
+from .globals import MIN_WIDTH, MIN_HEIGHT, LEVEL_EASY, LEVEL_MEDIUM, LEVEL_HARD, LEVEL_IMPOSSIBLE, PHASE_PADDLES, \
+    PHASE_PHYSICS
+
+__all__ = [
+    "BASE_TICK_RATE",
+    "MOVE_UP",
+    "MOVE_DOWN",
+    "MOVE_LEFT",
+    "MOVE_RIGHT",
+    "EVENT_WALL",
+    "EVENT_PADDLE",
+    "EVENT_PLAYER1_SCORED",
+    "EVENT_PLAYER2_SCORED",
+    "Paddle",
+    "Puck",
+    "MatchState",
+    "PhysicsWorld",
+]
+
+# Ticks per second the speeds are tuned for
+BASE_TICK_RATE = 100
+
+# Paddle moves
+MOVE_UP = 1
+MOVE_DOWN = 2
+MOVE_LEFT = 3
+MOVE_RIGHT = 4
+
+# Step events
+EVENT_WALL = 1
+EVENT_PADDLE = 2
+EVENT_PLAYER1_SCORED = 3
+EVENT_PLAYER2_SCORED = 4
+
+
+class Paddle:
+    """
+    Paddle (rectangle) entity.
+    """
+
+    __slots__ = ("x", "y", "width", "height", "player")
+
+    def __init__(self, x, y, width, height, player):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.player = player
+
+
+class Puck:
+    """
+    Puck (ball) entity. Velocity is kept as a vector, so moving it does not need any trigonometry.
+    """
+
+    __slots__ = ("x", "y", "vx", "vy", "speed", "radius")
+
+    def __init__(self, x, y, radius):
+        self.x = x
+        self.y = y
+        self.vx = 0.0
+        self.vy = 0.0
+        self.speed = 0.0
+        self.radius = radius
+
+    @property
+    def angle(self):
+        """
+        Get the puck direction.
+
+        :return: float, Angle in rads
+        """
+        return math.atan2(self.vy, self.vx)
+
+    def set_velocity(self, angle, speed):
+        """
+        Set the puck velocity from a direction and a speed.
+
+        :param angle: float, Angle in rads
+        :param speed: float, Speed in pixels per tick
+        :return: None
+        """
+        self.speed = speed
+        self.vx = math.cos(angle) * speed
+        self.vy = math.sin(angle) * speed
+
+
+class MatchState:
+    """
+    Score of a match.
+    """
+
+    __slots__ = ("score", "max_score")
+
+    def __init__(self, max_score=5):
+        self.score = [0, 0]
+        self.max_score = max_score
+
+    def reset(self):
+        """
+        Resets the score.
+
+        :return: None
+        """
+        self.score = [0, 0]
+
+    def update(self, has_scored):
+        """
+        Updates the score.
+
+        :param has_scored: bool, Flag indicating player one has scored
+        :return: None
+        """
+        self.score[0 if has_scored else 1] += 1
+
+    @property
+    def is_over(self):
+        """
+        Check if one of the players reached the max score.
+
+        :return: bool, Match is over
+        """
+        return self.max_score in self.score
+
+
+class PhysicsWorld:
+    """
+    Headless and deterministic air hockey simulation. One call to step advances one tick.
+    Speeds are given in pixels per tick and scaled with the tick rate, so the game speed in pixels per second
+    does not depend on it.
+    """
+
+    def __init__(self, width=MIN_WIDTH, height=MIN_HEIGHT, seed=None, level=None, match=None,
+                 tick_rate=BASE_TICK_RATE):
+        """
+        :param width: int, Board width
+        :param height: int, Board height
+        :param seed: Seed for the random generator, None for a random seed
+        :param level: enum, PC level controlling player 2, None if player 2 is not the PC
+        :param match: MatchState, Score to be updated, a new one is created if None
+        :param tick_rate: int, Ticks per second
+        """
+        self.width = width
+        self.height = height
+        self.level = level
+        self.match = match if match is not None else MatchState()
+        self.rand = random.Random(seed)
+
+        # Paddles
+        self.pc_move_offset = 20
+        self.paddles = (Paddle(0, 0, 50, 50, 1), Paddle(0, 0, 50, 50, 2))
+
+        # Puck
+        self.puck = Puck(0, 0, int(min(height, width) / 30))
+        self.max_puck_angle = math.radians(60)
+        self.max_collision_angle = math.radians(60)
+        self.collision_coefficient = self.max_collision_angle / math.pow(self.paddles[0].height / 2.0, 3)
+
+        self.has_collided = False
+        self.has_collided_with_top_bottom = False
+        self.min_distance_ratio = 0
+        self.is_round_over = False
+        # FrameTimer marking the paddles and physics phases of every step, if any
+        self.timer = None
+        self.set_tick_rate(tick_rate)
+        self.reset_round()
+
+    def set_tick_rate(self, tick_rate):
+        """
+        Set the ticks per second, scaling the speeds. The current puck speed is kept until the next round.
+
+        :param tick_rate: int, Ticks per second
+        :return: None
+        """
+        scale = BASE_TICK_RATE / tick_rate
+        self.tick_rate = tick_rate
+        self.paddle_speed = 3 * scale
+        self.paddle_hard_speed_offset = 1 * scale
+        self.puck_start_speed = 3 * scale
+        self.puck_speed_step = 0.2 * scale
+        self.puck_max_speed = 10 * scale
+
+    def reset_round(self):
+        """
+        Place paddles and puck at their start positions and throw the puck in a random diagonal.
+
+        :return: None
+        """
+        paddle1, paddle2 = self.paddles
+        paddle1.x = 30
+        paddle1.y = paddle2.y = (self.height - paddle1.height) / 2
+        paddle2.x = self.width - 80
+
+        self.puck.x = int(self.width / 2)
+        self.puck.y = int(self.height / 2)
+        self.puck.set_velocity(self.rand.choice([(math.pi / 4) + (i * math.pi / 2) for i in range(4)]),
+                               self.puck_start_speed)
+        self.min_distance_ratio = 0
+        self.is_round_over = False
+
+    def _x_range(self, paddle):
+        """
+        Get the x coordinates a paddle can be at, i.e., its half of the board.
+
+        :param paddle: Paddle, Paddle
+        :return: (float, float), Minimum and maximum x coordinates
+        """
+        if paddle.player == 2:
+            return self.width / 2, self.width - paddle.width
+        return 0, self.width / 2 - paddle.width
+
+    def can_move(self, paddle, move):
+        """
+        Checks if a paddle can do a move, ie, is not against the wall or the middle line in that direction.
+
+        :param paddle: Paddle, Paddle to move
+        :param move: enum, MOVE_UP, MOVE_DOWN, MOVE_LEFT or MOVE_RIGHT
+        :return: bool, Can move
+        """
+        if not 0 < self.puck.x < self.width:
+            return False
+        if move == MOVE_UP:
+            return paddle.y > 0
+        elif move == MOVE_DOWN:
+            return paddle.y + paddle.height < self.height
+        elif move == MOVE_LEFT:
+            return paddle.x > self._x_range(paddle)[0]
+        elif move == MOVE_RIGHT:
+            return paddle.x < self._x_range(paddle)[1]
+        return False
+
+    def move_paddle(self, paddle, move, speed=None):
+        """
+        Move a paddle if allowed. The paddle is stopped at the walls and the middle line, whatever the speed.
+
+        :param paddle: Paddle, Paddle to move
+        :param move: enum, MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT or None
+        :param speed: float, Pixels to move, paddle_speed if None
+        :return: bool, Has moved
+        """
+        if move is None or not self.can_move(paddle, move):
+            return False
+        if speed is None:
+            speed = self.paddle_speed
+        if move == MOVE_UP:
+            paddle.y = max(paddle.y - speed, 0)
+        elif move == MOVE_DOWN:
+            paddle.y = min(paddle.y + speed, self.height - paddle.height)
+        elif move == MOVE_LEFT:
+            paddle.x = max(paddle.x - speed, self._x_range(paddle)[0])
+        else:
+            paddle.x = min(paddle.x + speed, self._x_range(paddle)[1])
+        return True
+
+    def _pc_move(self):
+        """
+        Get the PC (player 2) move for the current level.
+
+        :return: (enum, float), Move and speed
+        """
+        puck = self.puck
+        paddle = self.paddles[1]
+        y_desired = None
+        if self.level == LEVEL_IMPOSSIBLE:
+            if puck.vx > 0:
+                y_desired = round((paddle.x - puck.x) * puck.vy / puck.vx + puck.y)
+                i = 0
+                while y_desired > self.height:
+                    y_desired -= self.height
+                    i += 1
+                while y_desired < 0:
+                    y_desired += self.height
+                    i += 1
+                if i % 2:
+                    y_desired = self.height - y_desired
+            else:
+                y_desired = self.height / 2
+
+        elif self.level == LEVEL_HARD or (puck.vx > 0 and (
+                self.level == LEVEL_MEDIUM or puck.x / self.width >= self.min_distance_ratio)):
+            y_desired = puck.y
+
+        speed = self.paddle_speed
+        if self.level == LEVEL_HARD:
+            speed += self.paddle_hard_speed_offset
+        if y_desired is not None:
+            if y_desired > paddle.y + (paddle.height + self.pc_move_offset) / 2:
+                return MOVE_DOWN, speed
+            elif y_desired < paddle.y + (paddle.height - self.pc_move_offset) / 2:
+                return MOVE_UP, speed
+        return None, speed
+
+    def _deflect(self, paddle, collision):
+        """
+        Bounce the puck off a paddle. The further from the paddle center it hits, the bigger the deflection.
+
+        :param paddle: Paddle, Paddle hit
+        :param collision: (x, y), Collision coordinates
+        :return: None
+        """
+        puck = self.puck
+        angle = math.pi - puck.angle
+        offset = math.pow(collision[1] - paddle.y - paddle.height / 2, 3) * self.collision_coefficient
+        if paddle.player == 1:
+            angle += offset
+            if wrap_to_pi(angle) < -self.max_puck_angle:
+                angle = -self.max_puck_angle
+            elif wrap_to_pi(angle) > self.max_puck_angle:
+                angle = self.max_puck_angle
+        else:
+            angle -= offset
+            if 0 < wrap_to_pi(angle) < math.pi - self.max_puck_angle:
+                angle = math.pi - self.max_puck_angle
+            elif self.max_puck_angle - math.pi < wrap_to_pi(angle) < 0:
+                angle = self.max_puck_angle - math.pi
+        puck.set_velocity(angle, puck.speed)
+
+    def step(self, inputs=(None, None)):
+        """
+        Advance the simulation by one tick.
+
+        :param inputs: (enum, enum), Moves for player 1 and player 2. Player 2 move is ignored if PC is playing.
+        :return: list, Events that happened during the tick
+        """
+        events = []
+        if self.is_round_over:
+            return events
+
+        puck = self.puck
+        paddle1, paddle2 = self.paddles
+        move1, move2 = inputs
+
+        self.move_paddle(paddle1, move1)
+        if self.level is None:
+            self.move_paddle(paddle2, move2)
+        else:
+            self.move_paddle(paddle2, *self._pc_move())
+        if self.timer is not None:
+            self.timer.mark(PHASE_PADDLES)
+
+        # Check collisions
+        if not (puck.radius < puck.y < self.height - puck.radius):
+            if not self.has_collided_with_top_bottom:
+                events.append(EVENT_WALL)
+                puck.vy = -puck.vy
+                self.has_collided_with_top_bottom = True
+        elif self.has_collided_with_top_bottom:
+            self.has_collided_with_top_bottom = False
+
+        puck_pos = puck.x, puck.y
+        collision1 = rounded_rect_collided_with_circle((paddle1.x, paddle1.y, paddle1.width, paddle1.height),
+                                                       1, puck_pos, puck.radius)
+        collision2 = rounded_rect_collided_with_circle((paddle2.x, paddle2.y, paddle2.width, paddle2.height),
+                                                       1, puck_pos, puck.radius)
+
+        if collision1 is not None or collision2 is not None:
+            if not self.has_collided:
+                events.append(EVENT_PADDLE)
+                if puck.speed < self.puck_max_speed:
+                    puck.speed += self.puck_speed_step
+                # For easy level, generate distance ratio for computer to follow the ball
+                if self.level == LEVEL_EASY and puck.vx <= 0:
+                    self.min_distance_ratio = self.rand.uniform(0, 0.7)
+                if collision1 is not None:
+                    self._deflect(paddle1, collision1)
+                else:
+                    self._deflect(paddle2, collision2)
+                self.has_collided = True
+        elif self.has_collided and paddle1.x + paddle1.width + puck.radius < puck.x < paddle2.x - puck.radius:
+            # Clear collision flag only if there is no risk of a new collision in the same place
+            self.has_collided = False
+
+        if -puck.radius <= puck.x <= self.width + puck.radius:
+            puck.x += puck.vx
+            puck.y += puck.vy
+        else:
+            has_scored = puck.vx > 0
+            self.match.update(has_scored)
+            events.append(EVENT_PLAYER1_SCORED if has_scored else EVENT_PLAYER2_SCORED)
+            self.is_round_over = True
+        if self.timer is not None:
+            self.timer.mark(PHASE_PHYSICS)
+
+        return events
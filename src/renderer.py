@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import pygame
+from pygame import gfxdraw
+from .globals import COLOR_NEV, COLOR_WHITE
+
+__all__ = [
+    "BoardRenderer",
+]
+
+
+class BoardRenderer:
+    """
+    Game board renderer. The static board is rendered once into a background surface, and every frame only
+    the areas under the moving objects are restored, redrawn and pushed to the display.
+    """
+
+    def __init__(self, screen, sprite_r1, sprite_r2, ball_radius):
+        """
+        :param screen: Surface, Display surface
+        :param sprite_r1: Surface, First pad sprite
+        :param sprite_r2: Surface, Second pad sprite
+        :param ball_radius: int, Ball radius
+        """
+        self.__screen = screen
+        self.__width, self.__height = screen.get_size()
+        self.__sprite_r1 = sprite_r1
+        self.__sprite_r2 = sprite_r2
+        self.__ball_radius = ball_radius
+        self.__background = self._render_background()
+        self.__dirty = []
+        self.__invalidated = True
+
+    def _render_background(self):
+        """
+        Render the static board elements.
+
+        :return: Surface
+        """
+        background = pygame.Surface((self.__width, self.__height)).convert()
+        background.fill(COLOR_NEV)
+        pygame.draw.circle(background, (249, 249, 255), (int(self.__width / 2), int(self.__height / 2)), 110, 1)
+        pygame.draw.circle(background, (249, 249, 255), (-55, int(self.__height / 2)), 110, 1)
+        pygame.draw.circle(background, (249, 249, 255), (int(self.__width + 55), int(self.__height / 2)), 110, 1)
+        return background
+
+    def invalidate(self):
+        """
+        Force the whole board to be redrawn on the next frame, e.g., after something else was drawn on screen.
+
+        :return: None
+        """
+        self.__invalidated = True
+
+    def draw(self, y_r1, x_r1, y_r2, x_r2, x_ball, y_ball, overlay=None):
+        """
+        Draw a frame and update the display. The board must be invalidated when the overlay is shown or hidden.
+
+        :param y_r1: y coordinate of the first pad
+        :param x_r1: x coordinate of the first pad
+        :param y_r2: y coordinate of the second pad
+        :param x_r2: x coordinate of the second pad
+        :param x_ball: x coordinate of the ball
+        :param y_ball: y coordinate of the ball
+        :param overlay: Surface, Drawn over the top left corner / None
+        :return: None
+        """
+        screen = self.__screen
+        background = self.__background
+
+        if self.__invalidated:
+            screen.blit(background, (0, 0))
+        else:
+            for rect in self.__dirty:
+                screen.blit(background, rect, rect)
+
+        x_ball = round(x_ball)
+        y_ball = round(y_ball)
+        radius = self.__ball_radius
+        rects = [
+            screen.blit(self.__sprite_r1, (int(x_r1), int(y_r1))),
+            screen.blit(self.__sprite_r2, (int(x_r2), int(y_r2))),
+            pygame.Rect(x_ball - radius, y_ball - radius, 2 * radius + 1, 2 * radius + 1),
+        ]
+        gfxdraw.filled_circle(screen, x_ball, y_ball, radius, COLOR_WHITE)
+        pygame.draw.line(screen, COLOR_WHITE, (self.__width / 2, 0), (self.__width / 2, self.__height))
+        if overlay is not None:
+            rects.append(screen.blit(overlay, (0, 0)))
+
+        if self.__invalidated:
+            pygame.display.flip()
+            self.__invalidated = False
+        else:
+            # Areas left by the objects and areas they moved to, merged when they overlap
+            update = []
+            for old, new in zip(self.__dirty, rects):
+                if old.colliderect(new):
+                    update.append(old.union(new))
+                else:
+                    update.extend((old, new))
+            pygame.display.update(update)
+        self.__dirty = rects
@@ -0,0 +1,560 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import time
+import queue
+import signal
+import asyncio
+import multiprocessing
+from .globals import SERVER_PORT, INVITATION_TIMEOUT, TIMEOUT, MAX_FRAME_TIME, ROUND_PAUSE
+from .utils import Packet, STRING, COORDINATE, read_packet, UnknownPacket, InvalidData
+from .physics import PhysicsWorld, MatchState, BASE_TICK_RATE, EVENT_PLAYER1_SCORED, EVENT_PLAYER2_SCORED
+from .spectator import SpectatorPacket
+
+__all__ = [
+    "JoinPacket",
+    "RoomPacket",
+    "SlotPacket",
+    "PaddlePacket",
+    "GameServer",
+]
+
+# Bytes queued to a player above which states are dropped
+_WRITE_BUFFER_LIMIT = 4096
+_PLAYERS = 2
+
+
+def _interrupt(signum, frame):
+    """
+    Signal handler stopping the server as on Ctrl+C.
+    """
+    raise KeyboardInterrupt
+
+
+class JoinPacket(Packet):
+    """
+    Packet sent by a player to join a room, first to the server front port and then to the room worker.
+    An empty room name joins any room waiting for a player.
+    """
+
+    packet_type = 8
+    fields = (("username", STRING), ("room", STRING))
+
+    def __init__(self, username="", room=""):
+        self.username = username
+        self.room = room
+
+
+class RoomPacket(Packet):
+    """
+    Packet sent by the server front with the room assigned to a player and the port of its worker.
+    Port 0 means the room is full.
+    """
+
+    packet_type = 9
+    fields = (("port", "H"), ("room", STRING))
+
+    def __init__(self, port=0, room=""):
+        self.port = port
+        self.room = room
+
+
+class SlotPacket(Packet):
+    """
+    Packet sent by a room to a player with its slot, i.e., 1 for the left paddle and 2 for the right paddle,
+    and the opponent username once known. It is resent while waiting for the opponent.
+    """
+
+    packet_type = 10
+    fields = (("slot", "B"), ("opponent", STRING))
+
+    def __init__(self, slot=0, opponent=""):
+        self.slot = slot
+        self.opponent = opponent
+
+
+class PaddlePacket(Packet):
+    """
+    Paddle position sent by a player to its room.
+    """
+
+    packet_type = 11
+    fields = (("y", COORDINATE), ("x", COORDINATE))
+
+    def __init__(self, y=0, x=0):
+        self.y = y
+        self.x = x
+
+
+class _Player:
+    """
+    Player connected to a room.
+    """
+
+    def __init__(self, username, writer, slot):
+        self.username = username
+        self.writer = writer
+        self.slot = slot
+        self.paddle = None
+
+    def send(self, frame, is_state=False):
+        """
+        Queue a frame without waiting. States are dropped while the player does not keep up.
+
+        :param frame: bytes, Frame
+        :param is_state: bool, Frame can be dropped
+        :return: None
+        """
+        if self.writer.is_closing():
+            return
+        if is_state and self.writer.transport.get_write_buffer_size() > _WRITE_BUFFER_LIMIT:
+            return
+        self.writer.write(frame)
+
+
+class _Room:
+    """
+    Room hosting a match between two players. The match runs the same simulation as a LAN match at a fixed
+    tick rate, with the players sending their paddle positions and the room sending the world state.
+    """
+
+    def __init__(self, name, tick_rate, send_rate, on_change):
+        """
+        :param name: str, Room name
+        :param tick_rate: int, Physics ticks per second
+        :param send_rate: int, States sent per second
+        :param on_change: Callable receiving the room when its players change or the room closes
+        """
+        self.name = name
+        self.players = []
+        self.is_closed = False
+        self.__tick_rate = tick_rate
+        self.__send_rate = send_rate
+        self.__on_change = on_change
+        self.__match = MatchState(max_score=5)
+        self.__world = PhysicsWorld(match=self.__match, tick_rate=tick_rate)
+        self.__state = SpectatorPacket()
+        self.__is_full = asyncio.Event()
+        self.__task = None
+
+    def join(self, username, writer):
+        """
+        Add a player and start the match when the room is full.
+
+        :param username: str, Player username
+        :param writer: StreamWriter, Player connection
+        :return: _Player / None if the room is full
+        """
+        if len(self.players) >= _PLAYERS or self.is_closed:
+            return None
+        slots = {player.slot for player in self.players}
+        player = _Player(username, writer, 1 if 1 not in slots else 2)
+        self.players.append(player)
+        self.__on_change(self)
+        if len(self.players) == _PLAYERS:
+            self.__is_full.set()
+        if self.__task is None:
+            self.__task = asyncio.ensure_future(self._run())
+        return player
+
+    def leave(self, player):
+        """
+        Remove a player, which ends the match.
+
+        :param player: _Player
+        :return: None
+        """
+        if player in self.players:
+            self.players.remove(player)
+        self.close()
+
+    def close(self):
+        """
+        End the match and disconnect the players.
+
+        :return: None
+        """
+        if self.is_closed:
+            return
+        self.is_closed = True
+        for player in self.players:
+            player.writer.close()
+        if self.__task is not None:
+            self.__task.cancel()
+        self.__on_change(self)
+
+    def _broadcast(self, packet, is_state=False):
+        """
+        Encode a packet once and queue it to all the players.
+
+        :param packet: Packet
+        :param is_state: bool, Packet can be dropped
+        :return: None
+        """
+        frame = packet.frame()
+        for player in self.players:
+            player.send(frame, is_state)
+
+    async def _wait_players(self):
+        """
+        Wait until the room is full, resending the slots as keepalive.
+
+        :return: None
+        """
+        while not self.__is_full.is_set():
+            for player in self.players:
+                player.send(SlotPacket(player.slot).frame())
+            try:
+                await asyncio.wait_for(self.__is_full.wait(), 1)
+            except asyncio.TimeoutError:
+                pass
+        for player in self.players:
+            opponent = next(other for other in self.players if other is not player)
+            player.send(SlotPacket(player.slot, opponent.username).frame())
+
+    def _send_state(self, elapsed):
+        """
+        Send the world state to the players.
+
+        :param elapsed: float, Seconds since the match started
+        :return: None
+        """
+        paddle1, paddle2 = self.__world.paddles
+        puck = self.__world.puck
+        state = self.__state
+        state.time = int(elapsed * 1000)
+        state.round = sum(self.__match.score) % 256
+        state.score1, state.score2 = self.__match.score
+        state.y_r1, state.x_r1, state.y_r2, state.x_r2 = paddle1.y, paddle1.x, paddle2.y, paddle2.x
+        state.x_ball, state.y_ball = puck.x, puck.y
+        state.vx_ball, state.vy_ball = puck.vx * self.__tick_rate, puck.vy * self.__tick_rate
+        self._broadcast(state, True)
+
+    def _follow(self, paddle, target):
+        """
+        Move a paddle toward the position sent by its player, no faster than a paddle moves and only inside its
+        half of the board, so a player can not jump or leave its side.
+
+        :param paddle: Paddle, Paddle of the player
+        :param target: PaddlePacket, Last position sent by the player
+        :return: None
+        """
+        world = self.__world
+        min_x, max_x = world._x_range(paddle)
+        speed = world.paddle_speed
+        y = min(max(target.y, 0), world.height - paddle.height)
+        x = min(max(target.x, min_x), max_x)
+        paddle.y += min(max(y - paddle.y, -speed), speed)
+        paddle.x += min(max(x - paddle.x, -speed), speed)
+
+    async def _run(self):
+        """
+        Run the match.
+
+        :return: None
+        """
+        try:
+            await self._wait_players()
+            loop = asyncio.get_running_loop()
+            world = self.__world
+            tick_time = 1 / self.__tick_rate
+            send_interval = 1 / self.__send_rate
+            start = loop.time()
+            next_tick = next_send = start
+            while not self.__match.is_over:
+                world.reset_round()
+                while not world.is_round_over:
+                    for player in self.players:
+                        if player.paddle is not None:
+                            self._follow(world.paddles[player.slot - 1], player.paddle)
+                    events = world.step()
+                    now = loop.time()
+                    if now >= next_send or EVENT_PLAYER1_SCORED in events or EVENT_PLAYER2_SCORED in events:
+                        next_send = max(next_send + send_interval, now)
+                        self._send_state(now - start)
+
+                    # Sleep until the next tick, giving up on ticks too late to be caught up
+                    next_tick += tick_time
+                    if now - next_tick > MAX_FRAME_TIME:
+                        next_tick = now
+                    await asyncio.sleep(max(0, next_tick - now))
+                # Players show the score screen meanwhile
+                await asyncio.sleep(ROUND_PAUSE)
+                next_tick = next_send = loop.time()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.close()
+
+
+class _Worker:
+    """
+    Worker process server, hosting the rooms assigned to it on its own event loop.
+    """
+
+    def __init__(self, host, port, tick_rate, send_rate, status):
+        """
+        :param host: str, Address to listen on
+        :param port: int, Port to listen on
+        :param tick_rate: int, Physics ticks per second
+        :param send_rate: int, States sent per second
+        :param status: multiprocessing.Queue, Room changes reported to the front as (room, players, is_closed)
+        """
+        self.__host = host
+        self.__port = port
+        self.__tick_rate = tick_rate
+        self.__send_rate = send_rate
+        self.__status = status
+        self.__rooms = {}
+
+    def _on_room_change(self, room):
+        """
+        Report a room change to the front.
+
+        :param room: _Room
+        :return: None
+        """
+        if room.is_closed and self.__rooms.get(room.name) is room:
+            del self.__rooms[room.name]
+        self.__status.put((room.name, len(room.players), room.is_closed))
+
+    async def _handle(self, reader, writer):
+        """
+        Serve a player connection.
+
+        :param reader: StreamReader
+        :param writer: StreamWriter
+        :return: None
+        """
+        player = room = None
+        try:
+            join = await read_packet(reader, INVITATION_TIMEOUT)
+            if not isinstance(join, JoinPacket):
+                return
+            room = self.__rooms.get(join.room)
+            if room is None:
+                room = self.__rooms[join.room] = _Room(join.room, self.__tick_rate, self.__send_rate,
+                                                       self._on_room_change)
+            player = room.join(join.username, writer)
+            if player is None:
+                return
+            while not room.is_closed:
+                packet = await read_packet(reader, TIMEOUT)
+                if isinstance(packet, PaddlePacket):
+                    player.paddle = packet
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, OSError, UnknownPacket, InvalidData):
+            pass
+        finally:
+            if player is not None:
+                room.leave(player)
+            writer.close()
+
+    async def serve(self):
+        """
+        Serve forever.
+
+        :return: None
+        """
+        server = await asyncio.start_server(self._handle, self.__host, self.__port)
+        async with server:
+            await server.serve_forever()
+
+
+def _run_worker(host, port, tick_rate, send_rate, status):
+    """
+    Worker process entry point.
+
+    :param host: str, Address to listen on
+    :param port: int, Port to listen on
+    :param tick_rate: int, Physics ticks per second
+    :param send_rate: int, States sent per second
+    :param status: multiprocessing.Queue, Room changes reported to the front
+    :return: None
+    """
+    try:
+        asyncio.run(_Worker(host, port, tick_rate, send_rate, status).serve())
+    except KeyboardInterrupt:
+        pass
+
+
+class _RoomInfo:
+    """
+    Front view of a room.
+    """
+
+    __slots__ = ("worker", "players", "reservations", "is_public")
+
+    def __init__(self, worker, is_public):
+        self.worker = worker
+        self.players = 0
+        self.reservations = []
+        self.is_public = is_public
+
+    def free_slots(self, now):
+        """
+        Get the number of slots not taken by players nor reserved to players on their way to the worker.
+
+        :param now: float, Current time
+        :return: int, Free slots
+        """
+        self.reservations = [expiry for expiry in self.reservations if expiry > now]
+        return _PLAYERS - self.players - len(self.reservations)
+
+
+class GameServer:
+    """
+    Dedicated headless server hosting many concurrent matches.
+
+    Players connect to the front port, which assigns them a room and tells them the port of the worker process
+    hosting it. Each worker process runs its rooms on an asyncio event loop, so rooms are spread across cores.
+    """
+
+    def __init__(self, host="0.0.0.0", port=SERVER_PORT, workers=None, tick_rate=BASE_TICK_RATE, send_rate=60):
+        """
+        :param host: str, Address to listen on
+        :param port: int, Front port, workers listen on the following ports
+        :param workers: int, Number of worker processes, the number of CPUs if None
+        :param tick_rate: int, Physics ticks per second
+        :param send_rate: int, States sent per second
+        """
+        self.__host = host
+        self.__port = port
+        self.__workers = workers or multiprocessing.cpu_count()
+        self.__tick_rate = tick_rate
+        self.__send_rate = send_rate
+        self.__status = multiprocessing.Queue()
+        self.__processes = []
+        self.__rooms = {}
+        self.__room_count = 0
+
+    def _worker_port(self, worker):
+        """
+        Get the port of a worker.
+
+        :param worker: int, Worker index
+        :return: int, Port
+        """
+        return self.__port + 1 + worker
+
+    def _least_loaded_worker(self):
+        """
+        Get the worker hosting less rooms.
+
+        :return: int, Worker index
+        """
+        load = [0] * self.__workers
+        for info in self.__rooms.values():
+            load[info.worker] += 1
+        return load.index(min(load))
+
+    def _assign(self, name):
+        """
+        Assign a room to a player, reserving a slot.
+
+        :param name: str, Room name, empty for any public room with a free slot
+        :return: (str, int) Room name and worker port / None if the room is full
+        """
+        now = time.monotonic()
+        if not name:
+            name = next((room for room, info in self.__rooms.items() if info.is_public and info.free_slots(now) > 0),
+                        None)
+            if name is None:
+                self.__room_count += 1
+                name = "table-%d" % self.__room_count
+                self.__rooms[name] = _RoomInfo(self._least_loaded_worker(), True)
+        elif name not in self.__rooms:
+            self.__rooms[name] = _RoomInfo(self._least_loaded_worker(), False)
+
+        info = self.__rooms[name]
+        if info.free_slots(now) <= 0:
+            return None
+        info.reservations.append(now + INVITATION_TIMEOUT)
+        return name, self._worker_port(info.worker)
+
+    async def _poll_status(self):
+        """
+        Apply the room changes reported by the workers.
+
+        :return: None
+        """
+        while True:
+            try:
+                while True:
+                    name, players, is_closed = self.__status.get_nowait()
+                    info = self.__rooms.get(name)
+                    if info is None:
+                        continue
+                    if is_closed:
+                        del self.__rooms[name]
+                    else:
+                        info.players = players
+                        if info.reservations:
+                            info.reservations.pop(0)
+            except queue.Empty:
+                pass
+
+            # Forget rooms nobody came to
+            now = time.monotonic()
+            for name in [name for name, info in self.__rooms.items()
+                         if not info.players and info.free_slots(now) == _PLAYERS]:
+                del self.__rooms[name]
+            await asyncio.sleep(0.2)
+
+    async def _handle(self, reader, writer):
+        """
+        Serve a player connection to the front port.
+
+        :param reader: StreamReader
+        :param writer: StreamWriter
+        :return: None
+        """
+        try:
+            join = await read_packet(reader, INVITATION_TIMEOUT)
+            if isinstance(join, JoinPacket):
+                assignment = self._assign(join.room)
+                if assignment is None:
+                    packet = RoomPacket(0, join.room)
+                else:
+                    packet = RoomPacket(assignment[1], assignment[0])
+                writer.write(packet.frame())
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, OSError, UnknownPacket, InvalidData):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self):
+        """
+        Serve the front port forever.
+
+        :return: None
+        """
+        server = await asyncio.start_server(self._handle, self.__host, self.__port)
+        poll = asyncio.ensure_future(self._poll_status())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            poll.cancel()
+
+    def serve_forever(self):
+        """
+        Start the workers and serve until interrupted or terminated.
+
+        :return: None
+        """
+        signal.signal(signal.SIGTERM, _interrupt)
+        for worker in range(self.__workers):
+            process = multiprocessing.Process(target=_run_worker, daemon=True,
+                                              args=(self.__host, self._worker_port(worker), self.__tick_rate,
+                                                    self.__send_rate, self.__status))
+            process.start()
+            self.__processes.append(process)
+        try:
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for process in self.__processes:
+                process.terminate()
+                process.join()
@@ -0,0 +1,213 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import struct
+from collections import OrderedDict
+from .utils import packet_class, InvalidData
+
+__all__ = [
+    "DELTA_SEQUENCE_MODULO",
+    "DeltaEncoder",
+    "DeltaDecoder",
+]
+
+DELTA_SEQUENCE_MODULO = 2 ** 16
+
+# Sequence, acknowledged sequence (0 for none), packet type and baseline offset (0 for keyframes)
+_HEADER = struct.Struct("!HHBB")
+_MASK_BYTE = struct.Struct("!B")
+_MASK_SHORT = struct.Struct("!H")
+_MAX_BASELINE_OFFSET = 255
+_MAX_FIELDS = 16
+
+
+class _History:
+    """
+    Bounded sequence -> quantized values history.
+    """
+
+    def __init__(self, size):
+        self.__size = size
+        self.__data = OrderedDict()
+
+    def put(self, sequence, values):
+        self.__data[sequence] = values
+        if len(self.__data) > self.__size:
+            self.__data.popitem(last=False)
+
+    def get(self, sequence):
+        return self.__data.get(sequence)
+
+
+def _mask_struct(formats):
+    """
+    Get the struct of the changed fields mask of a packet.
+
+    :param formats: tuple, Struct formats of the packet fields
+    :return: Struct
+    """
+    return _MASK_BYTE if len(formats) <= 8 else _MASK_SHORT
+
+
+def _write_varint(data, value):
+    """
+    Append a signed integer as a zigzag varint, so small differences take a single byte.
+
+    :param data: bytearray, Output
+    :param value: int, Value
+    :return: None
+    """
+    value = value * 2 if value >= 0 else -value * 2 - 1
+    while value >= 0x80:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def _read_varint(data, offset):
+    """
+    Read a zigzag varint.
+    Raises IndexError if the data ends before the value.
+
+    :param data: bytes, Input
+    :param offset: int, Offset of the value
+    :return: (int, int), Value and offset after the value
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return (value >> 1) ^ -(value & 1), offset
+
+
+class DeltaEncoder:
+    """
+    Encodes state packets as deltas against the last state acknowledged by the peer. Only the fields that
+    changed are sent, as flagged in a bitmask, and as the difference from the acknowledged value of the quantized
+    (fixed-point) field, so typical per-tick changes take one or two bytes.
+    A full keyframe is sent periodically, and whenever the acknowledged state is not known, so the peer can
+    always resync.
+    """
+
+    def __init__(self, keyframe_interval=50, history=64):
+        """
+        :param keyframe_interval: int, Maximum number of sent states between keyframes
+        :param history: int, Number of sent states kept as possible baselines
+        """
+        self.__keyframe_interval = keyframe_interval
+        self.__history = _History(history)
+        self.__since_keyframe = keyframe_interval
+        self.__acknowledged = 0
+
+    def acknowledge(self, sequence):
+        """
+        Register the last sequence decoded by the peer.
+
+        :param sequence: int, Sequence number, 0 for none
+        :return: None
+        """
+        self.__acknowledged = sequence
+
+    def encode(self, sequence, ack, packet):
+        """
+        Encode a state packet.
+
+        :param sequence: int, Sequence number of this state, in [1, DELTA_SEQUENCE_MODULO)
+        :param ack: int, Last sequence decoded from the peer, sent back as acknowledgement, 0 for none
+        :param packet: Packet, State packet, with fixed fields only
+        :return: bytes, Data
+        """
+        formats = packet.formats
+        if not packet.is_fixed or len(formats) > _MAX_FIELDS:
+            raise AssertionError("Packet can not be delta encoded")
+        values = packet.quantized()
+        self.__history.put(sequence, values)
+
+        offset = (sequence - self.__acknowledged) % DELTA_SEQUENCE_MODULO
+        baseline = self.__history.get(self.__acknowledged) if self.__acknowledged else None
+        self.__since_keyframe += 1
+        if baseline is None or offset > _MAX_BASELINE_OFFSET or self.__since_keyframe >= self.__keyframe_interval:
+            self.__since_keyframe = 0
+            return _HEADER.pack(sequence, ack, packet.packet_type, 0) + packet._struct.pack(*values)
+
+        mask_struct = _mask_struct(formats)
+        data = bytearray(_HEADER.pack(sequence, ack, packet.packet_type, offset))
+        data += bytes(mask_struct.size)
+        mask = 0
+        for i, (value, old) in enumerate(zip(values, baseline)):
+            if value != old:
+                mask |= 1 << i
+                _write_varint(data, value - old)
+        mask_struct.pack_into(data, _HEADER.size, mask)
+        return bytes(data)
+
+
+class DeltaDecoder:
+    """
+    Decodes data produced by DeltaEncoder.
+    """
+
+    def __init__(self, history=128):
+        """
+        :param history: int, Number of decoded states kept as possible baselines
+        """
+        self.__history = _History(history)
+
+    @staticmethod
+    def header(data):
+        """
+        Read the sequence numbers of encoded data.
+        Raises InvalidData if there is no header.
+
+        :param data: bytes, Data
+        :return: (int, int), Sequence and acknowledged sequence
+        """
+        try:
+            sequence, ack, _, _ = _HEADER.unpack_from(data)
+        except struct.error:
+            raise InvalidData
+        return sequence, ack
+
+    def decode(self, data):
+        """
+        Decode a state packet.
+        Raises InvalidData if the data is not decodable.
+
+        :param data: bytes, Data
+        :return: Packet / None if the baseline state is not known (a keyframe is needed)
+        """
+        try:
+            sequence, _, packet_type, offset = _HEADER.unpack_from(data)
+        except struct.error:
+            raise InvalidData
+        cls = packet_class(packet_type)
+        if cls is None or not cls.is_fixed:
+            raise InvalidData
+
+        try:
+            if offset:
+                baseline = self.__history.get((sequence - offset) % DELTA_SEQUENCE_MODULO)
+                if baseline is None:
+                    return None
+                mask_struct = _mask_struct(cls.formats)
+                mask, = mask_struct.unpack_from(data, _HEADER.size)
+                position = _HEADER.size + mask_struct.size
+                values = []
+                for i, value in enumerate(baseline):
+                    if mask >> i & 1:
+                        difference, position = _read_varint(data, position)
+                        value += difference
+                    values.append(value)
+                values = tuple(values)
+            else:
+                values = cls._struct.unpack_from(data, _HEADER.size)
+        except (struct.error, IndexError):
+            raise InvalidData
+        self.__history.put(sequence, values)
+
+        packet = cls()
+        packet.load_quantized(values)
+        return packet
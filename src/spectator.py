@@ -0,0 +1,263 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import socket
+import selectors
+import threading
+from .globals import SPECTATOR_PORT, MAX_SPECTATORS
+from .utils import Packet, COORDINATE
+
+__all__ = [
+    "SpectatorPacket",
+    "SpectatorHub",
+]
+
+
+class SpectatorPacket(Packet):
+    """
+    Match snapshot sent to spectators. Positions are ordered as taken by the board renderer, with the puck last.
+    """
+
+    packet_type = 7
+    fields = (("time", "I"), ("round", "B"), ("score1", "B"), ("score2", "B"),
+              ("y_r1", COORDINATE), ("x_r1", COORDINATE), ("y_r2", COORDINATE), ("x_r2", COORDINATE),
+              ("x_ball", COORDINATE), ("y_ball", COORDINATE), ("vx_ball", COORDINATE), ("vy_ball", COORDINATE))
+
+    def __init__(self):
+        self.time = 0
+        self.round = 0
+        self.score1 = 0
+        self.score2 = 0
+        self.y_r1 = 0
+        self.x_r1 = 0
+        self.y_r2 = 0
+        self.x_r2 = 0
+        self.x_ball = 0
+        self.y_ball = 0
+        self.vx_ball = 0
+        self.vy_ball = 0
+
+
+class _Spectator:
+    """
+    Spectator connection with its latest-only send queue: the frame being sent and the next frame to send.
+    """
+
+    __slots__ = ("conn", "sending", "offset", "pending")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.sending = None
+        self.offset = 0
+        self.pending = None
+
+
+class SpectatorHub(threading.Thread):
+    """
+    Threaded spectator server. Spectators connect read-only and receive the match snapshots.
+
+    Each published snapshot is encoded once and the same frame is fanned out to all the spectators by the
+    service thread, so publishing never waits for the network. A spectator that can not keep up only gets the
+    newest snapshot once its socket accepts data again, the older ones are dropped.
+    """
+
+    def __init__(self, port=SPECTATOR_PORT, max_spectators=MAX_SPECTATORS):
+        """
+        Raises OSError if the port can not be used.
+
+        :param port: int, TCP port spectators connect to, 0 for any free port
+        :param max_spectators: int, Maximum number of spectators, others are refused
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.__is_running = False
+        self.__max_spectators = max_spectators
+        self.__server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            self.__server.bind(("0.0.0.0", port))
+            self.__server.listen(max_spectators)
+        except OSError:
+            self.__server.close()
+            raise
+        self.__server.setblocking(False)
+        self.__selector = selectors.DefaultSelector()
+        self.__wake_r, self.__wake_w = socket.socketpair()
+        self.__lock = threading.Lock()
+        self.__latest = None
+        self.__fanned_out = None
+        self.__spectators = {}
+
+    def run(self):
+        self.__is_running = True
+        self.__wake_r.setblocking(False)
+        self.__selector.register(self.__server, selectors.EVENT_READ)
+        self.__selector.register(self.__wake_r, selectors.EVENT_READ)
+        try:
+            while self.__is_running:
+                for key, mask in self.__selector.select(0.5):
+                    if key.fileobj is self.__server:
+                        self._accept()
+                    elif key.fileobj is self.__wake_r:
+                        try:
+                            self.__wake_r.recv(512)
+                        except BlockingIOError:
+                            pass
+                    else:
+                        if mask & selectors.EVENT_READ:
+                            self._receive(key.data)
+                        if mask & selectors.EVENT_WRITE and key.data.conn.fileno() != -1:
+                            self._send(key.data)
+                self._fan_out()
+        finally:
+            self.__is_running = False
+            for spectator in list(self.__spectators.values()):
+                self._remove(spectator)
+            self.__selector.close()
+            self.__server.close()
+            self.__wake_r.close()
+            self.__wake_w.close()
+
+    def _accept(self):
+        """
+        Accept the waiting spectators.
+
+        :return: None
+        """
+        while True:
+            try:
+                conn, _ = self.__server.accept()
+            except OSError:
+                return
+            if len(self.__spectators) >= self.__max_spectators:
+                conn.close()
+                continue
+            conn.setblocking(False)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            spectator = _Spectator(conn)
+            self.__spectators[conn] = spectator
+            self.__selector.register(conn, selectors.EVENT_READ, spectator)
+            # Start with the current snapshot
+            spectator.pending = self.__latest
+            self._send(spectator)
+
+    def _receive(self, spectator):
+        """
+        Discard data sent by a spectator and detect its disconnection.
+
+        :param spectator: _Spectator
+        :return: None
+        """
+        try:
+            data = spectator.conn.recv(512)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._remove(spectator)
+
+    def _send(self, spectator):
+        """
+        Send as much as the spectator socket accepts without blocking. When the frame being sent is done, the
+        pending one, if any, is started.
+
+        :param spectator: _Spectator
+        :return: None
+        """
+        while True:
+            if spectator.sending is None:
+                if spectator.pending is None:
+                    break
+                spectator.sending, spectator.pending, spectator.offset = spectator.pending, None, 0
+            try:
+                sent = spectator.conn.send(memoryview(spectator.sending)[spectator.offset:])
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                self._remove(spectator)
+                return
+            spectator.offset += sent
+            if spectator.offset < len(spectator.sending):
+                break
+            spectator.sending = None
+
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if spectator.sending is not None else 0)
+        if self.__selector.get_key(spectator.conn).events != events:
+            self.__selector.modify(spectator.conn, events, spectator)
+
+    def _fan_out(self):
+        """
+        Hand the newest published frame to every spectator, replacing their unsent one.
+
+        :return: None
+        """
+        with self.__lock:
+            frame = self.__latest
+        if frame is None or frame is self.__fanned_out:
+            return
+        self.__fanned_out = frame
+        for spectator in list(self.__spectators.values()):
+            spectator.pending = frame
+            if spectator.sending is None:
+                self._send(spectator)
+
+    def _remove(self, spectator):
+        """
+        Disconnect a spectator.
+
+        :param spectator: _Spectator
+        :return: None
+        """
+        if self.__spectators.pop(spectator.conn, None) is None:
+            return
+        try:
+            self.__selector.unregister(spectator.conn)
+        except (KeyError, ValueError):
+            pass
+        spectator.conn.close()
+
+    def publish(self, packet):
+        """
+        Send a snapshot to all the spectators. The packet is encoded once, in the calling thread.
+
+        :param packet: Packet, Snapshot
+        :return: None
+        """
+        frame = packet.frame()
+        with self.__lock:
+            self.__latest = frame
+        try:
+            self.__wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    @property
+    def port(self):
+        """
+        Get the port spectators connect to.
+
+        :return: int, Port
+        """
+        return self.__server.getsockname()[1]
+
+    @property
+    def count(self):
+        """
+        Get the number of connected spectators.
+
+        :return: int, Number of spectators
+        """
+        return len(self.__spectators)
+
+    def stop(self):
+        """
+        Stops the thread, disconnecting all the spectators.
+
+        :return: None
+        """
+        self.__is_running = False
+        try:
+            self.__wake_w.send(b"\0")
+        except OSError:
+            pass
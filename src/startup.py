@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import sys
+import time
+import builtins
+
+__all__ = [
+    "StartupProfiler",
+]
+
+
+class StartupProfiler:
+    """
+    Startup time profiler. It records the modules imported while it is installed, with their self and cumulative
+    times as given by python -X importtime, and named phases with the time elapsed since it was created.
+    It only uses the standard library, so it can be created before anything else is imported.
+    """
+
+    def __init__(self):
+        self.__start = time.perf_counter()
+        self.__original_import = None
+        self.__imports = []
+        self.__children = []
+        self.__phases = []
+
+    def install(self):
+        """
+        Start recording the imports.
+
+        :return: None
+        """
+        if self.__original_import is None:
+            self.__original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        """
+        Stop recording the imports.
+
+        :return: None
+        """
+        if self.__original_import is not None:
+            builtins.__import__ = self.__original_import
+            self.__original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """
+        Import hook, timing the imports loading new modules.
+
+        :return: module, Imported module
+        """
+        loaded = len(sys.modules)
+        self.__children.append(0)
+        start = time.perf_counter()
+        try:
+            return self.__original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self.__children.pop()
+            if self.__children:
+                self.__children[-1] += elapsed
+            if len(sys.modules) > loaded:
+                if level and globals:
+                    name = "%s.%s" % (globals.get("__package__") or "", name) if name else globals.get("__package__")
+                self.__imports.append((name, elapsed - children, elapsed))
+
+    def phase(self, name):
+        """
+        Record that a startup phase ended now.
+
+        :param name: str, Phase name
+        :return: None
+        """
+        self.__phases.append((name, time.perf_counter() - self.__start))
+
+    @property
+    def imports(self):
+        """
+        Get the recorded imports, in completion order.
+
+        :return: list, (module, self seconds, cumulative seconds)
+        """
+        return list(self.__imports)
+
+    @property
+    def phases(self):
+        """
+        Get the recorded phases.
+
+        :return: list, (phase, seconds since the profiler was created)
+        """
+        return list(self.__phases)
+
+    def report(self, limit=15):
+        """
+        Get a report of the phases and of the slowest imports.
+
+        :param limit: int, Imports shown
+        :return: str, Report
+        """
+        lines = ["%-28s %10s" % ("phase", "at (ms)")]
+        lines += ["%-28s %10.1f" % (name, seconds * 1000) for name, seconds in self.__phases]
+        lines += ["", "%-48s %10s %12s" % ("import", "self (ms)", "cumul (ms)")]
+        slowest = sorted(self.__imports, key=lambda entry: entry[2], reverse=True)[:limit]
+        lines += ["%-48s %10.1f %12.1f" % (name, own * 1000, cumulative * 1000)
+                  for name, own, cumulative in slowest]
+        return "\n".join(lines)
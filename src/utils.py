@@ -1,40 +1,108 @@
 #!/usr/bin/python
 # -*- coding: UTF-8 -*-
 
-import math
 import json
-import socket
+import select
+import struct
+import weakref
 import pygame
-import itertools
+from collections import OrderedDict
+from .geometry import *
 
 __all__ = [
     "aa_rounded_rect",
+    "rounded_rect_sprite",
+    "LRUCache",
     "rounded_rect_collided_with_circle",
+    "rounded_rect_circle_contact",
+    "rounded_rects_collided_with_circles",
     "generate_wrapped_text",
+    "get_font",
     "wrap_to_pi",
     "get_local_ip",
     "Packet",
+    "FramedReader",
+    "decode_packet",
+    "frame_data",
+    "packet_class",
+    "frame_reader",
+    "read_packet",
     "InvalidData",
-    "UnknownPacket"
+    "UnknownPacket",
+    "ENCODING_BINARY",
+    "ENCODING_JSON",
+    "COORDINATE",
+    "STRING",
 ]
 
 
-def aa_rounded_rect(surface, rect, color, radius):
+class LRUCache:
+    """
+    Least recently used cache with a maximum number of entries.
     """
-    Draw a rounded rectangle.
 
-    :param surface: Surface where to draw
-    :param rect: Rectangle parameters (x, y, width, height)
+    def __init__(self, max_size=128):
+        self.__max_size = max_size
+        self.__data = OrderedDict()
+
+    def get(self, key, default=None):
+        """
+        Get a cached value and mark it as the most recently used.
+
+        :param key: Hashable key
+        :param default: Value returned if key is not cached
+        :return: Cached value / default
+        """
+        try:
+            self.__data.move_to_end(key)
+        except KeyError:
+            return default
+        return self.__data[key]
+
+    def put(self, key, value):
+        """
+        Cache a value, evicting the least recently used entry if the cache is full.
+
+        :param key: Hashable key
+        :param value: Value to cache
+        :return: None
+        """
+        self.__data[key] = value
+        self.__data.move_to_end(key)
+        if len(self.__data) > self.__max_size:
+            self.__data.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all cached entries.
+
+        :return: None
+        """
+        self.__data.clear()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key):
+        return key in self.__data
+
+
+_sprite_cache = LRUCache(32)
+
+
+def _render_rounded_rect(size, color, radius):
+    """
+    Render a rounded rectangle in a new surface.
+
+    :param size: Rectangle size (width, height)
     :param color: RGB Color (red, green, blue)
     :param radius: Border radius in percentage: 0 <= radius <= 1
-    :return: Rect
+    :return: Surface
     """
-    rect = pygame.Rect(rect)
+    rect = pygame.Rect((0, 0), size)
     color = pygame.Color(*color)
     alpha = color.a
     color.a = 0
-    pos = rect.topleft
-    rect.topleft = 0, 0
     rectangle = pygame.Surface(rect.size, pygame.SRCALPHA)
 
     circle = pygame.Surface([min(rect.size) * 3] * 2, pygame.SRCALPHA)
@@ -54,57 +122,60 @@ def aa_rounded_rect(surface, rect, color, radius):
 
     rectangle.fill(color, special_flags=pygame.BLEND_RGBA_MAX)
     rectangle.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MIN)
+    return rectangle
 
-    return surface.blit(rectangle, pos)
 
+def rounded_rect_sprite(size, color, radius):
+    """
+    Get a pre-rendered rounded rectangle. Sprites are cached by (size, color, radius) and
+    converted to the display format once a display mode is set.
 
-def rounded_rect_collided_with_circle(rect, radius, circle_pos, circle_radius):
+    :param size: Rectangle size (width, height)
+    :param color: RGB Color (red, green, blue)
+    :param radius: Border radius in percentage: 0 <= radius <= 1
+    :return: Surface
     """
-    Check if a circle has collided with a rounded rect.
-    If so, returns collision coordinates, otherwise returns None.
+    key = (tuple(size), tuple(color), radius)
+    sprite = _sprite_cache.get(key)
+    if sprite is None:
+        sprite = _render_rounded_rect(key[0], color, radius)
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert_alpha()
+        _sprite_cache.put(key, sprite)
+    return sprite
 
+
+def aa_rounded_rect(surface, rect, color, radius):
+    """
+    Draw a rounded rectangle.
+
+    :param surface: Surface where to draw
     :param rect: Rectangle parameters (x, y, width, height)
-    :param radius: Rectangle border radius in percentage: 0 <= radius <= 1
-    :param circle_pos: Circle coordinates (x, y)
-    :param circle_radius: Circle radius
-    :return: Collision coordinates (x, y) / None
-    """
-    rect_x, rect_y, rect_width, rect_height = rect
-    circle_x, circle_y = circle_pos
-
-    rect_corner_diameter = min(rect_width, rect_height) * radius
-    rect_corner_radius = rect_corner_diameter / 2
-
-    if rect_y - circle_radius <= circle_y <= rect_y + rect_height + circle_radius and \
-            rect_x - circle_radius <= circle_x <= rect_x + rect_width + circle_radius:
-        if rect_y + rect_corner_radius <= circle_y <= rect_y + rect_height - rect_corner_radius:
-            # Straight part of the rectangle along y
-            if abs(rect_x - circle_x) <= circle_radius:
-                return rect_x, circle_y
-            elif abs(rect_x + rect_width - circle_x) <= circle_radius:
-                return rect_x + rect_width, circle_y
-
-        elif rect_x + rect_corner_radius <= circle_x <= rect_x + rect_width - rect_corner_radius:
-            # Straight part of the rectangle along x
-            if abs(rect_y - circle_y) <= circle_radius:
-                return circle_x, rect_y
-            elif abs(rect_y + rect_height - circle_y) <= circle_radius:
-                return circle_x, rect_y + rect_height
+    :param color: RGB Color (red, green, blue)
+    :param radius: Border radius in percentage: 0 <= radius <= 1
+    :return: Rect
+    """
+    rect = pygame.Rect(rect)
+    return surface.blit(rounded_rect_sprite(rect.size, color, radius), rect.topleft)
 
-        else:
-            # Rounded part of the rectangle
-            for ang in range(91):
-                x = rect_corner_radius * math.cos(math.radians(ang))
-                y = rect_corner_radius * math.sin(math.radians(ang))
 
-                x_coordinates = [rect_x + rect_corner_radius - x, rect_x + rect_width - rect_corner_radius + x]
-                y_coordinates = [rect_y + rect_corner_radius - y, rect_y + rect_height - rect_corner_radius + y]
-                for coordinate in itertools.product(x_coordinates, y_coordinates):
-                    distance = math.sqrt(sum([(a - b) ** 2 for a, b in zip(coordinate, circle_pos)]))
-                    if distance <= circle_radius:
-                        return coordinate
+_font_cache = {}
+_text_cache = LRUCache(64)
 
-    return None
+
+def get_font(font, size):
+    """
+    Get a font object, loading it from disk only the first time.
+
+    :param font: str, Font path
+    :param size: int, Font size
+    :return: Font
+    """
+    key = (font, size)
+    font_obj = _font_cache.get(key)
+    if font_obj is None:
+        font_obj = _font_cache[key] = pygame.font.Font(font, size)
+    return font_obj
 
 
 def generate_wrapped_text(text, font, color, width, height, min_font_size=20, max_font_size=100):
@@ -122,43 +193,37 @@ def generate_wrapped_text(text, font, color, width, height, min_font_size=20, ma
     """
     if max_font_size < min_font_size:
         raise AssertionError("Maximum font size must be greater or equal than min font size")
-    while True:
-        font_obj = pygame.font.Font(font, max_font_size)
-        w, h = font_obj.size(text)
-        if (w <= width and h <= height) or max_font_size <= min_font_size:
-            break
-        max_font_size -= 1
-
-    return font_obj.render(text, True, color), w, h
 
+    key = (text, font, tuple(color), width, height, min_font_size, max_font_size)
+    cached = _text_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Binary search for the biggest font size that fits
+    low, high = min_font_size, max_font_size
+    while low < high:
+        size = (low + high + 1) // 2
+        w, h = get_font(font, size).size(text)
+        if w <= width and h <= height:
+            low = size
+        else:
+            high = size - 1
 
-def wrap_to_pi(angle):
-    """
-    Wrap the given angle to pi: -pi <= angle <= pi.
-
-    :param angle: float, Angle to wrap in rads
-    :return: float, Wrapped angle
-    """
-    while angle > math.pi:
-        angle -= 2 * math.pi
-    while angle < -math.pi:
-        angle += 2 * math.pi
-    return angle
+    font_obj = get_font(font, low)
+    w, h = font_obj.size(text)
+    cached = font_obj.render(text, True, color), w, h
+    _text_cache.put(key, cached)
+    return cached
 
 
 def get_local_ip():
     """
-    Get local ip address.
+    Get local ip address, from the cached interface addresses.
 
     :return: str, Local IP address
     """
-    ip = socket.gethostbyname(socket.gethostname())
-    if ip == "127.0.0.1":
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
-        s.close()
-    return ip
+    from .interfaces import local_interfaces
+    return local_interfaces.primary
 
 
 class UnknownPacket(Exception):
@@ -169,51 +234,179 @@ class InvalidData(Exception):
     pass
 
 
+# Packet encodings
+ENCODING_BINARY = "binary"
+ENCODING_JSON = "json"
+
+# Packet field kinds, other kinds are used as struct format characters
+COORDINATE = "coordinate"
+STRING = "string"
+
+PROTOCOL_VERSION = 1
+COORDINATE_SCALE = 8
+_COORDINATE_LIMIT = 2 ** 15 - 1
+_HEADER = struct.Struct("!BB")
+_FRAME_HEADER = struct.Struct("!H")
+_packet_types = {}
+_packet_names = {}
+
+
 class Packet:
     """
-    General packet class
+    General packet class.
+
+    Packets are encoded in binary as a header (protocol version, packet type) followed by the fixed struct
+    layout of the packet fields. Coordinates are sent as fixed-point int16 and strings are length-prefixed and
+    sent after the fixed part. JSON encoding, tagged with the packet name, can be enabled for debugging.
     """
 
+    packet_type = None
+    fields = ()
+    encoding = ENCODING_BINARY
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fixed = [(name, kind) for name, kind in cls.fields if kind != STRING]
+        cls._fixed_layout = tuple((name, kind == COORDINATE) for name, kind in fixed)
+        cls._strings = tuple(name for name, kind in cls.fields if kind == STRING)
+        cls.formats = tuple("h" if kind == COORDINATE else kind for _, kind in fixed)
+        cls._struct = struct.Struct("!" + "".join(cls.formats))
+        cls._header = _HEADER.pack(PROTOCOL_VERSION, cls.packet_type or 0)
+        cls.is_fixed = not cls._strings and cls._dumps_extra is Packet._dumps_extra
+        if "packet_type" in cls.__dict__ and cls.packet_type is not None:
+            if cls.packet_type in _packet_types:
+                raise AssertionError("Packet type %s is already in use" % cls.packet_type)
+            _packet_types[cls.packet_type] = _packet_names[cls.__name__] = cls
+
+    @staticmethod
+    def set_encoding(encoding):
+        """
+        Set the encoding used by all packets when sending. Both encodings are always accepted when receiving.
+
+        :param encoding: str, ENCODING_BINARY or ENCODING_JSON
+        :return: None
+        """
+        if encoding not in (ENCODING_BINARY, ENCODING_JSON):
+            raise AssertionError("Unknown encoding")
+        Packet.encoding = encoding
+
     def dumps(self):
         """
-        Serialize packet object to a JSON formatted string using the packet name as the tag.
+        Serialize packet object to bytes using the current encoding.
 
-        :return: str, JSON
+        :return: bytes, Packet data
         """
-        return json.dumps({self.__class__.__name__: self.__dict__})
+        if self.encoding == ENCODING_JSON:
+            return json.dumps({self.__class__.__name__: self.__dict__}).encode()
+
+        data = self._header + self._struct.pack(*self.quantized())
+        for name in self._strings:
+            value = getattr(self, name).encode()
+            data += bytes((len(value),)) + value
+        return data + self._dumps_extra()
 
     def loads(self, data):
         """
-        Deserialize data (instance containing a JSON document) and update packet object.
+        Deserialize data (binary packet or JSON document) and update packet object.
         Raises UnknownPacket or InvalidData if the data is not deserializable.
 
+        :param data: bytes/str, Packet data
+        :return: None
+        """
+        if isinstance(data, str) or data[:1] == b"{":
+            self._loads_json(data)
+            return
+
+        try:
+            version, packet_type = _HEADER.unpack_from(data)
+        except struct.error:
+            raise UnknownPacket
+        if version != PROTOCOL_VERSION or packet_type != self.packet_type:
+            raise InvalidData
+
+        try:
+            offset = _HEADER.size
+            self.load_quantized(self._struct.unpack_from(data, offset))
+            offset += self._struct.size
+            for name in self._strings:
+                length = data[offset]
+                setattr(self, name, bytes(data[offset + 1:offset + 1 + length]).decode())
+                offset += 1 + length
+            self._loads_extra(data, offset)
+        except (struct.error, IndexError, UnicodeDecodeError):
+            raise InvalidData
+
+    def quantized(self):
+        """
+        Get the values of the fixed fields as packed in binary, i.e., with coordinates in fixed-point.
+
+        :return: tuple, Values in the order of the fields, with formats as in the formats attribute
+        """
+        return tuple(max(-_COORDINATE_LIMIT, min(_COORDINATE_LIMIT, round(getattr(self, name) * COORDINATE_SCALE)))
+                     if is_coordinate else getattr(self, name)
+                     for name, is_coordinate in self._fixed_layout)
+
+    def load_quantized(self, values):
+        """
+        Update the fixed fields from values as returned by quantized.
+
+        :param values: tuple, Values in the order of the fields
+        :return: None
+        """
+        for (name, is_coordinate), value in zip(self._fixed_layout, values):
+            setattr(self, name, value / COORDINATE_SCALE if is_coordinate else value)
+
+    def _loads_json(self, data):
+        """
+        Deserialize a JSON document and update packet object.
+
         :param data: bytes/str, JSON
         :return: None
         """
         tag = self.__class__.__name__
         try:
-            _data = json.loads(data)
+            _data = json.loads(bytes(data) if isinstance(data, memoryview) else data)
         except Exception:
             raise UnknownPacket
         if tag not in _data or not isinstance(_data[tag], dict) or set(_data[tag]) != set(self.__dict__):
             raise InvalidData
         self.__dict__.update(_data[tag])
 
-    def receive_from(self, conn, buffer_size=512):
+    def _dumps_extra(self):
+        """
+        Serialize variable length data sent after the packet fields. To be overridden by packets.
+
+        :return: bytes, Extra data
+        """
+        return b""
+
+    def _loads_extra(self, data, offset):
+        """
+        Deserialize variable length data sent after the packet fields. To be overridden by packets.
+
+        :param data: bytes, Packet data
+        :param offset: int, Offset of the extra data
+        :return: None
+        """
+
+    def receive_from(self, conn, buffer_size=4096, latest=False):
         """
-        Receive data from a connection and load it to the packet.
-        If there is an error loading data or no data is obtained, return False.
+        Receive a frame from a connection and load it to the packet.
+        If there is an error loading data or the connection is closed, return False.
 
         :param conn: Socket connection
-        :param buffer_size: int, Socket buffer size
+        :param buffer_size: int, Buffer size of the connection frame reader, used when the reader is created
+        :param latest: bool, Skip to the newest frame already received, dropping the older ones
         :return: bool, Success
         """
         if conn is None:
             return False
-        data = conn.recv(buffer_size)
-        if not data:
-            return False
+        reader = frame_reader(conn, buffer_size)
         try:
+            # A length prefix larger than the reader buffer is also invalid data
+            data = reader.read_latest() if latest else reader.read_frame()
+            if data is None:
+                return False
             self.loads(data)
         except (UnknownPacket, InvalidData):
             return False
@@ -221,7 +414,7 @@ class Packet:
 
     def send_to(self, conn):
         """
-        Send data to connection.
+        Send data to connection as a length-prefixed frame.
         If no connection, return None.
 
         :param conn: Socket connection
@@ -229,4 +422,245 @@ class Packet:
         """
         if conn is None:
             return None
-        return conn.send(self.dumps().encode())
+        data = self.frame()
+        conn.sendall(data)
+        return len(data)
+
+    def frame(self):
+        """
+        Serialize packet object to a length-prefixed frame.
+
+        :return: bytes, Frame
+        """
+        return frame_data(self.dumps())
+
+
+def frame_data(data):
+    """
+    Length-prefix data to be sent as a frame.
+
+    :param data: bytes, Data
+    :return: bytes, Frame
+    """
+    return _FRAME_HEADER.pack(len(data)) + data
+
+
+def packet_class(packet_type):
+    """
+    Get the packet class registered for a packet type.
+
+    :param packet_type: int, Packet type
+    :return: Packet class / None if unknown
+    """
+    return _packet_types.get(packet_type)
+
+
+def decode_packet(data):
+    """
+    Deserialize data of any registered packet type.
+    Raises UnknownPacket or InvalidData if the data is not deserializable.
+
+    :param data: bytes, Packet data
+    :return: Packet
+    """
+    if data[:1] == b"{":
+        try:
+            _data = json.loads(bytes(data))
+        except Exception:
+            raise UnknownPacket
+        packet_type = _packet_names.get(next(iter(_data))) if isinstance(_data, dict) and len(_data) == 1 else None
+    else:
+        packet_type = _packet_types.get(data[1]) if len(data) >= _HEADER.size else None
+    if packet_type is None:
+        raise UnknownPacket
+    packet = packet_type()
+    packet.loads(data)
+    return packet
+
+
+async def read_packet(reader, timeout):
+    """
+    Read a length-prefixed packet from an asyncio stream.
+    Raises asyncio.IncompleteReadError if the stream is closed, asyncio.TimeoutError on timeout, and
+    UnknownPacket or InvalidData if the packet is not deserializable.
+
+    :param reader: StreamReader
+    :param timeout: float, Seconds to wait for the packet
+    :return: Packet
+    """
+    import asyncio
+    header = await asyncio.wait_for(reader.readexactly(_FRAME_HEADER.size), timeout)
+    length, = _FRAME_HEADER.unpack(header)
+    return decode_packet(await asyncio.wait_for(reader.readexactly(length), timeout))
+
+
+class FramedReader:
+    """
+    Reads length-prefixed frames from a stream socket. Data is received with recv_into in a reusable buffer,
+    so several queued frames can be pulled with one syscall, and frames are returned as memoryviews of the
+    buffer without copying. A returned frame is only valid until the next read.
+    """
+
+    def __init__(self, conn, buffer_size=4096):
+        """
+        :param conn: Socket connection
+        :param buffer_size: int, Buffer size, must be greater than the biggest frame
+        """
+        self.__conn = conn
+        self.__buffer = bytearray(buffer_size)
+        self.__view = memoryview(self.__buffer)
+        self.__start = 0
+        self.__end = 0
+
+    def _has_frame(self):
+        """
+        Check if there is a complete frame in the buffer.
+
+        :return: bool, Has frame
+        """
+        available = self.__end - self.__start
+        if available < _FRAME_HEADER.size:
+            return False
+        length, = _FRAME_HEADER.unpack_from(self.__buffer, self.__start)
+        if _FRAME_HEADER.size + length > len(self.__buffer):
+            raise InvalidData
+        return available >= _FRAME_HEADER.size + length
+
+    def _pop_frame(self):
+        """
+        Pop the next complete frame from the buffer.
+
+        :return: memoryview / None
+        """
+        if not self._has_frame():
+            return None
+        start = self.__start + _FRAME_HEADER.size
+        self.__start = start + _FRAME_HEADER.unpack_from(self.__buffer, self.__start)[0]
+        return self.__view[start:self.__start]
+
+    def _compact(self):
+        """
+        Move the unread data to the beginning of the buffer if there is no free space at its end.
+
+        :return: None
+        """
+        if self.__start == self.__end:
+            self.__start = self.__end = 0
+        elif self.__start and self.__end == len(self.__buffer):
+            length = self.__end - self.__start
+            self.__view[:length] = self.__view[self.__start:self.__end]
+            self.__start, self.__end = 0, length
+
+    def _fill(self):
+        """
+        Receive data into the free part of the buffer.
+
+        :return: bool, Data received (False if the connection was closed)
+        """
+        self._compact()
+        received = self.__conn.recv_into(self.__view[self.__end:])
+        self.__end += received
+        return received > 0
+
+    def _wait_frame(self):
+        """
+        Block until there is a complete frame in the buffer.
+
+        :return: bool, Has frame (False if the connection was closed)
+        """
+        while not self._has_frame():
+            if not self._fill():
+                return False
+        return True
+
+    def _drain(self):
+        """
+        Receive whatever is already queued in the socket without blocking.
+
+        :return: None
+        """
+        while True:
+            self._compact()
+            if self.__end == len(self.__buffer) or not select.select([self.__conn], [], [], 0)[0]:
+                return
+            if not self._fill():
+                return
+
+    def read_frame(self):
+        """
+        Read the next frame, blocking until it is complete.
+
+        :return: memoryview, Frame data / None if the connection was closed
+        """
+        if not self._wait_frame():
+            return None
+        return self._pop_frame()
+
+    def read_frames(self):
+        """
+        Read all frames already received, blocking until there is at least one.
+
+        :return: list, Frames (empty if the connection was closed)
+        """
+        if not self._wait_frame():
+            return []
+        self._drain()
+        frames = []
+        frame = self._pop_frame()
+        while frame is not None:
+            frames.append(frame)
+            frame = self._pop_frame()
+        return frames
+
+    def read_available(self):
+        """
+        Receive once without waiting, for non-blocking sockets, and read all the complete frames.
+
+        :return: list, Frames / None if the connection was closed
+        """
+        try:
+            if not self._fill():
+                return None
+        except (BlockingIOError, InterruptedError):
+            pass
+        frames = []
+        frame = self._pop_frame()
+        while frame is not None:
+            frames.append(frame)
+            frame = self._pop_frame()
+        return frames
+
+    def read_latest(self):
+        """
+        Read the newest frame, blocking until there is at least one. Older queued frames are dropped.
+
+        :return: memoryview, Frame data / None if the connection was closed
+        """
+        frames = self.read_frames()
+        return frames[-1] if frames else None
+
+    @property
+    def pending(self):
+        """
+        Get the number of buffered bytes not read yet.
+
+        :return: int, Bytes
+        """
+        return self.__end - self.__start
+
+
+_readers = weakref.WeakKeyDictionary()
+
+
+def frame_reader(conn, buffer_size=4096):
+    """
+    Get the frame reader of a connection, creating it on first use.
+
+    :param conn: Socket connection
+    :param buffer_size: int, Buffer size used if the reader is created
+    :return: FramedReader
+    """
+    reader = _readers.get(conn)
+    if reader is None:
+        reader = _readers[conn] = FramedReader(conn, buffer_size)
+    return reader